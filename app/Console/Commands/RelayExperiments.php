@@ -0,0 +1,124 @@
+<?php
+
+namespace App\Console\Commands;
+
+use App\Events\DataBroadcaster;
+use App\Helpers\Helpers;
+use App\Models\ExperimentLog;
+use Illuminate\Console\Command;
+use Illuminate\Support\Facades\Cache;
+use Illuminate\Support\Facades\Log;
+
+class RelayExperiments extends Command
+{
+    /**
+     * The name and signature of the console command.
+     *
+     * @var string
+     */
+    protected $signature = 'experiments:relay';
+
+    /**
+     * The console command description.
+     *
+     * @var string
+     */
+    protected $description = 'Broadcast the data of all experiments hosted by the resident runner';
+
+    // what the LED cube programs wrote to stderr so far, by experiment
+    protected $errors = [];
+
+    /**
+     * Execute the console command.
+     *
+     * @return int
+     */
+    public function handle()
+    {
+        while (true) {
+            $socket = @stream_socket_client("unix://" . config('experiments.runner.socket'), $errno, $errstr, 5);
+            if ($socket === false) {
+                sleep(1);
+                continue;
+            }
+            $this->info("Relaying experiments of " . config('experiments.runner.socket'));
+
+            fwrite($socket, json_encode(['command' => 'subscribe']) . "\n");
+            stream_set_timeout($socket, 60);
+            while (!feof($socket)) {
+                $line = fgets($socket);
+                if ($line === false) {
+                    // nothing happened for a while
+                    continue;
+                }
+                $event = json_decode($line, true);
+                if (isset($event['id'])) {
+                    $this->relay($event);
+                }
+            }
+            fclose($socket);
+        }
+        return 0;
+    }
+
+    protected function relay(array $event)
+    {
+        $experiment = ExperimentLog::find($event['id']);
+        if ($experiment === null) {
+            return;
+        }
+        $deviceName = $experiment->device->name;
+        $output = config("devices.".$event['device'].".output");
+        $isLED = strpos($event['device'], "LED") !== false;
+
+        if (!empty($event['rows']) && !$isLED) {
+            $dataToBroadcast = Helpers::formatDataToWebsockets($event['rows'], $output);
+            broadcast(new DataBroadcaster($dataToBroadcast, $deviceName, null, false, true));
+        }
+
+        if (isset($event['error']) && !isset($event['finished']) && $isLED) {
+            // RunScript looks for the errors of the program under its tag
+            $this->errors[$event['id']] = ($this->errors[$event['id']] ?? "") . $event['error'];
+            Cache::put('job-result-' . $event['tag'], [
+                'status' => 'error',
+                'experimentID' => $experiment->id,
+                'errorMessage' => Helpers::parseLEDErrorMessage($event['software'], $this->errors[$event['id']])
+            ], now()->addMinutes(10));
+        }
+
+        if (isset($event['finished'])) {
+            unset($this->errors[$event['id']]);
+            if (!$isLED) {
+                $this->finish($event, $experiment, $deviceName, $output);
+            }
+            Log::channel('server')->error("ERRORMESSAGE: " . $event['error']);
+            Log::channel('server')->info("PROCESS OUTPUT: " . $event['output']);
+        }
+    }
+
+    // Send the complete data once, the way the reading job does at the end of a run
+    protected function finish(array $event, ExperimentLog $experiment, string $deviceName, array $output)
+    {
+        if ($event['rows_published'] > 0) {
+            $columns = Helpers::decimateOutput($experiment->output_path);
+            if ($columns !== null) {
+                $dataToBroadcast = Helpers::formatColumnsToWebsockets($columns, $output);
+            } else {
+                $split = explode("\n", file_get_contents($experiment->output_path));
+                $dataToBroadcast = Helpers::formatDataToWebsockets($split, $output);
+            }
+
+            broadcast(new DataBroadcaster($dataToBroadcast, $deviceName, null, false));
+            broadcast(new DataBroadcaster($dataToBroadcast, $deviceName, null, true));
+        } else {
+            broadcast(new DataBroadcaster(null, $deviceName, $event['error'], false));
+            broadcast(new DataBroadcaster(null, $deviceName, $event['error'], true));
+        }
+
+        if (!isset($experiment->stopped_at)) {
+            $experiment->update([
+                'finished_at' => date("Y-m-d H:i:s")
+            ]);
+        }
+    }
+}
@@ -17,6 +17,7 @@ class DataBroadcaster implements ShouldBroadcast
     private string $deviceName;
     private string | null $error;
     private bool $isFinished;
+    private bool $isDelta;
     public $broadcastQueue = 'broadcast-queue';
 
     /**
@@ -24,12 +25,13 @@ class DataBroadcaster implements ShouldBroadcast
      *
      * @return void
      */
-    public function __construct(array | null $arrayData, string $deviceName, string | null $error, bool $isFinished)
+    public function __construct(array | null $arrayData, string $deviceName, string | null $error, bool $isFinished, bool $isDelta = false)
     {
         $this->arrayData = $arrayData;
         $this->deviceName = $deviceName;
         $this->error = $error;
         $this->isFinished = $isFinished;
+        $this->isDelta = $isDelta;
     }
 
     public function broadcastWith() {
@@ -42,6 +44,12 @@ class DataBroadcaster implements ShouldBroadcast
                 return [
                     'error' => $this->error
                 ];
+            } else if ($this->isDelta) {
+                // only rows sampled since the previous message
+                return [
+                    'data' => $this->arrayData,
+                    'delta' => true
+                ];
             } else 
                 return [
                     'data' => $this->arrayData
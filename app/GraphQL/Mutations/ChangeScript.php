@@ -6,6 +6,7 @@ use App\Models\Device;
 use App\Models\ExperimentLog;
 use Symfony\Component\Process\Process;
 use App\Helpers\Helpers;
+use App\Helpers\ExperimentRunner;
 use Illuminate\Support\Facades\Log;
 
 
@@ -24,8 +25,9 @@ class ChangeScript
         $experimentID = $args['runScriptInput']['experimentID'];
         $scriptName = $args['runScriptInput']['scriptName'];
         $experiment = ExperimentLog::find($experimentID);
-        
-        if (!posix_getpgid($experiment->process_pid)) {
+        $hosted = ExperimentRunner::hosts($experimentID);
+
+        if (!$hosted && !posix_getpgid($experiment->process_pid)) {
             return [
                 'status' => 'error',
                 'experimentID' => $experimentID,
@@ -50,19 +52,43 @@ class ChangeScript
         Log::channel('server')->info("CHANGE: " . $device->port);
         Log::channel('server')->info("CHANGE: " . $args['runScriptInput']['inputParameter']);
 
+        if ($hosted) {
+            $reply = ExperimentRunner::request([
+                'command' => 'change',
+                'id' => $experiment->id,
+                'script' => base_path()."/server_scripts/$deviceName/$software/".$scriptFileName,
+                'input' => $args['runScriptInput']['inputParameter']
+            ]) ?? ['status' => 'error', 'errorMessage' => "Experiment runner is not running!"];
+
+            return [
+                'status' => $reply['status'],
+                'experimentID' => $experimentID,
+                'errorMessage' => $reply['errorMessage'] ?? ''
+            ];
+        }
+
+        // applied by the runner itself before its next sample, no change script is started
+        $reply = Helpers::controlExperiment($experiment->output_path, [
+            'command' => 'change',
+            'input' => $args['runScriptInput']['inputParameter']
+        ]);
+        if ($reply !== null) {
+            return [
+                'status' => $reply['status'],
+                'experimentID' => $experimentID,
+                'errorMessage' => $reply['errorMessage'] ?? ''
+            ];
+        }
+
         $process = new Process([
             "./$path",
             '--port', $device->port,
             '--input', $args['runScriptInput']['inputParameter']
         ]);
 
-        $process->start();
-        sleep(1);
+        // returns as soon as the change is applied instead of after a fixed second
+        $process->run();
 
-        while($process->isRunning()) {
-            Log::channel('server')->info("RUNNING: " . $process->getOutput());
-        }
-        
         Log::channel('server')->info("CHANGE: " . $process->getOutput());
         Log::channel('server')->info("CHANGE: " . $process->getErrorOutput());
 
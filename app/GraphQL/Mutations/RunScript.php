@@ -8,6 +8,7 @@ use App\Models\Device;
 use App\Models\ExperimentLog;
 use App\Jobs\StartReadingProcess;
 use App\Helpers\Helpers;
+use App\Helpers\ExperimentRunner;
 use Illuminate\Support\Facades\Log;
 use Illuminate\Support\Facades\Cache;
 
@@ -82,15 +83,47 @@ class RunScript
         $uniqueId = uniqid();
         $errorResult = null;
 
+        $initPath = null;
+        if (strpos($deviceName, "LED") === false && Helpers::checkIfInitIsAvailable(base_path()."/server_scripts/$deviceName")) {
+            $initPath = base_path()."/server_scripts/$deviceName/".Helpers::getScriptName("init", base_path()."/server_scripts/$deviceName");
+        }
+
+        // the resident runner hosts the experiment when it runs, otherwise a queue worker does
+        $reply = ExperimentRunner::request([
+            'command' => 'start',
+            'id' => $experiment->id,
+            'device' => $deviceName,
+            'software' => $software,
+            'script' => $path,
+            'init' => $initPath,
+            'port' => $device->port,
+            'output' => $fileName,
+            'input' => $args['runScriptInput']['inputParameter'],
+            'tag' => $uniqueId
+        ]);
+        if ($reply !== null && $reply['status'] === 'error') {
+            $experiment->update([
+                'timedout_at' => date("Y-m-d H:i:s")
+            ]);
+            return [
+                'status' => 'error',
+                'experimentID' => $experiment->id,
+                'errorMessage' => $reply['errorMessage']
+            ];
+        }
+        $hosted = $reply !== null;
+
         if (strpos($deviceName, "LED") !== false) {
-            $LEDProcess = new StartLEDProcess($date, $fileName, $path, $device, $args, $experiment, $deviceName, $software, $uniqueId);
-            dispatch($LEDProcess)->onQueue("Reading");
-            
+            if (!$hosted) {
+                $LEDProcess = new StartLEDProcess($date, $fileName, $path, $device, $args, $experiment, $deviceName, $software, $uniqueId);
+                dispatch($LEDProcess)->onQueue("Reading");
+            }
+
             sleep(4); //wait for experiment to finish compiling code or generating instructions to see possible errors
 
             $errorResult = Cache::get('job-result-' . $uniqueId);
             Log::debug('ErrorResult', [$errorResult]);
-        } else {
+        } else if (!$hosted) {
             $readingProcess = new StartReadingProcess($date, $fileName, $path, $device, $args, $experiment, $deviceName);
             dispatch($readingProcess)->onQueue("Reading");
         }
@@ -3,7 +3,10 @@
 namespace App\GraphQL\Mutations;
 use App\Models\Device;
 use App\Models\ExperimentLog;
+use Symfony\Component\Process\Exception\ProcessTimedOutException;
 use Symfony\Component\Process\Process;
+use App\Helpers\ExperimentRunner;
+use App\Helpers\Helpers;
 use Illuminate\Support\Facades\Log;
 
 
@@ -22,8 +25,9 @@ class StopScript
         $experimentID = $args['runScriptInput']['experimentID'];
 
         $experiment = ExperimentLog::find($experimentID);
+        $hosted = ExperimentRunner::hosts($experimentID);
 
-        if (!posix_getpgid($experiment->process_pid)) {
+        if (!$hosted && !posix_getpgid($experiment->process_pid)) {
             return [
                 'status' => 'error',
                 'experimentID' => $experimentID,
@@ -34,7 +38,55 @@ class StopScript
         $schema_name = explode(".",$experiment->schema_name)[0];
         $demo_name = explode(".",$experiment->demo_name)[0];
 
+        $experiment->update([
+            'stopped_at' => date("Y-m-d H:i:s")
+        ]);
+
+        if ($hosted) {
+            // the runner stops it through its control socket, or runs stop.py and ends it with everything it started
+            $reply = ExperimentRunner::request([
+                'command' => 'stop',
+                'id' => $experiment->id,
+                'script' => [
+                    base_path()."/server_scripts/$deviceName/stop.py",
+                    '--port', $device->port,
+                    '--software', $experiment->software_name,
+                    '--fileName', $schema_name,
+                    '--demoName', $demo_name
+                ]
+            ]) ?? ['status' => 'error', 'errorMessage' => "Experiment runner is not running!"];
+
+            return [
+                'status' => $reply['status'],
+                'experimentID' => $experimentID,
+                'errorMessage' => $reply['errorMessage'] ?? ''
+            ];
+        }
 
+        // the runner ends the run between two samples, flushes its data and stops the device itself
+        $reply = Helpers::controlExperiment($experiment->output_path, ['command' => 'stop']);
+        if ($reply !== null && $reply['status'] === 'success') {
+            return [
+                'status' => 'success',
+                'experimentID' => $experimentID,
+                'errorMessage' => ''
+            ];
+        }
+
+        $killError = '';
+        $pid = $experiment->process_pid;
+        if (posix_getpgid($pid) == $pid) {
+            // the runner leads its own process group, one signal ends everything it started
+            posix_kill(-$pid, 9);
+        } else {
+            $allPids = array_merge([$pid], $this->getAllChildProcesses($pid));
+            $killProcess = new Process(array_merge(["kill", "-9"], $allPids));
+            $killProcess->run();
+            $killError = $killProcess->getErrorOutput();
+        }
+        broadcast(null);
+
+        // the port is free now, stop.py only ends the measurement on the device
         $process = new Process([
             "./../server_scripts/$deviceName/stop.py",
             '--port', $device->port,
@@ -42,34 +94,22 @@ class StopScript
             '--fileName', $schema_name,
             '--demoName', $demo_name
         ]);
-
-        $process->start();
-        sleep(1);
-        broadcast(null);
-
-        $pid = $experiment->process_pid;
-        $allProcesses = $this->getAllChildProcesses($pid);
-        $allPids = array_merge([$pid], $allProcesses);
-
-        $experiment->update([
-            'stopped_at' => date("Y-m-d H:i:s")
-        ]);
-
-        foreach ($allPids as $killpid) {
-            $killProcess = new Process([
-                "kill","-9","$killpid"
-            ]);
-            
-            $killProcess->start();
-            sleep(1);
-
-            if ($killProcess->getErrorOutput())
-                return [
-                    'status' => 'error',
-                    'experimentID' => $experimentID,
-                    'errorMessage' => $killProcess->getErrorOutput()
-                ];
+        $process->setTimeout(10);
+        try {
+            $process->run();
+        } catch (ProcessTimedOutException $e) {
+            Log::channel('server')->error("STOP: " . $e->getMessage());
         }
+        if ($process->getErrorOutput()) {
+            Log::channel('server')->error("STOP: " . $process->getErrorOutput());
+        }
+
+        if ($killError)
+            return [
+                'status' => 'error',
+                'experimentID' => $experimentID,
+                'errorMessage' => $killError
+            ];
 
         return [
             'status' => 'success',
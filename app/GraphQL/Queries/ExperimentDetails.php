@@ -4,6 +4,7 @@ namespace App\GraphQL\Queries;
 
 use App\Models\ExperimentLog;
 use App\Models\Device;
+use App\Helpers\Helpers;
 
 class ExperimentDetails
 {
@@ -35,46 +36,37 @@ class ExperimentDetails
         $deviceType = $device->deviceType->name;
         $output = config("devices.". $deviceType .".output");
 
-        $data = file_get_contents(
-            $experiment->output_path,
-            false,
-            null,
-            0
-        );
-
-        $split = explode("\n", $data);
-        $dataToBroadcast = [];
-        foreach($split as $line) {
-            if ($line != "") {
-                $splitLine = explode(",", $line);
-                for($i = 0; $i < count($splitLine); $i++) {
-                    $index = $this->checkKey($dataToBroadcast, $output[$i]['name']);
-                    if ($index == -1) {
-                        array_push($dataToBroadcast, [
-                            "name" => $output[$i]['name'],
-                            "values" => [$splitLine[$i]]
-                        ]);
-                    } else {
-                        array_push($dataToBroadcast[$index]['values'], $splitLine[$i]);
-                    }
-                }
+        // Decimated values for the charts, all of them only when decimation is not available
+        $columns = Helpers::decimateOutput($experiment->output_path);
+        if ($columns !== null) {
+            $array = [];
+            foreach($columns as $i => $column) {
+                array_push($array, [
+                    'name' => $output[$i]['name'],
+                    'data' => $column
+                ]);
             }
+        } else {
+            $array = $this->createReturnArray($this->readAllValues($experiment->output_path, $output));
         }
 
+        // CSV export always contains the raw data
         $header = [];
         foreach($output as $outputType) {
             array_push($header, $outputType['name']);
         }
         $fp = fopen(storage_path("/app/public/$experiment->id.csv"), 'w');
         fputcsv($fp, $header);
-        foreach($split as $line) {
-            $line = explode(",", $line);
-                fputcsv($fp, $line);
+        $input = fopen($experiment->output_path, 'r');
+        while (($line = fgets($input)) !== false) {
+            $line = rtrim($line, "\n");
+            if ($line != "") {
+                fputcsv($fp, explode(",", $line));
+            }
         }
+        fclose($input);
         fclose($fp);
 
-
-        $array = $this->createReturnArray($dataToBroadcast);
         $returnArray = [
             "url" => url('/storage/'.$experiment->id.'.csv'),
             'status' => $status,
@@ -84,13 +76,32 @@ class ExperimentDetails
         return $returnArray;
     }
 
-    private function checkKey($dataToBroadcast, $name) {
-        foreach($dataToBroadcast as $index => $data) {
-            if ($data['name'] == $name) {
-                return $index;
+    private function readAllValues($outputPath, $output) {
+        $data = file_get_contents(
+            $outputPath,
+            false,
+            null,
+            0
+        );
+
+        $split = explode("\n", $data);
+        $dataToBroadcast = [];
+        foreach($split as $line) {
+            if ($line != "") {
+                $splitLine = explode(",", $line);
+                for($i = 0; $i < count($splitLine); $i++) {
+                    if (!isset($dataToBroadcast[$i])) {
+                        $dataToBroadcast[$i] = [
+                            "name" => $output[$i]['name'],
+                            "values" => [$splitLine[$i]]
+                        ];
+                    } else {
+                        $dataToBroadcast[$i]['values'][] = $splitLine[$i];
+                    }
+                }
             }
         }
-        return -1;
+        return $dataToBroadcast;
     }
 
     private function createReturnArray($dataToBroadcast) {
@@ -0,0 +1,44 @@
+<?php
+
+namespace App\Helpers;
+
+use Illuminate\Support\Facades\Log;
+
+// Client of the resident experiment runner (server_scripts/common/runner.py)
+class ExperimentRunner
+{
+    public static function enabled(): bool {
+        return (bool) config('experiments.runner.enabled');
+    }
+
+    // Reply of the runner to one request, null when it is disabled or not running
+    public static function request(array $request): array | null {
+        if (!self::enabled()) {
+            return null;
+        }
+
+        $socket = @stream_socket_client("unix://" . config('experiments.runner.socket'), $errno, $errstr, 5);
+        if ($socket === false) {
+            Log::channel('server')->error("RUNNER: " . $errstr);
+            return null;
+        }
+
+        // a stop waits for the experiment to end
+        stream_set_timeout($socket, 30);
+        fwrite($socket, json_encode($request) . "\n");
+        $reply = fgets($socket);
+        fclose($socket);
+
+        if ($reply === false) {
+            Log::channel('server')->error("RUNNER: no reply to " . $request['command']);
+            return null;
+        }
+        return json_decode($reply, true);
+    }
+
+    // Whether the runner hosts the experiment right now
+    public static function hosts(int $experimentID): bool {
+        $reply = self::request(['command' => 'status', 'id' => $experimentID]);
+        return $reply !== null && ($reply['running'] ?? false);
+    }
+}
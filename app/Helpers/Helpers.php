@@ -2,6 +2,8 @@
 
 namespace App\Helpers;
 
+use Illuminate\Support\Facades\Log;
+use Symfony\Component\Process\Process;
 
 class Helpers
 {
@@ -32,6 +34,102 @@ class Helpers
     }
 
 
+    // Returns output columns reduced to at most the configured number of points, null when decimation failed
+    public static function decimateOutput(string $outputPath): array | null {
+        $process = new Process([
+            base_path()."/server_scripts/common/decimation.py",
+            $outputPath,
+            '--target', (string) config('experiments.decimation.target'),
+            '--method', config('experiments.decimation.method')
+        ]);
+        $process->run();
+
+        if (!$process->isSuccessful()) {
+            Log::channel('server')->error("DECIMATION: " . $process->getErrorOutput());
+            return null;
+        }
+
+        $result = json_decode($process->getOutput(), true);
+        return $result['columns'] ?? null;
+    }
+
+    // Reply of the runner writing outputPath to a command on its control socket, null when it does not listen
+    public static function controlExperiment(string $outputPath, array $command): array | null {
+        $socketPath = dirname($outputPath) . '/' . pathinfo($outputPath, PATHINFO_FILENAME) . '.ctl';
+        if (!file_exists($socketPath)) {
+            return null;
+        }
+
+        $socket = @stream_socket_client("unix://$socketPath", $errno, $errstr, 5);
+        if ($socket === false) {
+            Log::channel('server')->error("CONTROL: " . $errstr);
+            return null;
+        }
+
+        // a stop is answered once the data is flushed and the device stopped
+        stream_set_timeout($socket, 15);
+        fwrite($socket, json_encode($command) . "\n");
+        $reply = fgets($socket);
+        fclose($socket);
+
+        return $reply === false ? null : json_decode($reply, true);
+    }
+
+    // Output rows as one channel per column, the way the charts get them over websockets
+    public static function formatDataToWebsockets(Array $split, Array $output) {
+        $dataToBroadcast = [];
+        foreach($split as $line) {
+            if ($line != "") {
+                $splitLine = explode(",", $line);
+                for($i = 0; $i < count($splitLine); $i++) {
+                    // channels are indexed by column, no need to search them by title
+                    if (!isset($dataToBroadcast[$i])) {
+                        $dataToBroadcast[$i] = [
+                            "name" => $output[$i]['title'],
+                            "tag" => $output[$i]['name'],
+                            "defaultVisibilityFor" => $output[$i]['defaultVisibilityFor'] ?? [],
+                            "data" => [$splitLine[$i]]
+                        ];
+                    } else {
+                        $dataToBroadcast[$i]['data'][] = $splitLine[$i];
+                    }
+                }
+            }
+        }
+        return array_values($dataToBroadcast);
+    }
+
+    public static function formatColumnsToWebsockets(Array $columns, Array $output) {
+        $dataToBroadcast = [];
+        foreach($columns as $i => $column) {
+            $dataToBroadcast[] = [
+                "name" => $output[$i]['title'],
+                "tag" => $output[$i]['name'],
+                "defaultVisibilityFor" => $output[$i]['defaultVisibilityFor'] ?? [],
+                "data" => $column
+            ];
+        }
+        return $dataToBroadcast;
+    }
+
+    // Message shown to the user for what an LED cube program wrote to stderr
+    public static function parseLEDErrorMessage(string $software, string $errorOutput): string {
+        $errorMessage = '';
+
+        if ($software === "Cpp") {
+            preg_match("/error: '.*?' was not declared in this scope/", $errorOutput, $matches);
+            $errorMessage = $matches[0] ?? ltrim(preg_replace('/\s*\/[^:]+:\d+:\d+:\s*/', '; ', $errorOutput), "; ");
+        }
+        else if ($software === "Python") {
+            preg_match('/\n(.+Error:.+)$/', $errorOutput, $matches);
+            $errorMessage = $matches[1] ?? 'Error not found';
+        } else {
+            $errorMessage = 'Unknown error';
+        }
+
+        return $errorMessage;
+    }
+
     // In case of testing in other simulation software add another case with schema name
     public static function getSchemaNameForLocalStart(string $software): string | null {
         switch($software) {
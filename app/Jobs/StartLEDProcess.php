@@ -60,7 +60,7 @@ class StartLEDProcess implements ShouldQueue
             while ($process->isRunning()) {
                 $errorOutput = $process->getErrorOutput();
                 if ($errorOutput !== "") {
-                    $errorMessage = $this->parseErrorMessage($errorOutput);
+                    $errorMessage = Helpers::parseLEDErrorMessage($this->software, $errorOutput);
                     $result = [
                         'status' => 'error',
                         'experimentID' => $this->experiment->id,
@@ -87,22 +87,4 @@ class StartLEDProcess implements ShouldQueue
         ]);
         $this->delete();
     }
-
-    private function parseErrorMessage($errorOutput)
-    {
-        $errorMessage = '';
-    
-        if ($this->software === "Cpp") {
-            preg_match("/error: '.*?' was not declared in this scope/", $errorOutput, $matches);
-            $errorMessage = $matches[0] ?? ltrim(preg_replace('/\s*\/[^:]+:\d+:\d+:\s*/', '; ', $errorOutput), "; ");
-        } 
-        else if ($this->software === "Python") {
-            preg_match('/\n(.+Error:.+)$/', $errorOutput, $matches);
-            $errorMessage = $matches[1] ?? 'Error not found';
-        } else {
-            $errorMessage = 'Unknown error';
-        }
-    
-        return $errorMessage;
-    }
 }
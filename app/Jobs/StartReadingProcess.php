@@ -77,12 +77,22 @@ class StartReadingProcess implements ShouldQueue
 
         $lastDataLength = 0;
 
+        // Runners which support it push new rows to this socket instead of us re-reading the file
+        $socketPath = dirname($this->fileName) . '/' . pathinfo($this->fileName, PATHINFO_FILENAME) . '.sock';
+        if (file_exists($socketPath)) {
+            unlink($socketPath);
+        }
+        $server = @stream_socket_server("unix://$socketPath", $errno, $errstr);
+        if ($server === false) {
+            Log::channel('server')->error("PUBLISH SOCKET: " . $errstr);
+        }
+
         $process = new Process([
             "$this->path",
             '--port', $this->device->port,
             '--output', $this->fileName,
             '--input', $this->args['runScriptInput']['inputParameter']
-        ]);
+        ], null, $server !== false ? ['OLM_PUBLISH_SOCKET' => $socketPath] : []);
 
         $process->start();
         sleep(1);
@@ -100,10 +110,54 @@ class StartReadingProcess implements ShouldQueue
         }
 
         $dataToBroadcast = [];
+        $client = null;
+        $published = false;
+        $buffer = "";
         // Start Reading From File
-        while($process->isRunning()) {
+        while($process->isRunning() || $client) {
+            if ($client) {
+                // Runner publishes deltas, broadcast only the rows it sent
+                $read = [$client];
+                $write = $except = null;
+                if (@stream_select($read, $write, $except, 0, 200000) > 0) {
+                    $chunk = fread($client, 65536);
+                    if ($chunk === "" || $chunk === false) {
+                        fclose($client);
+                        $client = null;
+                        continue;
+                    }
+                    $buffer .= $chunk;
+                    while (($position = strpos($buffer, "\n")) !== false) {
+                        $message = json_decode(substr($buffer, 0, $position), true);
+                        $buffer = substr($buffer, $position + 1);
+                        if (!empty($message['rows'])) {
+                            $dataToBroadcast = Helpers::formatDataToWebsockets($message['rows'], $output);
+                            broadcast(new DataBroadcaster($dataToBroadcast, $this->device->name, null, false, true));
+                        }
+                    }
+                }
+                continue;
+            }
+
+            if ($server !== false) {
+                $read = [$server];
+                $write = $except = null;
+                if (@stream_select($read, $write, $except, 0, 200000) > 0) {
+                    $client = stream_socket_accept($server, 0);
+                    if ($client === false) {
+                        $client = null;
+                    } else {
+                        $published = true;
+                    }
+                    continue;
+                }
+            } else {
+                usleep(200000);
+            }
+
+            // Runner does not publish, fall back to watching the file
             clearstatcache();
-            if ($this->date != filemtime($this->fileName)) {
+            if (!$published && $this->date != filemtime($this->fileName)) {
                 $this->date = filemtime($this->fileName);
                 $data = file_get_contents(
                     $this->fileName,
@@ -115,24 +169,34 @@ class StartReadingProcess implements ShouldQueue
                 $split = explode("\n", $data);
                 $dataToBroadcast = [];
 
-                $dataToBroadcast = $this->formatDataToWebsockets($split, $output);
+                $dataToBroadcast = Helpers::formatDataToWebsockets($split, $output);
 
                 broadcast(new DataBroadcaster($dataToBroadcast, $this->device->name, null, false));
             }
         };
 
+        if ($server !== false) {
+            fclose($server);
+            @unlink($socketPath);
+        }
+
         // Send Last Message with full data
         if (!$process->isRunning() && count($dataToBroadcast) > 0) {
-            $data = file_get_contents(
-                $this->fileName,
-                false,
-                null,
-                0
-            );
-            $lastDataLength += strlen($data);
-            $split = explode("\n", $data);
+            $columns = Helpers::decimateOutput($this->fileName);
+            if ($columns !== null) {
+                $dataToBroadcast = Helpers::formatColumnsToWebsockets($columns, $output);
+            } else {
+                $data = file_get_contents(
+                    $this->fileName,
+                    false,
+                    null,
+                    0
+                );
+                $lastDataLength += strlen($data);
+                $split = explode("\n", $data);
 
-            $dataToBroadcast = $this->formatDataToWebsockets($split, $output);
+                $dataToBroadcast = Helpers::formatDataToWebsockets($split, $output);
+            }
 
             broadcast(new DataBroadcaster($dataToBroadcast, $this->device->name, null, false));
             broadcast(new DataBroadcaster($dataToBroadcast, $this->device->name, null, true));
@@ -152,42 +216,10 @@ class StartReadingProcess implements ShouldQueue
         Log::channel('server')->info("PROCESS OUTPUT: " . $process->getOutput());
     }
 
-    private function checkKey(Array $dataToBroadcast, String $name) {
-        foreach($dataToBroadcast as $index => $data) {
-            if ($data['name'] == $name) {
-                return $index;
-            }
-        }
-        return -1;
-    }
-
     public function failed() {
         $this->experiment->update([
             'timedout_at' => date("Y-m-d H:i:s")
         ]);
         $this->delete();
     }
-
-    private function formatDataToWebsockets(Array $split, Array $output) {
-        $dataToBroadcast = [];
-        foreach($split as $line) {
-            if ($line != "") {
-                $splitLine = explode(",", $line);
-                for($i = 0; $i < count($splitLine); $i++) {
-                    $index = $this->checkKey($dataToBroadcast, $output[$i]['title']);
-                    if ($index == -1) {
-                        array_push($dataToBroadcast, [
-                            "name" => $output[$i]['title'],
-                            "tag" => $output[$i]['name'],
-                            "defaultVisibilityFor" => $output[$i]['defaultVisibilityFor'] ?? [],
-                            "data" => [$splitLine[$i]]
-                        ]);
-                    } else {
-                        array_push($dataToBroadcast[$index]['data'], $splitLine[$i]);
-                    }
-                }
-            }
-        }
-        return $dataToBroadcast;
-    }
 }
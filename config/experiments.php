@@ -0,0 +1,37 @@
+<?php
+
+return [
+    /*
+    |--------------------------------------------------------------------------
+    | Decimation of experiment data
+    |--------------------------------------------------------------------------
+    |
+    | Maximum number of points per channel sent to the browser in experiment
+    | details and in the final live broadcast, and the method used to pick
+    | them ("lttb" or "minmax"). The exported CSV always contains all data.
+    |
+    */
+
+    'decimation' => [
+        'target' => env('EXPERIMENT_DECIMATION_TARGET', 2000),
+        'method' => env('EXPERIMENT_DECIMATION_METHOD', 'lttb'),
+    ],
+
+    /*
+    |--------------------------------------------------------------------------
+    | Resident experiment runner
+    |--------------------------------------------------------------------------
+    |
+    | When enabled, experiments are started, changed and stopped by the
+    | runner listening on the socket (server_scripts/common/runner.py) and
+    | `php artisan experiments:relay` broadcasts their data, no queue worker
+    | waits for a running experiment. Without a running runner experiments
+    | go to the "Reading" queue as before.
+    |
+    */
+
+    'runner' => [
+        'enabled' => env('EXPERIMENT_RUNNER', false),
+        'socket' => env('EXPERIMENT_RUNNER_SOCKET', '/tmp/olm-runner.sock'),
+    ],
+];
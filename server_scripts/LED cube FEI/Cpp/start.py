@@ -1,15 +1,19 @@
 #!/usr/bin/python3
 
 import argparse
-import subprocess
 import os
 import re
-import time
-import tempfile
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from buildcache import play
+from frametable import generate_sketch
 
-def main():
-    args = getArguments()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from cppbuild import CompileError, CppBuilder, output_lines
+from control import open_control, stop_event
+
+def main(args, stopped):
     
     code_to_run=''
 
@@ -33,15 +37,14 @@ def main():
         code_to_run=args.get("cpp_code", "")
     
 
-    cpp_file_path = create_cpp_file_from_template(code_to_run)
-    arduino_instructions = generate_arduino_instructions(cpp_file_path)
+    arduino_instructions = generate_arduino_instructions(code_to_run)
+    if arduino_instructions is None:
+        # nothing to upload for a program which does not compile, the cube keeps its state
+        sys.exit(1)
 
-    full_arduino_code = generate_arduino_code(arduino_instructions)
+    full_arduino_code = generate_sketch(arduino_instructions)
     
-    compile_and_upload(full_arduino_code, args["port"])
-
-    time.sleep(30)
-    clear_cube(args["port"])
+    play(full_arduino_code, args["port"], stopped)
 
 def getArguments():
     parser = argparse.ArgumentParser()
@@ -69,44 +72,37 @@ def getArguments():
 
     return result
 
-def clear_cube(port):
-  empty_sketch =  '''
-void setup(){}
-
-void loop(){}
-'''
-  compile_and_upload(empty_sketch, port)
-
-def create_cpp_file_from_template(cpp_code):
-    cpp_template = '''
+SAFE_API = '''
 #include <iostream>
 #include <vector>
 
-namespace SafeAPI {{
+namespace SafeAPI {
 
-  void setLed(std::vector<int> position) {{
+  void setLed(std::vector<int> position) {
     int x = position[0];
     int y = position[1];
     int z = position[2];
     std::cout << "setLed(" << x << "," << y << "," << z << ");" << std::endl;
-  }}
+  }
 
-  void clearLed(std::vector<int> position) {{
+  void clearLed(std::vector<int> position) {
     int x = position[0];
     int y = position[1];
     int z = position[2];
     std::cout << "clearLed(" << x << "," << y << "," << z << ");" << std::endl;
-  }}
+  }
 
-  void clearCube() {{
+  void clearCube() {
     std::cout << "clearCube();" << std::endl;
-  }}
+  }
 
-  void sleep(int millis) {{
+  void sleep(int millis) {
     std::cout << "sleep(" << millis << ");" << std::endl;
-  }}
-}}
+  }
+}
+'''
 
+MAIN_TEMPLATE = '''
 int main() {{
     using namespace SafeAPI;
 
@@ -114,215 +110,22 @@ int main() {{
     return 0;
 }}
 '''
-    # Ensure variable name in format matches the placeholder
-    cpp_content = cpp_template.format(cpp_code=cpp_code)
-
-    # Save to a temporary file
-    temp_cpp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".cpp")
-    with open(temp_cpp_file.name, 'w') as file:
-        file.write(cpp_content)
-    
-    return temp_cpp_file.name
 
-def generate_arduino_instructions(cpp_file_path):
-    executable_path = cpp_file_path.rsplit('.', 1)[0]
-    compile_command = f"g++ -std=c++11 {cpp_file_path} -o {executable_path}"
-    output = ""
+def generate_arduino_instructions(cpp_code):
     try:
-        # Compiling the C++ code
-        subprocess.check_call(compile_command, shell=True)
-        print("Compilation successful.")
-
-        # Attempt to run the executable with a timeout
-        process = subprocess.Popen([executable_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        try:
-            output, errors = process.communicate(timeout=0.5)
-        except subprocess.TimeoutExpired:
-            process.kill()
-            output, errors = process.communicate()
-            print(f"Process timed out.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error during compilation or execution: {e}")
-    finally:
-        # Cleanup
-        os.remove(cpp_file_path)
-        if os.path.exists(executable_path):
-            os.remove(executable_path)
-
-    lines = output.splitlines()[:1000]     # Split the output into lines and get only the first 1000 because otherwise compilation takes too long
-
-    output = "\n".join(lines)
-    return output
-
-def generate_arduino_code(cpp_code_snippet):
-    arduino_code_template = '''
-#include <avr/interrupt.h>
-#include <string.h>
-#include <Arduino.h>
-#define AXIS_X 1
-#define AXIS_Y 2
-#define AXIS_Z 3
-
-volatile unsigned char cube[8][8];
-volatile int current_layer = 0;
-
-void setup(){{
-  int i;
-  
-  for(i=0; i<14; i++)
-    pinMode(i, OUTPUT);
-  
-  // pinMode(A0, OUTPUT) as specified in the arduino reference didnt work. So I accessed the registers directly.
-  DDRC = 0xff;
-  PORTC = 0x00;
-  
-  // Reset any PWM configuration that the arduino may have set up automagically!
-  TCCR2A = 0x00;
-  TCCR2B = 0x00;
-
-  TCCR2A |= (0x01 << WGM21); // CTC mode. clear counter on TCNT2 == OCR2A
-  OCR2A = 10; // Interrupt every 25600th cpu cycle (256*100)
-  TCNT2 = 0x00; // start counting at 0
-  TCCR2B |= (0x01 << CS22) | (0x01 << CS21); // Start the clock with a 256 prescaler
-  
-  TIMSK2 |= (0x01 << OCIE2A);
-}}
-
-ISR (TIMER2_COMPA_vect)
-{{
-  int i;
-  
-  // all layer selects off
-  PORTC = 0x00;
-  PORTB &= 0x0f;
-  
-  PORTB |= 0x08; // output enable off.
-  
-  for (i=0; i<8; i++)
-  {{
-    PORTD = cube[current_layer][i];
-    PORTB = (PORTB & 0xF8) | (0x07 & (i+1));
-  }}
-  
-  PORTB &= 0b00110111; // Output enable on.
-  
-  if (current_layer < 6)
-  {{
-    PORTC = (0x01 << current_layer);
-  }} else if (current_layer == 6)
-  {{
-    digitalWrite(12, HIGH);
-  }} else
-  {{
-    digitalWrite(13, HIGH);
-  }}
-  
-  current_layer++;
-  
-  if (current_layer == 8)
-    current_layer = 0;
-}}
-
-void loop()
-{{
-  {}
-}}
-
-
-
-// ==========================================================================================
-//   Draw functions
-// ==========================================================================================
-
-
-// Set a single voxel to ON
-void setLed(int x, int y, int z)
-{{
-  if (inrange(x,y,z))
-    cube[z][y] |= (1 << x);
-}}
-
-
-// Set a single voxel to OFF
-void clearLed(int x, int y, int z)
-{{
-  if (inrange(x,y,z))
-    cube[z][y] &= ~(1 << x);
-}}
-
-// This function validates that we are drawing inside the cube.
-unsigned char inrange(int x, int y, int z)
-{{
-  if (x >= 0 && x < 8 && y >= 0 && y < 8 && z >= 0 && z < 8)
-  {{
-    return 0x01;
-  }} else
-  {{
-    // One of the coordinates was outside the cube.
-    return 0x00;
-  }}
-}}
-
-// Get the current status of a voxel
-unsigned char getLed(int x, int y, int z)
-{{
-  if (inrange(x,y,z))
-  {{
-    if (cube[z][y] & (1 << x))
-    {{
-      return 0x01;
-    }} else
-    {{
-      return 0x00;
-    }}
-  }} else
-  {{
-    return 0x00;
-  }}
-}}
-
-void clearCube(){{
-    int z;
-    int y;
-    for (z = 0; z < 8; z++) {{
-        for (y = 0; y < 8; y++) {{
-            cube[z][y] = 0x00;
-        }}
-    }}
-}}
-
-void sleep(int millis){{
-  delay(millis);
-}}
-'''
-
-    
-    # Insert the C++ code snippet into the template
-    return arduino_code_template.format(cpp_code_snippet)
-
-def compile_and_upload(code, port, board_type="arduino:avr:uno"):
-    # Create a temporary directory to hold the sketch
-    temp_dir = "temp_sketch"
-    os.makedirs(temp_dir, exist_ok=True)
-
-    # Write the Arduino code to a .ino file in the temporary directory
-    sketch_path = os.path.join(temp_dir, "temp_sketch.ino")
-    with open(sketch_path, "w") as file:
-        file.write(code)
-
-    # Compile and upload using Arduino CLI
-    compile_cmd = f"arduino-cli compile --fqbn {board_type} {temp_dir}"
-    upload_cmd = f"arduino-cli upload -p {port} --fqbn {board_type} {temp_dir}"
-
-    try:
-        subprocess.run(compile_cmd, check=True, shell=True)
-        subprocess.run(upload_cmd, check=True, shell=True)
-        print("Upload successful")
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred: {e}")
-
-    # Clean up: remove the temporary directory
-    subprocess.run(f"rm -rf {temp_dir}", shell=True)
+        executable_path = CppBuilder(SAFE_API).build(MAIN_TEMPLATE.format(cpp_code=cpp_code))
+    except CompileError as e:
+        print("Error during compilation or execution.")
+        print(e, file=sys.stderr)
+        return None
+    print("Compilation successful.")
+    return "\n".join(output_lines(executable_path, timeout=0.5))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    args = getArguments()
+    control = open_control(args["output"])
+    try:
+        main(args, stop_event(control))
+    finally:
+        if control:
+            control.close()
\ No newline at end of file
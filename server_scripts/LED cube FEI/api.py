@@ -0,0 +1,22 @@
+"""
+Drawing API of the Python programs for the FEI cube.
+
+Every call prints the C call it stands for, frametable.py turns them into
+the frame table of the sketch. The sandbox workers import this module once
+and hand NAMES to every program.
+"""
+
+NAMES = ("setLed", "clearLed", "clearCube", "sleep")
+
+
+def setLed(position):
+    print(f"setLed({position[0]}, {position[1]}, {position[2]});")
+
+def clearLed(position):
+    print(f"clearLed({position[0]}, {position[1]}, {position[2]});")
+
+def sleep(millis):
+    print(f"sleep({millis});")
+
+def clearCube():
+    print(f"clearCube();")
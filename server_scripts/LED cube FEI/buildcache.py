@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""
+Content-addressed arduino-cli build cache for the FEI LED cube.
+
+A sketch is compiled once per (sketch text, FQBN): the .hex lands in the
+cache under the hash of both and the next run with the same sketch only
+uploads it. Compiles which are needed share a persistent build path per
+board, so the Arduino core and libraries are not rebuilt every time and only
+the sketch itself is compiled. The clear-cube firmware is an ordinary cached
+sketch, build it ahead of the first run with:
+
+    ./buildcache.py --prebuild
+"""
+import argparse
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+BOARD = "arduino:avr:uno"
+CACHE_DIR = os.environ.get("OLM_ARDUINO_CACHE", os.path.join(tempfile.gettempdir(), "olm-arduino"))
+SKETCH_NAME = "olm_cube"
+# hex files kept, the least recently used ones go first
+MAX_ARTIFACTS = 200
+# seconds an uploaded program is shown before the cube is cleared
+PLAYBACK = 30
+
+EMPTY_SKETCH = '''
+void setup(){}
+
+void loop(){}
+'''
+
+
+def sketch_key(code, board_type=BOARD):
+    return hashlib.sha256(board_type.encode() + b"\0" + code.encode()).hexdigest()
+
+
+def hex_path(key):
+    return os.path.join(CACHE_DIR, "hex", key + ".hex")
+
+
+def build_path(board_type):
+    return os.path.join(CACHE_DIR, "build", re.sub(r"[^A-Za-z0-9_.-]", "_", board_type))
+
+
+def prune(keep):
+    artifacts = [os.path.join(CACHE_DIR, "hex", name) for name in os.listdir(os.path.join(CACHE_DIR, "hex"))]
+    artifacts.sort(key=os.path.getmtime)
+    for path in artifacts[:max(0, len(artifacts) - MAX_ARTIFACTS)]:
+        if path != keep:
+            os.remove(path)
+
+
+def build(code, board_type=BOARD):
+    "Path of the .hex of the sketch, compiled only when it is not cached yet"
+    key = sketch_key(code, board_type)
+    artifact = hex_path(key)
+    if os.path.exists(artifact):
+        os.utime(artifact)
+        print("Using cached build " + key[:12])
+        return artifact
+
+    os.makedirs(os.path.dirname(artifact), exist_ok=True)
+    builds = build_path(board_type)
+    os.makedirs(builds, exist_ok=True)
+    # the build path of a board is shared, compiles for it take turns
+    with open(builds + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(artifact):
+            return artifact
+        # same sketch name every time, so the build path only recompiles the sketch itself
+        sketch_dir = os.path.join(builds + "-sketch", SKETCH_NAME)
+        output_dir = sketch_dir + "-output"
+        os.makedirs(sketch_dir, exist_ok=True)
+        with open(os.path.join(sketch_dir, SKETCH_NAME + ".ino"), "w") as file:
+            file.write(code)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        subprocess.run(["arduino-cli", "compile", "--fqbn", board_type, "--build-path", builds,
+                        "--output-dir", output_dir, sketch_dir], check=True)
+        partial = artifact + ".part"
+        shutil.copyfile(os.path.join(output_dir, SKETCH_NAME + ".ino.hex"), partial)
+        os.replace(partial, artifact)
+    prune(artifact)
+    return artifact
+
+
+def upload(artifact, port, board_type=BOARD):
+    subprocess.run(["arduino-cli", "upload", "-p", port, "--fqbn", board_type, "--input-file", artifact], check=True)
+
+
+def compile_and_upload(code, port, board_type=BOARD):
+    try:
+        upload(build(code, board_type), port, board_type)
+        print("Upload successful")
+    except subprocess.CalledProcessError as e:
+        print(f"An error occurred: {e}")
+
+
+def clear_cube(port, board_type=BOARD):
+    compile_and_upload(EMPTY_SKETCH, port, board_type)
+
+
+def play(code, port, stopped, board_type=BOARD):
+    "Upload the sketch and clear the cube once stopped is set or PLAYBACK seconds passed"
+    compile_and_upload(code, port, board_type)
+    stopped.wait(PLAYBACK)
+    clear_cube(port, board_type)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prebuild", action="store_true", help="build the clear-cube firmware")
+    parser.add_argument("--fqbn", default=BOARD)
+    args = parser.parse_args()
+    if args.prebuild:
+        print(build(EMPTY_SKETCH, args.fqbn))
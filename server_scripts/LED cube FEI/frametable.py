@@ -0,0 +1,216 @@
+"""
+Frame table sketch generator for the FEI LED cube.
+
+The generated programs print setLed/clearLed/clearCube/sleep calls. Pasting
+them as statements into loop() made the compile time grow with the length
+of the animation, so runs were cut at 1000 lines. Here the calls are executed
+on an 8x8x8 bit cube instead and every sleep ends a frame: the 8 bytes of
+each of the 8 layers (cube[z][y], bit x) plus the frame duration go into a
+PROGMEM table. The sketch around it is always the same small interpreter
+which copies the current frame into the refresh buffer and waits, so the
+compile time does not depend on the animation and the whole flash is
+available for frames.
+
+loop() keeps repeating the program without clearing the cube, so the second
+pass can start from what the first one left behind. From the second pass on
+every pass is the same, the table holds the first pass once and loops over
+the second one.
+"""
+import re
+
+FRAME_BYTES = 64
+MAX_DURATION = 0xFFFF
+# ATmega328P flash minus the bootloader and the interpreter with its Arduino core
+TABLE_BUDGET = 32 * 1024 - 512 - 3 * 1024
+MAX_FRAMES = TABLE_BUDGET // (FRAME_BYTES + 2)
+
+NUMBER = r"\s*(-?\d+(?:\.\d*)?)\s*"
+CALL = re.compile(r"^\s*(setLed|clearLed)\(" + NUMBER + "," + NUMBER + "," + NUMBER + r"\);?\s*$"
+                  r"|^\s*(clearCube)\(\s*\);?\s*$"
+                  r"|^\s*(sleep)\(" + NUMBER + r"\);?\s*$")
+
+
+def parse(instructions):
+    "(name, arguments) of every call the generator printed, other lines are skipped"
+    calls = []
+    for line in instructions.splitlines():
+        match = CALL.match(line)
+        if match is None:
+            continue
+        if match.group(1):
+            calls.append((match.group(1), [int(float(match.group(i))) for i in (2, 3, 4)]))
+        elif match.group(5):
+            calls.append(("clearCube", []))
+        else:
+            calls.append(("sleep", [int(float(match.group(7)))]))
+    return calls
+
+
+def play(calls, cube):
+    "Run one pass of loop() on cube (64 layer row bytes), returns its frames"
+    frames = []
+    for name, arguments in calls:
+        if name == "sleep":
+            duration = max(0, arguments[0])
+            # delay() of the generated sleep took an int, longer sleeps become several frames
+            while True:
+                frames.append((bytes(cube), min(duration, MAX_DURATION)))
+                duration -= MAX_DURATION
+                if duration <= 0:
+                    break
+        elif name == "clearCube":
+            cube[:] = bytes(FRAME_BYTES)
+        else:
+            x, y, z = arguments
+            if not (0 <= x < 8 and 0 <= y < 8 and 0 <= z < 8):
+                continue
+            if name == "setLed":
+                cube[z * 8 + y] |= 1 << x
+            else:
+                cube[z * 8 + y] &= ~(1 << x) & 0xFF
+    return frames
+
+
+def merge(frames):
+    "Consecutive equal frames become one with the summed duration"
+    merged = []
+    for frame, duration in frames:
+        if merged and merged[-1][0] == frame and merged[-1][1] + duration <= MAX_DURATION:
+            merged[-1] = (frame, merged[-1][1] + duration)
+        else:
+            merged.append((frame, duration))
+    return merged
+
+
+def frame_table(instructions):
+    """
+    (frames, loop_start) of the printed instructions.
+
+    frames are (64 bytes, duration ms) pairs, after the last frame the
+    interpreter continues at loop_start. A program without sleeps shows its
+    final cube for good.
+    """
+    calls = parse(instructions)
+    cube = bytearray(FRAME_BYTES)
+    first = merge(play(calls, cube))
+    steady = merge(play(calls, cube))
+    if not steady:
+        return [(bytes(cube), 0)], 0
+    if first == steady:
+        return steady, 0
+    return first + steady, len(first)
+
+
+def c_bytes(data):
+    return ", ".join("0x%02x" % byte for byte in data)
+
+
+SKETCH = '''
+#include <avr/interrupt.h>
+#include <avr/pgmspace.h>
+#include <string.h>
+#include <Arduino.h>
+
+#define FRAME_COUNT {frame_count}
+#define LOOP_START {loop_start}
+
+const unsigned char frames[FRAME_COUNT][64] PROGMEM = {{
+{frames}
+}};
+
+const unsigned int durations[FRAME_COUNT] PROGMEM = {{
+{durations}
+}};
+
+volatile unsigned char cube[8][8];
+volatile int current_layer = 0;
+int frame = 0;
+
+void setup(){{
+  int i;
+
+  for(i=0; i<14; i++)
+    pinMode(i, OUTPUT);
+
+  // pinMode(A0, OUTPUT) as specified in the arduino reference didnt work. So I accessed the registers directly.
+  DDRC = 0xff;
+  PORTC = 0x00;
+
+  // Reset any PWM configuration that the arduino may have set up automagically!
+  TCCR2A = 0x00;
+  TCCR2B = 0x00;
+
+  TCCR2A |= (0x01 << WGM21); // CTC mode. clear counter on TCNT2 == OCR2A
+  OCR2A = 10; // Interrupt every 25600th cpu cycle (256*100)
+  TCNT2 = 0x00; // start counting at 0
+  TCCR2B |= (0x01 << CS22) | (0x01 << CS21); // Start the clock with a 256 prescaler
+
+  TIMSK2 |= (0x01 << OCIE2A);
+}}
+
+ISR (TIMER2_COMPA_vect)
+{{
+  int i;
+
+  // all layer selects off
+  PORTC = 0x00;
+  PORTB &= 0x0f;
+
+  PORTB |= 0x08; // output enable off.
+
+  for (i=0; i<8; i++)
+  {{
+    PORTD = cube[current_layer][i];
+    PORTB = (PORTB & 0xF8) | (0x07 & (i+1));
+  }}
+
+  PORTB &= 0b00110111; // Output enable on.
+
+  if (current_layer < 6)
+  {{
+    PORTC = (0x01 << current_layer);
+  }} else if (current_layer == 6)
+  {{
+    digitalWrite(12, HIGH);
+  }} else
+  {{
+    digitalWrite(13, HIGH);
+  }}
+
+  current_layer++;
+
+  if (current_layer == 8)
+    current_layer = 0;
+}}
+
+void loop()
+{{
+  int z;
+  int y;
+  for (z = 0; z < 8; z++) {{
+    for (y = 0; y < 8; y++) {{
+      cube[z][y] = pgm_read_byte(&frames[frame][z * 8 + y]);
+    }}
+  }}
+  delay(pgm_read_word(&durations[frame]));
+
+  frame++;
+  if (frame == FRAME_COUNT)
+    frame = LOOP_START;
+}}
+'''
+
+
+def generate_sketch(instructions):
+    "Interpreter sketch with the frame table of the printed instructions"
+    frames, loop_start = frame_table(instructions)
+    if len(frames) > MAX_FRAMES:
+        print(f"Animation has {len(frames)} frames, only the first {MAX_FRAMES} fit into the flash.")
+        frames = frames[:MAX_FRAMES]
+        loop_start = min(loop_start, MAX_FRAMES - 1)
+    return SKETCH.format(
+        frame_count=len(frames),
+        loop_start=loop_start,
+        frames=",\n".join("  {" + c_bytes(frame) + "}" for frame, duration in frames),
+        durations=",\n".join("  %d" % duration for frame, duration in frames),
+    )
@@ -1,16 +1,20 @@
 #!/usr/bin/python3
 
 import argparse
-import subprocess
 import os
-import serial
 import time
-import tempfile
 import re
+import sys
 from multiprocessing import Process
 
-def main():
-  args = getArguments()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from transport import clear_cube, open_transport
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from cppbuild import CompileError, CppBuilder, output_lines
+from control import join_process, open_control, stop_event
+
+def main(args, stopped):
   if(args["demo_name"] and args["demo_name"] != ""):
     demo_file_path = os.path.join(args['uploaded_file'], args['demo_name'] + '.c')
     demo_content: any
@@ -21,12 +25,12 @@ def main():
         print(f"File '{demo_file_path}' not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
-    run_instructions(demo_content, args["port"])
+    run_instructions(demo_content, args["port"], stopped)
 
   elif(args["uploaded_code_file"] and args["uploaded_code_file"] != ""):
-    run_instructions(args["uploaded_code_file"], args["port"])
+    run_instructions(args["uploaded_code_file"], args["port"], stopped)
   else:
-    run_instructions(args["cpp_code"], args["port"])
+    run_instructions(args["cpp_code"], args["port"], stopped)
 
 def getArguments():
     parser = argparse.ArgumentParser()
@@ -56,8 +60,7 @@ def getArguments():
 
     return result
 
-def create_cpp_file_from_template(cpp_code):
-    cpp_template = """
+SAFE_API = """
 #include<iostream>
 #include<chrono>
 #include<thread>
@@ -66,13 +69,13 @@ def create_cpp_file_from_template(cpp_code):
 using namespace std;
 
 
-namespace SafeAPI {{
+namespace SafeAPI {
 
-    int xyzToIndex(int x, int y, int z) {{
+    int xyzToIndex(int x, int y, int z) {
         return z * 8 * 8 + x * 8 + y;
-    }}
+    }
 
-    void setLed(std::vector<int> position, std::vector<int> color) {{
+    void setLed(std::vector<int> position, std::vector<int> color) {
 
         int index = xyzToIndex(position[0], position[1], position[2]);
         int r = color[0];
@@ -80,16 +83,16 @@ namespace SafeAPI {{
         int b = color[2];
 
         cout << "Pixel," << r << "," << g << "," << b << "," << index << endl;
-    }}
+    }
 
-    void clearLed(std::vector<int> position) {{
+    void clearLed(std::vector<int> position) {
 
         int index = xyzToIndex(position[0], position[1], position[2]);
 
         cout << "ClPixel," << index << endl;
-    }}
+    }
 
-    void setLeds(std::vector<std::vector<int>> positions, std::vector<int> color) {{
+    void setLeds(std::vector<std::vector<int>> positions, std::vector<int> color) {
         int r = color[0];
         int g = color[1];
         int b = color[2];
@@ -98,27 +101,29 @@ namespace SafeAPI {{
 
         std::vector<int> indexes;
 
-        for (size_t i = 0; i < positions.size(); ++i) {{
-            if (positions[i].size() == 3) {{ 
+        for (size_t i = 0; i < positions.size(); ++i) {
+            if (positions[i].size() == 3) { 
                 int index = xyzToIndex(positions[i][0], positions[i][1], positions[i][2]);
                 indexes.push_back(index);
                 cout << "," << index;
-            }}
-        }}
+            }
+        }
 
         cout << endl;
-    }}
+    }
 
-    void clearCube() {{
+    void clearCube() {
     cout << "clearCube" << endl;
-    }}
+    }
 
-    void sleep(int millis) {{
+    void sleep(int millis) {
         cout << "sleep" << "," << millis << endl;
 
-    }}
-}}
+    }
+}
+"""
 
+MAIN_TEMPLATE = """
 int main() {{
     using namespace SafeAPI;
 
@@ -127,82 +132,37 @@ int main() {{
 }}
 """
 
-    cpp_content = cpp_template.format(cpp_code=cpp_code)
-
-    temp_cpp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".cpp")
-    with open(temp_cpp_file.name, 'w') as file:
-        file.write(cpp_content)
-    
-    return temp_cpp_file.name
-
-def run_instructions(code, port):
-  cpp_file_path = create_cpp_file_from_template(code)
-  arduino_instructions = generate_arduino_instructions(cpp_file_path)
+def run_instructions(code, port, stopped):
+  arduino_instructions = generate_arduino_instructions(code)
 
   if arduino_instructions:
     instructions = arduino_instructions.split('\n')
     send_serial_instructions_process = Process(target=send_serial_instructions, args=(port, instructions))
     send_serial_instructions_process.start()
 
-    send_serial_instructions_process.join(timeout=30)
-    if send_serial_instructions_process.is_alive():
-        print("Timeout reached. Terminating process now...")
+    if not join_process(send_serial_instructions_process, 30, stopped):
+        print("Stopped. Terminating process now..." if stopped.is_set() else "Timeout reached. Terminating process now...")
         send_serial_instructions_process.terminate()
         send_serial_instructions_process.join()
-        arduinoClear = serial.Serial(port, 250000)
-        arduinoClear.write(b"clearCube\n")
-        arduinoClear.close()
-
-def generate_arduino_instructions(cpp_file_path):
-    executable_path = cpp_file_path.rsplit('.', 1)[0]
-    compile_command = f"g++ -std=c++11 {cpp_file_path} -o {executable_path}"
-    output = ""
+        clear_cube(port)
+
+def generate_arduino_instructions(cpp_code):
     try:
-        # Compiling the C++ code
-        subprocess.check_call(compile_command, shell=True)
-        print("Compilation successful.")
-
-        # Attempt to run the executable with a timeout
-        process = subprocess.Popen([executable_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        try:
-            output, errors = process.communicate(timeout=0.5)
-        except subprocess.TimeoutExpired:
-            process.kill()
-            output, errors = process.communicate()
-            print(f"Process timed out. Partial output: {output.strip()}")
-        return output.strip()
-
-    except subprocess.CalledProcessError as e:
-        print(f"Error during compilation or execution: {e}")
-    finally:
-        # Cleanup
-        os.remove(cpp_file_path)
-        if os.path.exists(executable_path):
-            os.remove(executable_path)
-    return output
+        executable_path = CppBuilder(SAFE_API).build(MAIN_TEMPLATE.format(cpp_code=cpp_code))
+    except CompileError as e:
+        print("Error during compilation or execution.")
+        print(e, file=sys.stderr)
+        return ""
+    print("Compilation successful.")
+    return "\n".join(output_lines(executable_path, timeout=0.5)).strip()
 
 def send_serial_instructions(port, instructions):
-    arduino = serial.Serial(port, 250000)
-    wait_for_acknowledgement(arduino)  #this instead of time.sleep(2)
-
-
-    for instruction in instructions:
-        arduino.write((instruction + '\n').encode())
-        
-        wait_for_acknowledgement(arduino)
-
-    arduino.write(b"clearCube\n")
-
-    if arduino:
-        arduino.close()
-
-def wait_for_acknowledgement(arduino):
-    while True:
-        if arduino.in_waiting > 0:
-            line = arduino.readline().decode().strip()
-            if line == "ACK":
-                print("ACK received")
-                break
+    transport = open_transport(port)
+    try:
+        transport.send(instructions)
+        transport.clear()
+    finally:
+        transport.close()
 
 def time_it(func):
     def wrapper(*args, **kwargs):
@@ -214,4 +174,10 @@ def time_it(func):
     return wrapper
 
 if __name__ == '__main__':
-    main()
+    args = getArguments()
+    control = open_control(args["output"])
+    try:
+        main(args, stop_event(control))
+    finally:
+        if control:
+            control.close()
@@ -2,19 +2,24 @@
 
 import argparse
 import os
-import serial
-import time
-import math
-import random
-from multiprocessing import Process, Manager
+from multiprocessing import Process
 import re
 import sys
-import tempfile
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from transport import clear_cube, open_transport
 
-def main():
-    args=getArguments()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from sandbox import prefetch, run_code
+from control import join_process, open_control, stop_event
 
+API = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api.py")
+CPU_BUDGET = 0.25
+INSTRUCTION_BUDGET = 50000
+SEND_TIMEOUT = 30
+
+
+def main(args, stopped):
     if(args["demo_name"] and args["demo_name"] != ""):
         demo_file_path = os.path.join(args['uploaded_file'], args['demo_name'] + '.py')
         demo_content: any
@@ -25,12 +30,12 @@ def main():
             print(f"File '{demo_file_path}' not found.")
         except Exception as e:
             print(f"An error occurred: {e}")
-        run_process(demo_content, args["port"])
+        run_process(demo_content, args["port"], stopped)
 
     elif(args["uploaded_code_file"] and args["uploaded_code_file"] != ""):
-        run_process(args["uploaded_code_file"], args["port"])
+        run_process(args["uploaded_code_file"], args["port"], stopped)
     elif(args["python_code"] and args["python_code"] != ""):
-        run_process(args["python_code"], args["port"])
+        run_process(args["python_code"], args["port"], stopped)
     else:
         return
 
@@ -55,138 +60,39 @@ def getArguments():
     result['output'] = args.output
     return result
 
-def process_wrapper(shared_dict, code, temp_file_path):
-    output = generate_arduino_instructions(code, temp_file_path)
-    shared_dict['output'] = output
-    
-def run_process(code, port):
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file_path = temp_file.name
+def run_process(code, port, stopped):
+    # the program runs in the sender process, so the timeout covers generating and sending
+    send_serial_instructions_process = Process(target=send_serial_instructions, args=(port, code))
+    send_serial_instructions_process.start()
 
-    with Manager() as manager:
-        shared_dict = manager.dict()
+    if not join_process(send_serial_instructions_process, SEND_TIMEOUT, stopped):
+        print("Stopped. Terminating process now..." if stopped.is_set() else "Timeout reached. Terminating process now...")
+        send_serial_instructions_process.terminate()
+        send_serial_instructions_process.join()
 
-        code_process = Process(target=process_wrapper, args=(shared_dict, code, temp_file_path))
-        code_process.start()
-        code_process.join(timeout=0.1)
+        clear_cube(port)
 
-        if code_process.is_alive():
-            print("Timeout reached. Terminating process now...")
-            code_process.terminate()
-            code_process.join()
+    print("Process has been terminated.")
 
+def send_serial_instructions(port, code):
+    # instructions are sent while the program still generates them, it is started
+    # first so it runs during the handshake of the cube
+    submission = run_code(API, code, CPU_BUDGET, INSTRUCTION_BUDGET, SEND_TIMEOUT)
+    instructions = prefetch(submission)
+    transport = open_transport(port)
     try:
-        with open(temp_file_path, 'r') as file:
-            output = file.read()
-            instructions = output.split('\n')
-    
-            send_serial_instructions_process = Process(target=send_serial_instructions, args=(port, instructions))
-            send_serial_instructions_process.start()
-
-            send_serial_instructions_process.join(timeout=30)
-            if send_serial_instructions_process.is_alive():
-                print("Timeout reached. Terminating process now...")
-                send_serial_instructions_process.terminate()
-                send_serial_instructions_process.join()
-
-                arduinoClear = serial.Serial(port, 250000)
-                arduinoClear.write(b"clearCube\n")
-                arduinoClear.close()
-
-            print("Process has been terminated.")
-
-    except IOError:
-        print("Failed to read output from the temporary file.")
-
-        os.remove(temp_file_path)
-        print("Process has been terminated.")
-
-def generate_arduino_instructions(code, temp_file_path):
-    local_scope = {
-        'setLed': setLed,
-        'clearLed': clearLed,
-        'setLeds': setLeds,
-        'clearCube': clearCube,
-        'sleep': sleep,
-        'math': math,
-        'random': random
-    }
-
-    with open(temp_file_path, "w") as temp_file:
-        old_stdout = sys.stdout
-        sys.stdout = temp_file
-
-        try:
-            exec(code, local_scope)
-        except Exception as e:
-            print(f"Error executing dynamic code: {e}")
-            raise(e)
-
-        sys.stdout = old_stdout
-
-def send_serial_instructions(port, instructions):
-
-    # arduino_init_start = time.time()
-
-    arduino = serial.Serial(port, 250000)
-    wait_for_acknowledgement(arduino)  #this instead of time.sleep(2)
-
-    # arduino_end_time = time.time()
-    # arduino_duration = arduino_end_time - arduino_init_start
-    # print(f"Arduino connection established in {arduino_duration} seconds")
-
-    #time.sleep(2)
-
-
-    for instruction in instructions:
-        # instruction_start_time = time.time()
-
-        # print(f"Sending instruction to Arduino: {instruction}")
-        
-        arduino.write((instruction + '\n').encode())
-        
-        wait_for_acknowledgement(arduino)
-        # instruction_end_time = time.time()
-        # instruction_duration = instruction_end_time - instruction_start_time
-        # print(f"instruction executed in {instruction_duration} seconds")
-
-    arduino.write(b"clearCube\n")
-
-    if arduino:
-        arduino.close()
-
-def wait_for_acknowledgement(arduino):
-    while True:
-        if arduino.in_waiting > 0:
-            line = arduino.readline().decode().strip()
-            if line == "ACK":
-                # print("ACK received")
-                break
-
-def setLed(position, color):
-    index = xyz_to_index(position[0], position[1], position[2])
-    instruction = f"Pixel,{color[0]},{color[1]},{color[2]},{index}"
-    print(instruction)
-
-def clearLed(position):
-    index = xyz_to_index(position[0], position[1], position[2])
-    instruction = f"ClPixel,{index}"
-    print(instruction)
-
-def setLeds(positions, color):
-    indexes = [xyz_to_index(pos[0], pos[1], pos[2]) for pos in positions]
-    instruction = f"Pixels,{color[0]},{color[1]},{color[2]},"
-    instruction += ",".join(map(str, indexes))
-    print(instruction)
-
-def clearCube():
-    print("clearCube\n")
-
-def sleep(millis):
-    print(f"sleep,{millis}")
-
-def xyz_to_index(x, y, z):
-    return z * 8 * 8 + x * 8 + y
+        transport.send(instructions)
+        transport.clear()
+    finally:
+        instructions.close()
+        transport.close()
+    submission.report()
 
 if __name__ == '__main__':
-    main()
+    args = getArguments()
+    control = open_control(args["output"])
+    try:
+        main(args, stop_event(control))
+    finally:
+        if control:
+            control.close()
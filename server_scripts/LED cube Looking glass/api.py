@@ -0,0 +1,90 @@
+"""
+Drawing API of the Python programs for the Looking Glass cube.
+
+Every per-voxel call prints one instruction line for the firmware. The bulk
+calls draw into the voxel buffer of canvas.py, show() sends what changed
+since the last frame. The sandbox workers import this module once and hand
+NAMES to every program.
+"""
+import numpy as np
+
+from canvas import Canvas, coordinates
+
+NAMES = ("setLed", "clearLed", "setLeds", "clearCube", "sleep",
+         "setMask", "setColors", "fillBox", "fillPlane", "drawLine", "drawSphere",
+         "shift", "rotate", "show", "getColors", "coordinates", "np")
+
+canvas = Canvas()
+
+
+def setLed(position, color):
+    index = xyz_to_index(position[0], position[1], position[2])
+    instruction = f"Pixel,{color[0]},{color[1]},{color[2]},{index}"
+    print(instruction)
+    canvas.drawn(index, color)
+
+def clearLed(position):
+    index = xyz_to_index(position[0], position[1], position[2])
+    instruction = f"ClPixel,{index}"
+    print(instruction)
+    canvas.drawn(index, (0, 0, 0))
+
+def setLeds(positions, color):
+    indexes = [xyz_to_index(pos[0], pos[1], pos[2]) for pos in positions]
+    instruction = f"Pixels,{color[0]},{color[1]},{color[2]},"
+    instruction += ",".join(map(str, indexes))
+    print(instruction)
+    canvas.drawn(indexes, color)
+
+def clearCube():
+    print("clearCube\n")
+    canvas.cleared()
+
+def sleep(millis):
+    # what was drawn into the buffer is shown before the pause
+    show()
+    print(f"sleep,{millis}")
+
+def xyz_to_index(x, y, z):
+    return z * 8 * 8 + x * 8 + y
+
+def setMask(mask, color):
+    "Set the voxels where the 8x8x8 [x, y, z] mask is True"
+    canvas.set_mask(mask, color)
+
+def setColors(colors):
+    "Set every voxel from an 8x8x8x3 [x, y, z] color array"
+    canvas.set_colors(colors)
+
+def getColors():
+    "Copy of the buffer as an 8x8x8x3 [x, y, z] color array"
+    return canvas.voxels.copy()
+
+def fillBox(start, end, color):
+    "Box between two corners, both included"
+    canvas.fill_box(start, end, color)
+
+def fillPlane(axis, position, color):
+    "Whole plane of the axis ('x', 'y' or 'z') at position"
+    canvas.fill_plane(axis, position, color)
+
+def drawLine(start, end, color):
+    canvas.line(start, end, color)
+
+def drawSphere(center, radius, color, filled=False):
+    canvas.sphere(center, radius, color, filled)
+
+def shift(dx, dy, dz, wrap=False):
+    "Move the buffer, voxels moved out come back on the other side with wrap"
+    canvas.shift((dx, dy, dz), wrap)
+
+def rotate(axis, turns=1):
+    "Turn the buffer by quarter turns around the axis"
+    canvas.rotate(axis, turns)
+
+def show(millis=0):
+    "Send the voxels changed since the last frame, then wait millis"
+    for line in canvas.show():
+        print(line)
+    if millis:
+        print(f"sleep,{millis}")
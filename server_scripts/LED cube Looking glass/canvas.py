@@ -0,0 +1,146 @@
+"""
+Voxel buffer behind the bulk drawing calls of the Looking Glass API.
+
+Programs draw into an 8x8x8 RGB buffer with whole-array operations (masks,
+planes, boxes, lines, spheres, shifts, rotations) and commit it with show().
+Only the voxels which differ from what the cube shows are sent: one Pixels
+line per color (Pixel or ClPixel for a single voxel), or clearCube and the
+lit voxels when that is shorter to send.
+
+The per-voxel calls print their instruction right away and update the cube
+state here as well, so both kinds of calls can be mixed in a program.
+"""
+import numpy as np
+
+from frames import VOXELS, empty_frame, packed_colors
+
+SIZE = 8
+AXES = {"x": 0, "y": 1, "z": 2}
+# axes of the plane turned by a rotation around the key
+PLANES = {"x": (1, 2), "y": (2, 0), "z": (0, 1)}
+
+
+def rgb(color):
+    "Color components are bytes on the firmware side"
+    return np.asarray(color, dtype=np.int64) & 0xFF
+
+
+def axis_number(axis):
+    if axis in AXES:
+        return AXES[axis]
+    if axis in (0, 1, 2):
+        return axis
+    raise ValueError("Axis has to be 'x', 'y' or 'z'")
+
+
+def color_lines(frame, indexes):
+    "Fewest lines setting the voxels at indexes to their color in frame"
+    if not len(indexes):
+        return []
+    colors, inverse = np.unique(packed_colors(frame[indexes]), return_inverse=True)
+    lines = []
+    for number, color in enumerate(colors):
+        group = indexes[inverse == number]
+        r, g, b = (int(color) >> 16) & 0xFF, (int(color) >> 8) & 0xFF, int(color) & 0xFF
+        if len(group) > 1:
+            lines.append(f"Pixels,{r},{g},{b}," + ",".join(map(str, group)))
+        elif color == 0:
+            lines.append(f"ClPixel,{group[0]}")
+        else:
+            lines.append(f"Pixel,{r},{g},{b},{group[0]}")
+    return lines
+
+
+def frame_lines(shown, frame):
+    "Shortest lines turning the shown frame into frame"
+    changed = np.flatnonzero((shown != frame).any(axis=1))
+    delta = color_lines(frame, changed)
+    if len(delta) <= 1:
+        return delta
+    redraw = ["clearCube"] + color_lines(frame, np.flatnonzero(frame.any(axis=1)))
+    # a redraw never has fewer lines than the delta, it can have fewer voxel indexes to send
+    return redraw if sent(redraw) < sent(delta) else delta
+
+
+def sent(lines):
+    "Bytes the lines take on the serial port"
+    return sum(len(line) + 1 for line in lines)
+
+
+class Canvas:
+    """The buffer being drawn and the state of the cube."""
+
+    def __init__(self):
+        self.frame = empty_frame()
+        self.shown = empty_frame()
+        # [x, y, z] view of the buffer, voxel index is z * 64 + x * 8 + y
+        self.voxels = self.frame.reshape(SIZE, SIZE, SIZE, 3).transpose(1, 2, 0, 3)
+
+    def drawn(self, indexes, color):
+        "Voxels a per-voxel call has set on the cube"
+        indexes = [index for index in np.atleast_1d(indexes) if 0 <= index < VOXELS]
+        self.frame[indexes] = rgb(color)
+        self.shown[indexes] = rgb(color)
+
+    def cleared(self):
+        self.frame[:] = 0
+        self.shown[:] = 0
+
+    def show(self):
+        "Lines committing the buffer to the cube"
+        lines = frame_lines(self.shown, self.frame)
+        self.shown[:] = self.frame
+        return lines
+
+    def set_mask(self, mask, color):
+        self.voxels[np.asarray(mask, dtype=bool)] = rgb(color)
+
+    def set_colors(self, colors):
+        self.voxels[:] = rgb(colors)
+
+    def fill_box(self, start, end, color):
+        # a box partly outside of the cube is cut, one entirely outside draws nothing
+        low = np.maximum(np.minimum(start, end), 0)
+        high = np.minimum(np.maximum(start, end), SIZE - 1) + 1
+        self.voxels[low[0]:high[0], low[1]:high[1], low[2]:high[2]] = rgb(color)
+
+    def fill_plane(self, axis, position, color):
+        if 0 <= position < SIZE:
+            index = [slice(None)] * 3
+            index[axis_number(axis)] = position
+            self.voxels[tuple(index)] = rgb(color)
+
+    def line(self, start, end, color):
+        start = np.asarray(start, dtype=float)
+        end = np.asarray(end, dtype=float)
+        steps = int(np.abs(end - start).max()) + 1
+        points = np.rint(np.linspace(start, end, steps)).astype(int)
+        points = points[((points >= 0) & (points < SIZE)).all(axis=1)]
+        self.voxels[points[:, 0], points[:, 1], points[:, 2]] = rgb(color)
+
+    def sphere(self, center, radius, color, filled=False):
+        distance = np.sqrt(sum((grid - value) ** 2 for grid, value in zip(coordinates(), center)))
+        if filled:
+            self.set_mask(distance <= radius + 0.5, color)
+        else:
+            self.set_mask(np.abs(distance - radius) <= 0.5, color)
+
+    def shift(self, offset, wrap=False):
+        moved = self.voxels.copy()
+        for axis, steps in enumerate(offset):
+            if steps == 0:
+                continue
+            moved = np.roll(moved, steps, axis=axis)
+            if not wrap:
+                index = [slice(None)] * 3
+                index[axis] = slice(0, steps) if steps > 0 else slice(steps, None)
+                moved[tuple(index)] = 0
+        self.voxels[:] = moved
+
+    def rotate(self, axis, turns=1):
+        self.voxels[:] = np.rot90(self.voxels.copy(), turns, axes=PLANES["xyz"[axis_number(axis)]])
+
+
+def coordinates():
+    "x, y and z of every voxel as [x, y, z] arrays, for building masks"
+    return np.indices((SIZE, SIZE, SIZE))
@@ -0,0 +1,248 @@
+"""
+Voxel frame buffer and binary frame packets for the Looking Glass cube.
+
+The generated programs describe animations as text instructions (Pixel,
+Pixels, ClPixel, clearCube, sleep). FrameEncoder replays them on an 8x8x8 RGB
+frame buffer, a frame ends at every sleep. Only the voxels which differ from
+the frame shown before are sent, as one binary packet per frame: a palette of
+the colors used and, for every color, the changed voxel indexes as a list,
+as runs or as a 512 bit bitmap, whichever is the shortest. When clearing the
+cube first is cheaper, a key frame is sent instead of the delta.
+
+The packet layout the firmware decodes is described in binary_protocol.md.
+"""
+import struct
+
+import numpy as np
+
+VOXELS = 8 * 8 * 8
+
+SYNC = 0xA5
+DELTA = 0x01
+KEY = 0x02
+
+LIST = 0
+RUNS = 1
+BITMAP = 2
+
+MAX_SLEEP = 0xFFFF
+MAX_PALETTE = 255
+MAX_RUN = 255
+
+HEADER = struct.Struct("<BBHH")
+GROUP = struct.Struct("<BBH")
+
+
+def empty_frame():
+    return np.zeros((VOXELS, 3), dtype=np.uint8)
+
+
+def packed_colors(colors):
+    "One integer per RGB row, used to group voxels of equal color"
+    colors = colors.astype(np.uint32)
+    return (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+
+def encode_indexes(indexes):
+    "Shortest (encoding, count, data) of a sorted index array"
+    candidates = [(LIST, len(indexes), indexes.astype("<u2").tobytes())]
+    if len(indexes) == 1:
+        # a single run or a bitmap is never shorter
+        return candidates[0]
+
+    breaks = np.flatnonzero(np.diff(indexes) != 1) + 1
+    starts = np.r_[indexes[:1], indexes[breaks]]
+    lengths = np.diff(np.r_[0, breaks, len(indexes)])
+    # runs longer than a byte are split
+    pieces = -(-lengths // MAX_RUN)
+    if pieces.max() > 1:
+        starts = np.concatenate([start + np.arange(count) * MAX_RUN for start, count in zip(starts, pieces)])
+        lengths = np.concatenate([np.r_[np.full(count - 1, MAX_RUN), length - (count - 1) * MAX_RUN]
+                                  for length, count in zip(lengths, pieces)])
+    runs = np.zeros(len(starts), dtype=[("start", "<u2"), ("length", "u1")])
+    runs["start"] = starts
+    runs["length"] = lengths
+    candidates.append((RUNS, len(runs), runs.tobytes()))
+
+    bitmap = np.zeros(VOXELS, dtype=bool)
+    bitmap[indexes] = True
+    candidates.append((BITMAP, len(indexes), np.packbits(bitmap, bitorder="little").tobytes()))
+
+    return min(candidates, key=lambda candidate: len(candidate[2]))
+
+
+def encode_groups(frame, indexes):
+    "Palettes and groups of the voxels at indexes, split by MAX_PALETTE colors"
+    if not len(indexes):
+        return [(b"", b"")]
+    colors, inverse = np.unique(packed_colors(frame[indexes]), return_inverse=True)
+    # indexes grouped by color, still sorted within a group
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(colors) + 1))
+    chunks = []
+    for first in range(0, len(colors), MAX_PALETTE):
+        palette = bytearray()
+        groups = bytearray()
+        for number, color in enumerate(colors[first:first + MAX_PALETTE]):
+            palette += bytes(((int(color) >> 16) & 0xFF, (int(color) >> 8) & 0xFF, int(color) & 0xFF))
+            group = indexes[order[bounds[first + number]:bounds[first + number + 1]]]
+            encoding, count, data = encode_indexes(group)
+            groups += GROUP.pack(number, encoding, count) + data
+        chunks.append((bytes(palette), bytes(groups)))
+    return chunks
+
+
+def packet(kind, sleep, palette, groups):
+    payload = bytes((len(palette) // 3,)) + palette + groups
+    checksum = 0
+    for byte in payload:
+        checksum ^= byte
+    return HEADER.pack(SYNC, kind, len(payload), sleep) + payload + bytes((checksum,))
+
+
+def encode_frame(previous, frame, sleep=0):
+    """
+    Packets turning the previous frame into frame, then waiting sleep ms.
+
+    The last packet carries the sleep, sleeps longer than a packet can hold
+    are followed by empty packets.
+    """
+    changed = np.flatnonzero((previous != frame).any(axis=1))
+    delta = encode_groups(frame, changed)
+    key = encode_groups(frame, np.flatnonzero(frame.any(axis=1)))
+    kind = DELTA
+    size = sum(len(palette) + len(groups) for palette, groups in delta)
+    if sum(len(palette) + len(groups) for palette, groups in key) < size:
+        kind, delta = KEY, key
+
+    sleeps = [min(sleep, MAX_SLEEP)]
+    sleep -= sleeps[0]
+    while sleep > 0:
+        sleeps.append(min(sleep, MAX_SLEEP))
+        sleep -= sleeps[-1]
+
+    packets = []
+    for number, (palette, groups) in enumerate(delta):
+        # only the first packet of a key frame clears the cube
+        packets.append(packet(kind if number == 0 else DELTA, 0, palette, groups))
+    last = packets.pop()
+    packets.append(last[:4] + struct.pack("<H", sleeps[0]) + last[6:])
+    for extra in sleeps[1:]:
+        packets.append(packet(DELTA, extra, b"", b""))
+    return packets
+
+
+def packet_sleep(data):
+    "Milliseconds the firmware waits after showing the packet"
+    if len(data) >= HEADER.size and data[0] == SYNC:
+        return HEADER.unpack_from(data)[3]
+    return 0
+
+
+def voxel(text):
+    index = int(text)
+    if not 0 <= index < VOXELS:
+        raise IndexError("Voxel " + text + " is outside of the cube")
+    return index
+
+
+def color(parts):
+    "Color components are bytes on the firmware side"
+    if len(parts) != 3:
+        raise ValueError("Color needs three components")
+    return [int(value) & 0xFF for value in parts]
+
+
+class FrameEncoder:
+    """Replays text instructions on the frame buffer and emits frame packets."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        "Both the frame being drawn and the frame on the cube are dark"
+        self.frame = empty_frame()
+        self.shown = empty_frame()
+
+    def apply(self, instruction):
+        "Draw one instruction, returns the sleep in ms when it ends the frame"
+        try:
+            return self.draw(instruction.strip().split(","))
+        except (ValueError, IndexError):
+            # the firmware skips malformed lines as well
+            return None
+
+    def draw(self, parts):
+        name = parts[0]
+        if name == "Pixel":
+            self.frame[voxel(parts[4])] = color(parts[1:4])
+        elif name == "Pixels":
+            indexes = [int(value) for value in parts[4:] if value != ""]
+            self.frame[[index for index in indexes if 0 <= index < VOXELS]] = color(parts[1:4])
+        elif name == "ClPixel":
+            self.frame[voxel(parts[1])] = 0
+        elif name == "clearCube":
+            self.frame[:] = 0
+        elif name == "sleep":
+            return int(parts[1])
+        return None
+
+    def feed(self, instruction):
+        "Packets of the frame the instruction completes, none while a frame is drawn"
+        sleep = self.apply(instruction)
+        if sleep is None:
+            return []
+        return self.flush(sleep)
+
+    def flush(self, sleep=0):
+        "Show the frame drawn so far"
+        if sleep == 0 and (self.frame == self.shown).all():
+            return []
+        packets = encode_frame(self.shown, self.frame, sleep)
+        self.shown = self.frame.copy()
+        return packets
+
+
+def compile_frames(instructions):
+    "(frame, sleep ms) of every frame of an instruction stream"
+    encoder = FrameEncoder()
+    frames = []
+    for instruction in instructions:
+        sleep = encoder.apply(instruction)
+        if sleep is not None:
+            frames.append((encoder.frame.copy(), sleep))
+    if not frames or (encoder.frame != frames[-1][0]).any():
+        frames.append((encoder.frame.copy(), 0))
+    return frames
+
+
+def decode_packet(data, frame):
+    "Reference decoder, applies a packet to frame in place and returns its sleep"
+    sync, kind, length, sleep = HEADER.unpack_from(data)
+    payload = data[HEADER.size:HEADER.size + length]
+    checksum = 0
+    for byte in payload:
+        checksum ^= byte
+    if sync != SYNC or checksum != data[HEADER.size + length]:
+        raise ValueError("Corrupt packet")
+    if kind == KEY:
+        frame[:] = 0
+    colors = payload[0]
+    palette = np.frombuffer(payload[1:1 + colors * 3], dtype=np.uint8).reshape(colors, 3)
+    offset = 1 + colors * 3
+    while offset < len(payload):
+        number, encoding, count = GROUP.unpack_from(payload, offset)
+        offset += GROUP.size
+        if encoding == LIST:
+            indexes = np.frombuffer(payload, "<u2", count, offset)
+            offset += count * 2
+        elif encoding == RUNS:
+            runs = np.frombuffer(payload, [("start", "<u2"), ("length", "u1")], count, offset)
+            offset += count * 3
+            indexes = np.concatenate([np.arange(start, start + length) for start, length in runs])
+        else:
+            bitmap = np.unpackbits(np.frombuffer(payload, np.uint8, VOXELS // 8, offset), bitorder="little")
+            offset += VOXELS // 8
+            indexes = np.flatnonzero(bitmap)
+        frame[indexes] = palette[number]
+    return sleep
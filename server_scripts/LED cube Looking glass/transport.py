@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+"""
+Instruction transport for the Looking Glass LED cube.
+
+The firmware answers every instruction line with "ACK" once it has executed
+it. Sending one line and waiting for its ACK bounds an animation by the USB
+round trip, so the transport keeps a window of unacknowledged instructions in
+flight instead: at most `window` lines and at most `window_bytes` bytes, which
+keeps the Arduino's 64 byte receive buffer from overflowing while it renders.
+Reads block with a timeout, nothing spins on in_waiting.
+
+Opening the port resets the Arduino, which greets with an ACK when it is
+ready. Run the resident driver to keep the port open between runs:
+
+    ./transport.py --port /dev/ttyACM0
+
+start.py then sends its instructions through the driver socket and the cube
+is not reset on every run.
+"""
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+import serial
+
+from frames import FrameEncoder, packet_sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from unixserver import ThreadingUnixServer
+
+BAUDRATE = 250000
+SOCKET_DIR = os.environ.get("OLM_CUBE_DIR", "/tmp")
+
+# the Arduino serial receive buffer
+WINDOW_BYTES = 64
+WINDOW = 8
+ACK_TIMEOUT = 2.0
+# time the board needs to boot after the reset caused by opening the port
+RESET_TIMEOUT = 3.0
+
+END = b"END\n"
+
+# send frame packets, only for firmware with the binary decoder
+BINARY = os.environ.get("OLM_CUBE_BINARY", "0") == "1"
+
+
+class TransportTimeout(Exception):
+    pass
+
+
+def socket_path(port):
+    "Path of the driver socket for the given port"
+    return os.path.join(SOCKET_DIR, "olm-cube-" + os.path.basename(port) + ".sock")
+
+
+def sleep_duration(line):
+    "Seconds the firmware spends executing the line"
+    if line.startswith(b"sleep,"):
+        try:
+            return int(line[6:]) / 1000
+        except ValueError:
+            pass
+    return 0.0
+
+
+def encode(instruction):
+    "Instruction line as sent on the wire, None for blank lines"
+    instruction = instruction.strip()
+    if not instruction:
+        return None
+    return instruction.encode() + b"\n"
+
+
+class CubeTransport:
+    """Windowed, pipelined instruction sender owning the serial port."""
+
+    def __init__(self, port, window=WINDOW, window_bytes=WINDOW_BYTES, timeout=ACK_TIMEOUT, binary=False):
+        self.window = window
+        self.window_bytes = window_bytes
+        self.timeout = timeout
+        self.serial = serial.Serial(port, BAUDRATE, timeout=timeout)
+        self.in_flight = deque()
+        self.in_flight_bytes = 0
+        self.sent = 0
+        # frame packets instead of text lines, needs the binary_protocol.md decoder in the firmware
+        self.encoder = FrameEncoder() if binary else None
+
+    def handshake(self, timeout=RESET_TIMEOUT):
+        "Wait for the greeting of a freshly reset board, boards without auto-reset send none"
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.serial.timeout = max(0.0, deadline - time.monotonic())
+            if self.serial.readline().strip() == b"ACK":
+                break
+        self.serial.timeout = self.timeout
+
+    def wait_ack(self):
+        # a sleep instruction is only acknowledged after it elapsed
+        self.serial.timeout = self.timeout + sum(duration for size, duration in self.in_flight)
+        while True:
+            line = self.serial.readline()
+            if not line.endswith(b"\n"):
+                raise TransportTimeout("No ACK from the cube in " + str(self.serial.timeout) + " s")
+            if line.strip() == b"ACK":
+                size, duration = self.in_flight.popleft()
+                self.in_flight_bytes -= size
+                return
+
+    def write(self, line, duration=None):
+        "Send one encoded line or packet once there is credit for it"
+        # a line longer than the window goes alone
+        while self.in_flight and (len(self.in_flight) >= self.window
+                                  or self.in_flight_bytes + len(line) > self.window_bytes):
+            self.wait_ack()
+        self.serial.write(line)
+        if duration is None:
+            duration = sleep_duration(line)
+        self.in_flight.append((len(line), duration))
+        self.in_flight_bytes += len(line)
+        self.sent += 1
+
+    def drain(self):
+        "Wait until every line sent was executed"
+        while self.in_flight:
+            self.wait_ack()
+
+    def submit(self, instruction):
+        "Send a text instruction, or the frame packets it completes in binary mode"
+        if self.encoder is None:
+            line = encode(instruction)
+            if line is not None:
+                self.write(line)
+            return
+        for data in self.encoder.feed(instruction):
+            self.write(data, packet_sleep(data) / 1000)
+
+    def finish(self):
+        "Show what was drawn after the last sleep and wait until everything was executed"
+        if self.encoder is not None:
+            for data in self.encoder.flush():
+                self.write(data, packet_sleep(data) / 1000)
+        self.drain()
+
+    def send(self, instructions):
+        for instruction in instructions:
+            self.submit(instruction)
+        self.finish()
+
+    def clear(self):
+        self.write(b"clearCube\n")
+        self.drain()
+        if self.encoder is not None:
+            self.encoder.reset()
+
+    def abort(self):
+        "Clear the cube after a cut off run, the lines still in flight are dropped"
+        try:
+            self.clear()
+        except TransportTimeout:
+            self.serial.reset_input_buffer()
+            self.in_flight.clear()
+            self.in_flight_bytes = 0
+            if self.encoder is not None:
+                self.encoder.reset()
+
+    def close(self):
+        self.serial.close()
+
+
+class DriverRequestHandler(socketserver.StreamRequestHandler):
+    """One run: instruction lines until END, answered with OK or ERROR."""
+
+    def handle(self):
+        transport = self.server.transport
+        with self.server.lock:
+            try:
+                for line in self.rfile:
+                    if line == END:
+                        transport.finish()
+                        transport.clear()
+                        self.wfile.write(b"OK\n")
+                        return
+                    transport.submit(line.decode())
+            except Exception as e:
+                print("Run failed:", e, file=sys.stderr)
+                try:
+                    self.wfile.write(b"ERROR " + str(e).encode() + b"\n")
+                except OSError:
+                    pass
+            # the client went away or failed mid-run
+            transport.abort()
+
+
+class DriverServer(ThreadingUnixServer):
+
+    def __init__(self, path, transport):
+        self.transport = transport
+        self.lock = threading.Lock()
+        super().__init__(path, DriverRequestHandler)
+
+
+class DriverClient:
+    """Run sent through the resident driver, same calls as DirectTransport."""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.file = self.sock.makefile("rb")
+
+    def send(self, instructions):
+        for instruction in instructions:
+            line = encode(instruction)
+            if line is not None:
+                self.sock.sendall(line)
+
+    def clear(self):
+        self.sock.sendall(END)
+        reply = self.file.readline().strip()
+        if reply != b"OK":
+            raise TransportTimeout(reply.decode() or "The cube driver closed the connection")
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class DirectTransport:
+    """Fallback used when no driver is running for the port."""
+
+    def __init__(self, port):
+        self.transport = CubeTransport(port, binary=BINARY)
+        self.transport.handshake()
+
+    def send(self, instructions):
+        self.transport.send(instructions)
+
+    def clear(self):
+        self.transport.clear()
+
+    def close(self):
+        self.transport.close()
+
+
+def open_transport(port):
+    "Connect to the driver of the port if it runs, otherwise open the port directly"
+    path = socket_path(port)
+    if os.path.exists(path):
+        try:
+            return DriverClient(path)
+        except OSError:
+            pass
+    return DirectTransport(port)
+
+
+def clear_cube(port):
+    "Switch the cube off after an interrupted run"
+    if os.path.exists(socket_path(port)):
+        # the driver clears the cube itself when a run is cut off
+        return
+    arduino = serial.Serial(port, BAUDRATE)
+    arduino.write(b"clearCube\n")
+    arduino.close()
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", required=True)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--window-bytes", type=int, default=WINDOW_BYTES)
+    parser.add_argument("--timeout", type=float, default=ACK_TIMEOUT)
+    parser.add_argument("--binary", action="store_true", default=BINARY)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    transport = CubeTransport(args.port, args.window, args.window_bytes, args.timeout, args.binary)
+    transport.handshake()
+    transport.clear()
+    with DriverServer(socket_path(args.port), transport) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path(args.port))
+            transport.close()
@@ -0,0 +1,280 @@
+#!/usr/bin/python3
+"""
+Virtual Looking Glass cube on a pseudo-terminal, for measuring and testing
+the instruction path without the hardware.
+
+The cube speaks the firmware protocol: text instructions (Pixel, Pixels,
+ClPixel, clearCube, sleep) and the frame packets of binary_protocol.md, each
+answered with ACK once it was executed. Bytes travel at the baud rate in
+both directions, every instruction costs `cost` seconds plus `voxel_cost`
+per voxel it draws, and a sleep keeps the cube busy for its duration. What
+arrives while the cube is busy waits in a receive buffer of `rx_buffer`
+bytes, instructions which do not fit any more are lost and counted as
+overflows, like on the Arduino. Opening the port resets the cube, which
+greets with ACK after `boot_time`.
+
+    ./virtualcube.py --link /tmp/virtual-cube
+
+start.py and transport.py can then use --port /tmp/virtual-cube. The voxel
+state and the counters are printed whenever the port is closed, programs
+using VirtualCube directly read them from frame and stats().
+"""
+import argparse
+import json
+import os
+import select
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from frames import HEADER, SYNC, FrameEncoder, decode_packet, packet_sleep
+from transport import BAUDRATE, sleep_duration
+
+# the Arduino serial receive buffer
+RX_BUFFER = 64
+# firmware time to parse and render one instruction
+COST = 0.0002
+VOXEL_COST = 0.0
+BOOT_TIME = 0.1
+
+ACK = b"ACK\n"
+
+
+def voxel_count(unit):
+    "Voxels an instruction or packet draws, for the per voxel cost"
+    if unit[:1] == bytes((SYNC,)):
+        return len(unit) // 2
+    if unit.startswith(b"Pixels,"):
+        return unit.count(b",") - 3
+    if unit.startswith(b"clearCube"):
+        return 512
+    return 1
+
+
+def split_unit(data):
+    "(unit, rest) of the first complete line or packet in data, None while incomplete"
+    if data[:1] == bytes((SYNC,)):
+        if len(data) < HEADER.size:
+            return None
+        size = HEADER.size + HEADER.unpack_from(data)[2] + 1
+        if len(data) < size:
+            return None
+        return bytes(data[:size]), data[size:]
+    end = data.find(b"\n")
+    if end < 0:
+        return None
+    return bytes(data[:end + 1]), data[end + 1:]
+
+
+class VirtualCube:
+    """The emulated cube, served by a thread on the master side of a pty."""
+
+    def __init__(self, link, baudrate=BAUDRATE, cost=COST, voxel_cost=VOXEL_COST,
+                 rx_buffer=RX_BUFFER, boot_time=BOOT_TIME, verbose=False):
+        self.link = link
+        self.verbose = verbose
+        # 8N1, ten bits per byte
+        self.byte_time = 10 / baudrate
+        self.cost = cost
+        self.voxel_cost = voxel_cost
+        self.rx_buffer = rx_buffer
+        self.boot_time = boot_time
+
+        self.master, slave = os.openpty()
+        name = os.ttyname(slave)
+        # the port counts as closed until a client opens it
+        os.close(slave)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(name, link)
+
+        self.lock = threading.Lock()
+        self.state = FrameEncoder()
+        self.running = False
+        self.thread = None
+        self.reset_stats()
+        self.disconnect()
+
+    @property
+    def frame(self):
+        "Voxel colors of the cube by index, a copy"
+        with self.lock:
+            return self.state.frame.copy()
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters = dict.fromkeys(("connections", "instructions", "packets", "frames", "bytes",
+                                           "overflows", "lost_at_boot", "malformed"), 0)
+            self.latencies = []
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = np.array(self.latencies)
+        if len(latencies):
+            for percentile in (50, 90, 99):
+                stats["ack_p%d_ms" % percentile] = round(float(np.percentile(latencies, percentile)) * 1000, 3)
+        return stats
+
+    def disconnect(self):
+        self.connected = False
+        self.pending = bytearray()
+        self.pending_since = None
+        # (arrival, start, size) of the instructions received, the ones not started yet fill the buffer
+        self.received = deque()
+        # (time, unit to draw or None for an ACK, time the first byte was sent), in time order
+        self.events = deque()
+        self.wire_free = 0.0
+        self.back_free = 0.0
+        self.busy_until = 0.0
+        self.booted = 0.0
+
+    def connect(self, now):
+        self.connected = True
+        self.booted = now + self.boot_time
+        with self.lock:
+            self.state.reset()
+            self.counters["connections"] += 1
+        # the greeting
+        self.events.append((self.booted, None, None))
+
+    def receive(self, data, now):
+        "Schedule the units completed by data, read from the master at now"
+        start = max(now, self.wire_free)
+        self.wire_free = start + len(data) * self.byte_time
+        # position of the end of the next unit in data
+        offset = -len(self.pending)
+        if self.pending_since is None:
+            self.pending_since = now
+        self.pending += data
+        while True:
+            split = split_unit(self.pending)
+            if split is None:
+                return
+            unit, self.pending = split
+            offset += len(unit)
+            # when the last byte of the unit arrived
+            arrival = start + offset * self.byte_time
+            self.execute(unit, arrival, self.pending_since)
+            self.pending_since = now if self.pending else None
+
+    def execute(self, unit, arrival, sent):
+        if arrival < self.booted:
+            with self.lock:
+                self.counters["lost_at_boot"] += 1
+            return
+        while self.received and self.received[0][1] <= arrival:
+            self.received.popleft()
+        waiting = sum(size for received, started, size in self.received)
+        if self.busy_until > arrival and waiting + len(unit) > self.rx_buffer:
+            with self.lock:
+                self.counters["overflows"] += 1
+            return
+        begin = max(arrival, self.busy_until)
+        drawn = begin + self.cost + self.voxel_cost * voxel_count(unit)
+        if unit[:1] == bytes((SYNC,)):
+            sleep = packet_sleep(unit) / 1000
+        else:
+            sleep = sleep_duration(unit)
+        # the ACK goes out once the unit and its sleep are done
+        self.busy_until = drawn + sleep
+        self.received.append((arrival, begin, len(unit)))
+        self.events.append((drawn, unit, None))
+        self.events.append((self.busy_until, None, sent))
+
+    def apply(self, unit):
+        "Draw a unit on the voxel state"
+        with self.lock:
+            self.counters["bytes"] += len(unit)
+            try:
+                if unit[:1] == bytes((SYNC,)):
+                    self.counters["packets"] += 1
+                    sleep = decode_packet(unit, self.state.frame)
+                else:
+                    self.counters["instructions"] += 1
+                    sleep = self.state.draw(unit.decode().strip().split(","))
+            except (ValueError, IndexError, UnicodeDecodeError):
+                self.counters["malformed"] += 1
+                return
+            # every sleep and every packet ends a frame
+            if sleep is not None:
+                self.counters["frames"] += 1
+
+    def acknowledge(self, now):
+        "Draw and acknowledge what is due"
+        while self.events and self.events[0][0] <= now:
+            due, unit, sent = self.events.popleft()
+            if unit is not None:
+                self.apply(unit)
+                continue
+            self.back_free = max(due, self.back_free) + len(ACK) * self.byte_time
+            os.write(self.master, ACK)
+            if sent is not None:
+                with self.lock:
+                    self.latencies.append(self.back_free - sent)
+
+    def serve(self):
+        poll = select.poll()
+        poll.register(self.master, select.POLLIN)
+        while self.running:
+            now = time.monotonic()
+            timeout = 0.05
+            if self.events:
+                timeout = max(0.0, min(timeout, self.events[0][0] - now))
+            events = poll.poll(timeout * 1000)
+            now = time.monotonic()
+            if any(event & select.POLLHUP for fd, event in events):
+                if self.connected:
+                    self.disconnect()
+                    if self.verbose:
+                        print(json.dumps(self.stats()), flush=True)
+                time.sleep(0.01)
+                continue
+            if not self.connected:
+                self.connect(now)
+            if any(event & select.POLLIN for fd, event in events):
+                try:
+                    self.receive(os.read(self.master, 4096), now)
+                except OSError:
+                    continue
+            self.acknowledge(time.monotonic())
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        os.close(self.master)
+        if os.path.islink(self.link):
+            os.remove(self.link)
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--link", default="/tmp/virtual-cube", help="path the port is linked to")
+    parser.add_argument("--baudrate", type=int, default=BAUDRATE)
+    parser.add_argument("--cost", type=float, default=COST, help="seconds per instruction")
+    parser.add_argument("--voxel-cost", type=float, default=VOXEL_COST, help="seconds per voxel drawn")
+    parser.add_argument("--rx-buffer", type=int, default=RX_BUFFER)
+    parser.add_argument("--boot-time", type=float, default=BOOT_TIME)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    cube = VirtualCube(args.link, args.baudrate, args.cost, args.voxel_cost, args.rx_buffer, args.boot_time, True)
+    cube.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cube.stop()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""
+Instructions, bytes and generation time of Looking Glass demos written with
+the per-voxel calls and with the bulk calls of the voxel buffer.
+
+Both versions of a demo draw the same frames, the programs run in this
+process with their output captured, so the sandbox is not included:
+
+    ./looking_glass_canvas.py
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube Looking glass"))
+import api
+from canvas import Canvas
+from frames import compile_frames
+
+PLANE_SWEEP = '''
+for frame in range(64):
+    clearCube()
+    for x in range(8):
+        for y in range(8):
+            setLed([x, y, frame % 8], [0, 32 * (frame % 8), 255])
+    sleep(20)
+'''
+
+PLANE_SWEEP_BULK = '''
+for frame in range(64):
+    fillBox([0, 0, 0], [7, 7, 7], [0, 0, 0])
+    fillPlane("z", frame % 8, [0, 32 * (frame % 8), 255])
+    show(20)
+'''
+
+SPHERE = '''
+for frame in range(32):
+    radius = 1 + frame % 4
+    clearCube()
+    for x in range(8):
+        for y in range(8):
+            for z in range(8):
+                distance = math.sqrt((x - 3.5) ** 2 + (y - 3.5) ** 2 + (z - 3.5) ** 2)
+                if abs(distance - radius) <= 0.5:
+                    setLed([x, y, z], [255, 64 * (frame % 4), 0])
+    sleep(30)
+'''
+
+SPHERE_BULK = '''
+for frame in range(32):
+    radius = 1 + frame % 4
+    setColors(np.zeros((8, 8, 8, 3)))
+    drawSphere([3.5, 3.5, 3.5], radius, [255, 64 * (frame % 4), 0])
+    show(30)
+'''
+
+SCROLL = '''
+lit = [(x, y) for x in range(8) for y in range(8) if (x + y) % 3 == 0]
+for frame in range(64):
+    clearCube()
+    for x, y in lit:
+        setLed([(x + frame) % 8, y, 0], [0, 255, 0])
+        setLed([(x + frame) % 8, y, 7], [0, 255, 0])
+    sleep(10)
+'''
+
+SCROLL_BULK = '''
+x, y, z = coordinates()
+setMask(((x + y) % 3 == 0) & ((z == 0) | (z == 7)), [0, 255, 0])
+show(10)
+for frame in range(63):
+    shift(1, 0, 0, wrap=True)
+    show(10)
+'''
+
+
+def run(code):
+    "Lines the program prints and the seconds it took"
+    api.canvas = Canvas()
+    scope = {name: getattr(api, name) for name in api.NAMES}
+    scope["math"] = __import__("math")
+    output = io.StringIO()
+    began = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        exec(code, scope)
+    seconds = time.perf_counter() - began
+    return [line for line in output.getvalue().splitlines() if line.strip()], seconds
+
+
+if __name__ == '__main__':
+    print("%-12s %-9s %8s %10s %10s %7s" % ("demo", "calls", "lines", "bytes", "run [ms]", "same"))
+    for name, voxel, bulk in (("plane sweep", PLANE_SWEEP, PLANE_SWEEP_BULK),
+                              ("sphere", SPHERE, SPHERE_BULK),
+                              ("scroll", SCROLL, SCROLL_BULK)):
+        results = [run(voxel), run(bulk)]
+        frames = [compile_frames(lines) for lines, seconds in results]
+        same = len(frames[0]) == len(frames[1]) and all(
+            (a == b).all() and sleep_a == sleep_b for (a, sleep_a), (b, sleep_b) in zip(*frames))
+        for kind, (lines, seconds) in zip(("per-voxel", "bulk"), results):
+            print("%-12s %-9s %8d %10d %10.1f %7s" % (
+                name, kind, len(lines), sum(len(line) + 1 for line in lines), seconds * 1000, same))
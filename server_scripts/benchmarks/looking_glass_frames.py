@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""
+Bytes on the wire and frame rate of Looking Glass animations sent as text
+instructions and as binary frame packets.
+
+The frame rate is the bound the 250000 baud link sets (10 bits per byte),
+firmware render time is not included:
+
+    ./looking_glass_frames.py
+"""
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube Looking glass"))
+from frames import FrameEncoder
+
+BAUDRATE = 250000
+SIZE = 8
+
+
+def index(x, y, z):
+    return z * 8 * 8 + x * 8 + y
+
+
+def plane_sweep(frames=64):
+    "A full colored plane moving through the cube, the way the demos draw it"
+    for frame in range(frames):
+        z = frame % SIZE
+        yield "clearCube"
+        for x in range(SIZE):
+            for y in range(SIZE):
+                yield "Pixel,0,%d,255,%d" % (32 * z, index(x, y, z))
+        yield "sleep,20"
+
+
+def full_cube(frames=32):
+    "Every voxel redrawn in a new color each frame"
+    for frame in range(frames):
+        for voxel in range(SIZE ** 3):
+            yield "Pixel,%d,%d,%d,%d" % ((frame * 8) % 256, 255 - voxel // 2, voxel % 256, voxel)
+        yield "sleep,20"
+
+
+def spiral(frames=128):
+    "A few moving voxels leaving the rest of the cube lit"
+    for voxel in range(SIZE ** 3):
+        yield "Pixel,10,10,10,%d" % voxel
+    for frame in range(frames):
+        angle = frame * math.pi / 16
+        x = int(3.5 + 3.5 * math.cos(angle))
+        y = int(3.5 + 3.5 * math.sin(angle))
+        yield "Pixels,255,0,0,%s" % ",".join(str(index(x, y, z)) for z in range(SIZE))
+        yield "sleep,10"
+        yield "Pixels,10,10,10,%s" % ",".join(str(index(x, y, z)) for z in range(SIZE))
+
+
+def measure(instructions):
+    text = sum(len(instruction) + 1 for instruction in instructions)
+    frames = sum(1 for instruction in instructions if instruction.startswith("sleep"))
+    encoder = FrameEncoder()
+    began = time.perf_counter()
+    packets = []
+    for instruction in instructions:
+        packets.extend(encoder.feed(instruction))
+    packets.extend(encoder.flush())
+    encoding = time.perf_counter() - began
+    binary = sum(len(packet) for packet in packets)
+    return frames, text, binary, encoding
+
+
+def fps(frames, size):
+    return frames / (size * 10 / BAUDRATE)
+
+
+if __name__ == '__main__':
+    print("%-12s %7s %11s %11s %10s %10s %12s" % (
+        "animation", "frames", "text [B]", "binary [B]", "text fps", "binary fps", "encode [ms]"))
+    for name, animation in (("plane sweep", plane_sweep), ("full cube", full_cube), ("spiral", spiral)):
+        frames, text, binary, encoding = measure(list(animation()))
+        print("%-12s %7d %11d %11d %10.1f %10.1f %12.1f" % (
+            name, frames, text, binary, fps(frames, text), fps(frames, binary), encoding * 1000))
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+Throughput of the Looking Glass instruction path against the virtual cube.
+
+The programs run through the real send_serial_instructions of the Python
+runner (sandbox, transport and handshake included) on a pty cube with the
+firmware costs given below, once as text lines and once as binary frame
+packets. Stop-and-wait sends the same lines with a window of one line:
+
+    ./looking_glass_throughput.py --cost 0.0002
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube Looking glass", "Python"))
+import start
+import transport
+from sandbox import run_code
+from virtualcube import COST, VOXEL_COST, VirtualCube
+
+LINK = "/tmp/olm-benchmark-cube"
+
+PROGRAMS = {
+    "moving voxel": '''
+for frame in range(2000):
+    setLed([frame % 8, (frame // 8) % 8, (frame // 64) % 8], [255, 0, 0])
+    sleep(1)
+    clearLed([frame % 8, (frame // 8) % 8, (frame // 64) % 8])
+''',
+    "plane sweep": '''
+for frame in range(200):
+    clearCube()
+    fillPlane("z", frame % 8, [0, 32 * (frame % 8), 255])
+    show(1)
+''',
+    "per-voxel fill": '''
+for frame in range(16):
+    for x in range(8):
+        for y in range(8):
+            for z in range(8):
+                setLed([x, y, z], [frame * 16, x * 32, y * 32])
+    sleep(1)
+''',
+}
+
+
+def stop_and_wait(port, code):
+    "The lines of the program sent one at a time"
+    lines = list(run_code(start.API, code, start.CPU_BUDGET, start.INSTRUCTION_BUDGET))
+    cube = transport.CubeTransport(port, window=1)
+    try:
+        cube.handshake()
+        cube.send(lines)
+        cube.clear()
+    finally:
+        cube.close()
+
+
+def measure(cube, send, code):
+    cube.reset_stats()
+    began = time.monotonic()
+    send(LINK, code)
+    seconds = time.monotonic() - began
+    # the port is closed once the run is done, the cube resets with the next one
+    time.sleep(0.05)
+    stats = cube.stats()
+    stats["seconds"] = seconds
+    stats["lit"] = int(cube.frame.any(axis=1).sum())
+    return stats
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cost", type=float, default=COST)
+    parser.add_argument("--voxel-cost", type=float, default=VOXEL_COST)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    cube = VirtualCube(LINK, cost=args.cost, voxel_cost=args.voxel_cost).start()
+    try:
+        print("%-15s %-14s %8s %8s %10s %9s %8s %8s %8s %9s" % (
+            "program", "mode", "units", "seconds", "units/s", "frames/s",
+            "p50 [ms]", "p90 [ms]", "p99 [ms]", "overflows"))
+        for name, code in PROGRAMS.items():
+            for mode in ("stop-and-wait", "text", "binary"):
+                transport.BINARY = mode == "binary"
+                send = stop_and_wait if mode == "stop-and-wait" else start.send_serial_instructions
+                stats = measure(cube, send, code)
+                units = stats["instructions"] + stats["packets"]
+                print("%-15s %-14s %8d %8.2f %10.0f %9.1f %8.2f %8.2f %8.2f %9d" % (
+                    name, mode, units, stats["seconds"], units / stats["seconds"],
+                    stats["frames"] / stats["seconds"], stats.get("ack_p50_ms", 0),
+                    stats.get("ack_p90_ms", 0), stats.get("ack_p99_ms", 0), stats["overflows"]))
+                # every run ends with the cube cleared
+                assert stats["lit"] == 0 and stats["malformed"] == 0
+    finally:
+        cube.stop()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""
+Compares the old get_param busy-spin with waitForCompletion on FakeEngine.
+
+Reports CPU time spent waiting, number of engine round trips and the delay
+between the model stopping and the wait returning:
+
+    ./matlab_completion.py --duration 5 --latency 0.0005
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a", "matlab"))
+from completion import completionTimeout, waitForCompletion
+from fake_engine import FakeEngine
+
+MODEL = "benchmark_model"
+
+
+def busySpin(engine):
+    while engine.get_param(MODEL, 'SimulationStatus') != 'stopped':
+        pass
+
+
+def backoff(engine):
+    waitForCompletion(engine, MODEL, completionTimeout(engine.runDuration))
+
+
+def measure(wait, duration, latency):
+    engine = FakeEngine(runDuration=duration, latency=latency)
+    engine.set_param(MODEL, 'SimulationCommand', 'start', nargout=0)
+    calls = engine.calls
+    cpu = time.process_time()
+    wait(engine)
+    returned = time.monotonic()
+    cpu = time.process_time() - cpu
+    result = {
+        "cpu": cpu,
+        "round_trips": engine.calls - calls,
+        "stop_latency": returned - engine.stoppedAt(MODEL),
+    }
+    engine.quit()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    print("%-12s %10s %12s %16s" % ("method", "cpu [s]", "round trips", "stop latency [ms]"))
+    for name, wait in (("busy-spin", busySpin), ("backoff", backoff)):
+        result = measure(wait, args.duration, args.latency)
+        print("%-12s %10.3f %12d %16.1f" % (name, result["cpu"], result["round_trips"], result["stop_latency"] * 1000))
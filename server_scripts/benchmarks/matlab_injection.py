@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+"""
+Compares per-value workspace assignment with the batched parameter injection
+on FakeEngine.
+
+Reports the engine round trips and the time the workspace setup takes for a
+typical TOS1A argument map:
+
+    ./matlab_injection.py --latency 0.002
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a", "matlab"))
+from fake_engine import FakeEngine
+from parameters import inject, parseParameters
+from session import DEFAULTS
+
+ARGS = {
+    "s_rate": "200", "t_sim": "60", "input_lamp": "50", "input_fan": "30", "input_led": "20",
+    "reg_request": "35", "P": "1.2", "I": "0.4", "D": "0", "vystupy": "[1 2 3 4 5]",
+    "matrix": "[1 0; 0 1]", "time": "[0:0.1:1]", "uploaded_file": "/tmp", "file_name": "model",
+    "port": "/dev/ttyACM0", "output_path": "/tmp/out.txt",
+}
+
+
+def perValue(engine, args):
+    for key, value in DEFAULTS.items():
+        engine.workspace[key] = value
+    for key, value in args.items():
+        try:
+            engine.workspace[key] = float(value)
+        except ValueError:
+            if '[' in value:
+                engine.eval('assignin("base", "' + key + '", eval("' + value + '"))', nargout=0)
+
+
+def batched(engine, args):
+    inject(engine, parseParameters(args, DEFAULTS))
+
+
+def measure(setup, latency):
+    engine = FakeEngine(latency=latency)
+    began = time.monotonic()
+    setup(engine, ARGS)
+    result = {"round_trips": engine.calls, "seconds": time.monotonic() - began}
+    engine.quit()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    print("%-12s %12s %12s" % ("method", "round trips", "time [ms]"))
+    for name, setup in (("per-value", perValue), ("batched", batched)):
+        result = measure(setup, args.latency)
+        print("%-12s %12d %12.1f" % (name, result["round_trips"], result["seconds"] * 1000))
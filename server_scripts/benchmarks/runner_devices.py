@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+"""
+Many TOS1A openloop experiments at once, each as its own start.py process
+(what the queue workers run) and all of them hosted by the resident runner.
+
+Every experiment samples its own virtual board replaying public/file.csv,
+halfway through the run every one gets new inputs (change.py or a change
+request to the runner). The table shows per device count the processes it
+took, their resident memory and CPU time per sample, the slowest achieved
+rate, the worst scheduler lateness and the slowest change:
+
+    ./runner_devices.py --devices 1,5,10,20 --duration 5 --rate 50
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TOM1A = os.path.join(SCRIPTS, "tom1a")
+sys.path.insert(0, TOM1A)
+from virtualdevice import LATENCY, VirtualDevice
+
+LINK = "/tmp/olm-benchmark-runner-%d"
+SOCKET = "/tmp/olm-benchmark-runner.sock"
+
+
+def residentMB(pids):
+    "Resident memory of the processes in MB"
+    total = 0
+    for pid in pids:
+        try:
+            with open("/proc/%d/status" % pid) as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+def request(message):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(SOCKET)
+    file = sock.makefile("rwb")
+    file.write(json.dumps(message).encode() + b"\n")
+    file.flush()
+    reply = json.loads(file.readline())
+    sock.close()
+    return reply
+
+
+def inputs(options):
+    return "t_sim:%g,s_rate:%g,c_lamp:50,c_led:0,c_fan:20" % (options.duration, options.rate)
+
+
+def runProcesses(outputs, options):
+    "One start.py per device, returns the process count, memory and change times"
+    experiments = [subprocess.Popen([sys.executable, os.path.join(TOM1A, "openloop", "start.py"),
+                                     "--port", LINK % number, "--input", inputs(options), "--output", output],
+                                    stdout=subprocess.DEVNULL)
+                   for number, output in enumerate(outputs)]
+    time.sleep(options.duration / 2)
+    memory = residentMB([experiment.pid for experiment in experiments])
+    changes = []
+    for number in range(len(outputs)):
+        began = time.monotonic()
+        subprocess.run([sys.executable, os.path.join(TOM1A, "openloop", "change.py"), "--port", LINK % number,
+                        "--input", "c_lamp:80,c_fan:30,c_led:10"], check=True)
+        changes.append(time.monotonic() - began)
+    for experiment in experiments:
+        experiment.wait()
+    return len(experiments), memory, changes
+
+
+def runRunner(outputs, options):
+    "All devices in one runner, returns the process count, memory and change times"
+    runner = subprocess.Popen([sys.executable, os.path.join(SCRIPTS, "common", "runner.py"), "--socket", SOCKET],
+                              stdout=subprocess.DEVNULL)
+    while not os.path.exists(SOCKET):
+        time.sleep(0.01)
+    for number, output in enumerate(outputs):
+        reply = request({"command": "start", "id": number, "device": "tom1a", "software": "openloop",
+                         "script": os.path.join(TOM1A, "openloop", "start.py"), "port": LINK % number,
+                         "output": output, "input": inputs(options)})
+        assert reply["status"] == "success", reply
+    time.sleep(options.duration / 2)
+    memory = residentMB([runner.pid])
+    changes = []
+    for number in range(len(outputs)):
+        began = time.monotonic()
+        request({"command": "change", "id": number, "input": "c_lamp:80,c_fan:30,c_led:10"})
+        changes.append(time.monotonic() - began)
+    while request({"command": "status"})["experiments"]:
+        time.sleep(0.05)
+    runner.terminate()
+    runner.wait()
+    return 1, memory, changes
+
+
+def run(mode, count, options):
+    devices = [VirtualDevice(LINK % number, latency=options.latency, seed=number).start() for number in range(count)]
+    outputs = []
+    for number in range(count):
+        output = tempfile.NamedTemporaryFile(suffix=".csv", delete=False).name
+        os.remove(output)
+        outputs.append(output)
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        processes, memory, changes = (runProcesses if mode == "processes" else runRunner)(outputs, options)
+    finally:
+        for device in devices:
+            device.stop()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    rows = []
+    lateness = []
+    for output in outputs:
+        timing = os.path.splitext(output)[0] + ".timing.json"
+        with open(output) as file:
+            rows.append(sum(1 for line in file if line.strip()))
+        with open(timing) as file:
+            lateness.append(json.load(file).get("jitter", {}).get("p99", float("nan")))
+        os.remove(output)
+        os.remove(timing)
+    # the CPU time of change.py counts as well, it is part of serving the devices
+    cpu = after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+    return {
+        "devices": count,
+        "processes": processes,
+        "memory_mb": memory,
+        "cpu_per_sample_ms": cpu / sum(rows) * 1000 if sum(rows) else float("nan"),
+        "min_achieved_hz": min(rows) / options.duration,
+        "lateness_p99_ms": max(lateness) * 1000,
+        "change_max_ms": max(changes) * 1000,
+    }
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", default="1,5,10,20", help="numbers of devices running at once")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=50, help="sampling period in ms (s_rate)")
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    options = getArguments()
+    columns = ("devices", "processes", "memory_mb", "cpu_per_sample_ms", "min_achieved_hz",
+               "lateness_p99_ms", "change_max_ms")
+    print("%-10s" % "mode", " ".join("%17s" % column for column in columns))
+    for count in [int(count) for count in options.devices.split(",")]:
+        for mode in ("processes", "runner"):
+            result = run(mode, count, options)
+            print("%-10s" % mode, " ".join("%17.2f" % result[column] for column in columns))
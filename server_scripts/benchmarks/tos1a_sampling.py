@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""
+Sampling path of the TOS1A openloop experiment against the virtual device.
+
+openloop/start.py runs as in production on a pty device replaying
+public/file.csv, halfway through the run change.py sets new inputs. For
+every requested sampling period the table shows the achieved rate, the
+scheduler wake-up lateness, the CPU time of start.py per sample (with its
+interpreter start), the delay from the device reply (and from the read
+reaching the device) to the row appearing in the output file, and how long
+change.py took to reach the device. With --control the change goes to the
+control socket of start.py instead:
+
+    ./tos1a_sampling.py --duration 5 --rates 200,50,20 --latency 0.002
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+TOM1A = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a")
+sys.path.insert(0, TOM1A)
+sys.path.insert(0, os.path.join(TOM1A, "..", "common"))
+from virtualdevice import DATA, LATENCY, VirtualDevice
+from control import control_path, send_command
+
+LINK = "/tmp/olm-benchmark-tos1a"
+
+
+def percentile(values, share):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class OutputWatcher(threading.Thread):
+    """Notes when every row of the output file appears on disk."""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.rows = []
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not os.path.exists(self.path) and not self.stopping.is_set():
+            time.sleep(0.001)
+        pending = b""
+        with open(self.path, "rb") as file:
+            while True:
+                data = file.read()
+                now = time.monotonic()
+                pending += data
+                *lines, pending = pending.split(b"\n")
+                self.rows.extend((now, line) for line in lines if line)
+                if not data:
+                    if self.stopping.is_set():
+                        return
+                    time.sleep(0.001)
+
+
+def replyDelays(replies, rows):
+    "(read to row, reply to row) of every row, matched in order by the device values"
+    delays = []
+    position = 0
+    for seen, row in rows:
+        # time, 17 device values, 3 inputs
+        body = b",".join(row.split(b",")[1:-3])
+        for index in range(position, len(replies)):
+            requested, replied, reply = replies[index]
+            if reply == body:
+                delays.append((seen - requested, seen - replied))
+                position = index + 1
+                break
+    return delays
+
+
+def run(device, period, options):
+    device.resetStats()
+    output = tempfile.NamedTemporaryFile(suffix=".csv", delete=False).name
+    os.remove(output)
+    watcher = OutputWatcher(output)
+    watcher.start()
+    inputs = "t_sim:%g,s_rate:%g,c_lamp:50,c_led:0,c_fan:20" % (options.duration, period)
+    command = [sys.executable, os.path.join(TOM1A, "openloop", "start.py"), "--port", LINK,
+               "--input", inputs, "--output", output,
+               "--flush-rows", str(options.flush_rows), "--flush-interval", str(options.flush_interval)]
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    experiment = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+    time.sleep(options.duration / 2)
+    changed = time.monotonic()
+    if options.control:
+        send_command(control_path(output), {"command": "change", "input": "c_lamp:80,c_fan:30,c_led:10"})
+    else:
+        subprocess.run([sys.executable, os.path.join(TOM1A, "openloop", "change.py"), "--port", LINK,
+                        "--input", "c_lamp:80,c_fan:30,c_led:10"], check=True)
+    experiment.wait()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    watcher.stopping.set()
+    watcher.join()
+
+    change = [received - changed for received, lamp, fan, led in device.controls if received >= changed]
+    with open(os.path.splitext(output)[0] + ".timing.json") as file:
+        timing = json.load(file)
+    delays = replyDelays(list(device.replies), watcher.rows)
+    rows = len(watcher.rows)
+    # the CPU time of change.py is not part of the sampling
+    cpu = (after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime)
+    stats = device.stats()
+    for path in (output, os.path.splitext(output)[0] + ".timing.json"):
+        os.remove(path)
+    return {
+        "requested_hz": 1000 / period,
+        "achieved_hz": rows / options.duration,
+        "lateness_p50_ms": timing.get("jitter", {}).get("p50", float("nan")) * 1000,
+        "lateness_p99_ms": timing.get("jitter", {}).get("p99", float("nan")) * 1000,
+        "cpu_per_sample_ms": cpu / rows * 1000 if rows else float("nan"),
+        "read_to_row_p50_ms": percentile([read for read, reply in delays], 0.5) * 1000,
+        "reply_to_row_p50_ms": percentile([reply for read, reply in delays], 0.5) * 1000,
+        "reply_to_row_p99_ms": percentile([reply for read, reply in delays], 0.99) * 1000,
+        "change_ms": change[0] * 1000 if change else float("nan"),
+        "lost": stats["dropped"] + stats["corrupted"],
+    }
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--rates", default="200,50,20", help="sampling periods in ms (s_rate)")
+    parser.add_argument("--data", default=DATA)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--corrupt", type=float, default=0.0)
+    parser.add_argument("--flush-rows", type=int, default=100)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--control", action="store_true", help="change through the control socket")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    options = getArguments()
+    device = VirtualDevice(LINK, options.data, options.latency, options.jitter,
+                           options.drop, options.corrupt, seed=1).start()
+    columns = ("requested_hz", "achieved_hz", "lateness_p50_ms", "lateness_p99_ms", "cpu_per_sample_ms",
+               "read_to_row_p50_ms", "reply_to_row_p50_ms", "reply_to_row_p99_ms", "change_ms", "lost")
+    print(" ".join("%14s" % column for column in columns))
+    try:
+        for period in options.rates.split(","):
+            result = run(device, float(period), options)
+            print(" ".join("%14.2f" % result[column] for column in columns))
+    finally:
+        device.stop()
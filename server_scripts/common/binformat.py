@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+"""
+Binary fixed-record experiment output format.
+
+Layout of a file:
+
+    b"OLMB"                 magic
+    uint16                  format version
+    uint16                  number of channels
+    uint32                  length of the JSON schema in bytes
+    JSON schema             {"channels": [{"name": ..., "title": ...}, ...]}
+    zero padding            up to an 8 byte boundary
+    records                 one little-endian float64 per channel, back to back
+
+Every record has the same size, so row N starts at
+header_size + N * record_size and readers can memory-map the file instead
+of parsing text. The comma separated text can always be derived from it:
+
+    ./binformat.py storage/outputs/<id>.bin > <id>.csv
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+
+from writer import OutputWriter
+
+MAGIC = b"OLMB"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHHI")
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "config", "devices")
+CHANNEL_PATTERN = re.compile(r'"name"\s*=>\s*"([^"]*)"\s*,\s*"title"\s*=>\s*"([^"]*)"')
+
+
+def load_channels(device_type, config_dir=CONFIG_DIR):
+    """Read the channel names and titles from config/devices/<type>/output.php."""
+    with open(os.path.join(config_dir, device_type, "output.php"), encoding="utf-8") as file:
+        content = "\n".join(line for line in file if not line.strip().startswith("//"))
+    return [{"name": name, "title": title} for name, title in CHANNEL_PATTERN.findall(content)]
+
+
+def binary_path(output_path):
+    """Path of the binary file stored next to a text output file."""
+    return os.path.splitext(output_path)[0] + ".bin"
+
+
+def encode_header(channels):
+    schema = json.dumps({"channels": channels}).encode("utf-8")
+    header = PREAMBLE.pack(MAGIC, VERSION, len(channels), len(schema)) + schema
+    return header + b"\0" * (-len(header) % 8)
+
+
+class BinaryWriter(OutputWriter):
+    """OutputWriter which packs every row into a fixed-size float64 record."""
+
+    def __init__(self, path, channels, flush_rows=100, flush_interval=0.5, fsync=False):
+        super().__init__(path, flush_rows, flush_interval, fsync, mode="wb")
+        self.channels = channels
+        self.record = struct.Struct("<%dd" % len(channels))
+        header = encode_header(channels)
+        self.file.write(header)
+        self.bytes_written += len(header)
+
+    def write_row(self, values):
+        if len(values) != len(self.channels):
+            raise ValueError("Expected %d values, got %d" % (len(self.channels), len(values)))
+        self.write(self.record.pack(*(float(value) for value in values)))
+
+    def write_array(self, values):
+        "Write the rows of a (rows, channels) array, e.g. a batch parsed by protocol.parseFrames"
+        import numpy as np
+
+        values = np.asarray(values, dtype="<f8")
+        if values.ndim != 2 or values.shape[1] != len(self.channels):
+            raise ValueError("Expected %d values per row, got shape %s" % (len(self.channels), values.shape))
+        for record in values:
+            self.write(record.tobytes())
+
+
+class BinaryReader:
+    """Memory-mapped random access to the records of a binary output file."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = None
+        try:
+            preamble = self.file.read(PREAMBLE.size)
+            if len(preamble) < PREAMBLE.size:
+                raise ValueError("Not an experiment output file: " + path)
+            magic, version, count, schema_length = PREAMBLE.unpack(preamble)
+            if magic != MAGIC:
+                raise ValueError("Not an experiment output file: " + path)
+            if version != VERSION:
+                raise ValueError("Unsupported format version %d" % version)
+            schema = self.file.read(schema_length)
+            self.channels = json.loads(schema.decode("utf-8"))["channels"]
+            self.record = struct.Struct("<%dd" % count)
+            self.header_size = PREAMBLE.size + schema_length
+            self.header_size += -self.header_size % 8
+            # a file without records is not mapped, an empty one cannot be
+            if os.fstat(self.file.fileno()).st_size > self.header_size:
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        if self.map is None:
+            return 0
+        return (len(self.map) - self.header_size) // self.record.size
+
+    def row(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Row index out of range")
+        return self.record.unpack_from(self.map, self.header_size + index * self.record.size)
+
+    def rows(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for index in range(start, stop):
+            yield self.record.unpack_from(self.map, self.header_size + index * self.record.size)
+
+    def to_numpy(self):
+        """All records as a (rows, channels) array sharing memory with the map."""
+        import numpy as np
+        if self.map is None:
+            return np.empty((0, len(self.channels)))
+        return np.frombuffer(self.map, dtype="<f8", count=len(self) * len(self.channels),
+                             offset=self.header_size).reshape(-1, len(self.channels))
+
+    def to_csv(self, file, header=True):
+        if header:
+            file.write(",".join(channel["name"] for channel in self.channels) + "\n")
+        for values in self.rows():
+            file.write(",".join(repr(value) for value in values) + "\n")
+
+    def close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # arrays from to_numpy still use it, it is unmapped with the last of them
+                pass
+            self.map = None
+        self.file.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("--no-header", action="store_true")
+    args = parser.parse_args()
+    with BinaryReader(args.input) as reader:
+        reader.to_csv(sys.stdout, header=not args.no_header)
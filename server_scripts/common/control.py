@@ -0,0 +1,143 @@
+"""
+Control socket of a running experiment.
+
+Stopping a runner used to mean killing its process tree and starting
+stop.py, which reopened the port, and every change started change.py. A
+runner with a control channel leads its own process group and listens on
+<output>.ctl next to its output file. The commands are applied by the runner
+itself, in its sampling loop, and answered once they are done:
+
+    {"command": "change", "input": "c_lamp:80,c_fan:30,c_led:10"}
+    {"command": "stop"}
+
+A change is answered when it was written to the device, a stop once the
+runner closed the channel, after its data was flushed and the measurement
+ended on the device. Replies are {"status": "success"} or {"status":
+"error", "errorMessage": ...}, one command per connection. The LED cube
+runners only take a stop, which ends the program and clears the cube.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from unixserver import ThreadingUnixServer
+
+SUFFIX = ".ctl"
+# how long a command may take to be applied
+TIMEOUT = 10.0
+
+
+def control_path(output_path):
+    """Path of the control socket of the experiment writing output_path."""
+    return os.path.splitext(output_path)[0] + SUFFIX
+
+
+def own_process_group():
+    """Make the runner the leader of a process group, so its whole tree can be killed at once."""
+    try:
+        os.setpgid(0, 0)
+    except OSError:
+        # already leads a session, e.g. started by the resident runner
+        pass
+
+
+def parse_input(text):
+    "name:value pairs of an --input argument"
+    return dict(pair.split(":", 1) for pair in text.split(",") if ":" in pair)
+
+
+class ControlRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        # one command per connection, a client left open cannot keep the runner from exiting
+        channel = self.server.channel
+        try:
+            command = json.loads(self.rfile.readline())
+            handler = channel.handlers.get(command["command"])
+            if handler is None:
+                raise ValueError("Experiment does not support " + command["command"])
+            handler(command)
+            if command["command"] == "stop" and not channel.closed.wait(TIMEOUT):
+                raise TimeoutError("Experiment did not stop in time")
+            reply = {"status": "success"}
+        except Exception as e:
+            reply = {"status": "error", "errorMessage": str(e) or type(e).__name__}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class ControlServer(ThreadingUnixServer):
+    # the handlers are joined on close, a stop gets its reply before the runner exits
+    daemon_threads = False
+
+    def __init__(self, path, channel):
+        self.channel = channel
+        super().__init__(path, ControlRequestHandler)
+
+
+class ControlChannel:
+    """Commands for a runner, served by a thread and passed to its handlers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.handlers = {}
+        self.closed = threading.Event()
+        self.server = ControlServer(path, self)
+        # close() waits for the serving loop to notice the shutdown
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def on(self, command, handler):
+        """Apply command with handler(command), called from the control thread."""
+        self.handlers[command] = handler
+
+    def close(self):
+        """The runner is done, answers the stop waiting for it."""
+        self.closed.set()
+        self.server.shutdown()
+        self.server.server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def open_control(output_path):
+    """Become a process group leader and listen for commands, None when the socket cannot be created."""
+    own_process_group()
+    try:
+        return ControlChannel(control_path(output_path))
+    except OSError as e:
+        print("Could not create control socket:", e)
+        return None
+
+
+def stop_event(control):
+    """Event set once a stop arrives on control, never set without a channel."""
+    stopped = threading.Event()
+    if control:
+        control.on("stop", lambda command: stopped.set())
+    return stopped
+
+
+def join_process(process, timeout, stopped):
+    """Wait until process ends, timeout passes or stopped is set; True when it ended by itself."""
+    deadline = time.monotonic() + timeout
+    while process.is_alive() and not stopped.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # the stop is noticed between two polls
+        process.join(min(remaining, 0.05))
+    return not process.is_alive()
+
+
+def send_command(path, command, timeout=TIMEOUT):
+    """Reply of the runner behind path to a command."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(command).encode("utf-8") + b"\n")
+        return json.loads(sock.makefile("rb").readline())
+    finally:
+        sock.close()
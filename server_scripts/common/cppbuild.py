@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+"""
+Compile service for the C++ code of the LED cube runners.
+
+The user code is compiled against the SafeAPI header of the device. The
+header (with <iostream>, <vector>, ...) is precompiled once per content and
+compiler flags, and the executables are cached under the hash of the compiler,
+flags, header and user code, so a demo or a resubmitted program runs without
+compiling at all. Every compile request is appended to metrics.jsonl in the
+cache directory:
+
+    ./cppbuild.py --stats
+
+prints the hit rate and compile times.
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import selectors
+import shutil
+import subprocess
+import tempfile
+import time
+
+CACHE_DIR = os.environ.get("OLM_CPP_CACHE", os.path.join(tempfile.gettempdir(), "olm-cpp"))
+COMPILER = "g++"
+FLAGS = ("-std=c++11",)
+HEADER_NAME = "safeapi.h"
+# executables kept, the least recently used ones go first
+MAX_BINARIES = 200
+
+
+class CompileError(Exception):
+    "Its message is the compiler output, the runners print it to stderr where the job looks for errors"
+
+
+def digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part.encode())
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+class CppBuilder:
+
+    def __init__(self, header, cache_dir=CACHE_DIR, compiler=COMPILER, flags=FLAGS):
+        self.header = header
+        self.cache_dir = cache_dir
+        self.compiler = compiler
+        self.flags = list(flags)
+        self.header_key = digest(compiler, " ".join(self.flags), header)
+        self.header_dir = os.path.join(cache_dir, "pch", self.header_key)
+
+    def precompile(self):
+        "Directory with the header and its .gch, built once per header and flags"
+        gch = os.path.join(self.header_dir, HEADER_NAME + ".gch")
+        if os.path.exists(gch):
+            return False
+        os.makedirs(self.header_dir, exist_ok=True)
+        with open(os.path.join(self.header_dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(gch):
+                return False
+            with open(os.path.join(self.header_dir, HEADER_NAME), "w") as file:
+                file.write(self.header)
+            partial = gch + ".part"
+            self.run_compiler(["-x", "c++-header", os.path.join(self.header_dir, HEADER_NAME), "-o", partial])
+            os.replace(partial, gch)
+        return True
+
+    def run_compiler(self, arguments):
+        result = subprocess.run([self.compiler] + self.flags + arguments,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise CompileError(result.stderr.strip())
+
+    def build(self, source):
+        "Path of the executable of source, compiled only when it is not cached"
+        key = digest(self.header_key, source)
+        binary = os.path.join(self.cache_dir, "bin", key)
+        began = time.monotonic()
+        if os.path.exists(binary):
+            os.utime(binary)
+            self.record(key, True, False, 0.0)
+            return binary
+
+        precompiled = self.precompile()
+        os.makedirs(os.path.dirname(binary), exist_ok=True)
+        work = tempfile.mkdtemp(prefix="olm-cpp-")
+        try:
+            path = os.path.join(work, "main.cpp")
+            with open(path, "w") as file:
+                file.write('#include "' + HEADER_NAME + '"\n' + source)
+            self.run_compiler(["-I", self.header_dir, path, "-o", os.path.join(work, "main")])
+            os.replace(os.path.join(work, "main"), binary)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        self.record(key, False, precompiled, time.monotonic() - began)
+        self.prune(binary)
+        return binary
+
+    def record(self, key, hit, precompiled, seconds):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {"time": time.time(), "key": key[:16], "hit": hit,
+                 "header_compiled": precompiled, "compile_seconds": round(seconds, 4)}
+        with open(os.path.join(self.cache_dir, "metrics.jsonl"), "a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def prune(self, keep):
+        directory = os.path.join(self.cache_dir, "bin")
+        binaries = [os.path.join(directory, name) for name in os.listdir(directory)]
+        binaries.sort(key=os.path.getmtime)
+        for path in binaries[:max(0, len(binaries) - MAX_BINARIES)]:
+            if path != keep:
+                os.remove(path)
+
+
+def output_lines(binary, timeout):
+    """
+    Lines the executable prints, read from the pipe as they come.
+
+    The process is killed once it runs longer than timeout seconds, the lines
+    printed until then are still returned.
+    """
+    process = subprocess.Popen([binary], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ)
+    output = b""
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print("Process timed out.")
+                break
+            if not selector.select(remaining):
+                continue
+            chunk = os.read(process.stdout.fileno(), 65536)
+            if not chunk:
+                break
+            output += chunk
+    finally:
+        selector.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+    return output.decode(errors="replace").split("\n")
+
+
+def summary(cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, "metrics.jsonl")
+    if not os.path.exists(path):
+        return {"requests": 0}
+    with open(path) as file:
+        entries = [json.loads(line) for line in file if line.strip()]
+    compiles = [entry["compile_seconds"] for entry in entries if not entry["hit"]]
+    hits = sum(1 for entry in entries if entry["hit"])
+    return {
+        "requests": len(entries),
+        "hits": hits,
+        "misses": len(compiles),
+        "hit_rate": hits / len(entries) if entries else 0.0,
+        "mean_compile_seconds": sum(compiles) / len(compiles) if compiles else 0.0,
+        "max_compile_seconds": max(compiles) if compiles else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args()
+    if args.stats:
+        print(json.dumps(summary(), indent=2))
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+"""
+Decimation of experiment data for plotting.
+
+Long runs produce far more points than a chart can show. The functions here
+pick a subset of rows which keeps the visual shape of every channel:
+largest-triangle-three-buckets (LTTB) keeps the points which contribute most
+to the drawn line, the min/max envelope keeps the extremes of every bucket.
+All channels share one row selection, so the time column stays aligned with
+the values. The raw output file is left untouched for CSV export.
+
+Used from PHP as:
+
+    ./decimation.py storage/outputs/<id>.txt --target 2000
+
+which prints {"rows": <raw row count>, "columns": [[...], ...]} as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+LTTB = "lttb"
+MINMAX = "minmax"
+
+
+def lttb(x, y, target):
+    """Indices of the target points chosen by largest-triangle-three-buckets."""
+    n = len(y)
+    if target >= n or target < 3:
+        return np.arange(n)
+
+    # first and last point are kept, the rest is split into target - 2 buckets
+    edges = np.linspace(1, n - 1, target - 1).astype(np.intp)
+    selected = np.empty(target, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(target - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        area = np.abs((x[previous] - average_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (average_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax(y, target):
+    """Indices of the minimum and maximum of every bucket, target // 2 buckets."""
+    n = len(y)
+    buckets = target // 2
+    if target >= n or buckets < 1:
+        return np.arange(n)
+
+    bucket = (np.arange(n) * buckets) // n
+    # sorted by bucket and value, the first row of a bucket is its minimum, the last its maximum
+    order = np.lexsort((y, bucket))
+    sorted_bucket = bucket[order]
+    first = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    return np.unique(np.r_[order[first], order[last]])
+
+
+def select_rows(table, target, method=LTTB):
+    """
+    Rows of a (rows, channels) table to keep, shared by all channels.
+
+    Column 0 is the time axis. Every other channel gets an equal share of the
+    target and the union of their picks is returned, so the result has at most
+    about target rows.
+    """
+    rows, channels = table.shape
+    if rows <= target:
+        return np.arange(rows)
+
+    x = table[:, 0]
+    share = max(3, target // max(1, channels - 1))
+    picks = [np.array([0, rows - 1])]
+    for channel in range(1, channels):
+        y = table[:, channel]
+        if method == MINMAX:
+            picks.append(minmax(y, share))
+        else:
+            picks.append(lttb(x, y, share))
+    return np.unique(np.concatenate(picks))
+
+
+def decimate(table, target, method=LTTB):
+    return table[select_rows(table, target, method)]
+
+
+def load_table(path):
+    """Load a text or binary experiment output into a (rows, channels) array."""
+    if path.endswith(".bin"):
+        from binformat import BinaryReader
+        with BinaryReader(path) as reader:
+            return np.array(reader.to_numpy())
+
+    with open(path, "rb") as file:
+        lines = [line for line in file.read().split(b"\n") if line.strip()]
+    try:
+        float(lines[0].split(b",")[0])
+    except (IndexError, ValueError):
+        # header line of an exported CSV
+        lines = lines[1:]
+    if not lines:
+        return np.empty((0, 0))
+    # rows with a different number of values than the first one are skipped
+    separators = lines[0].count(b",")
+    lines = [line for line in lines if line.count(b",") == separators]
+    values = np.fromstring(b",".join(lines), dtype=np.float64, sep=",")
+    return values.reshape(len(lines), separators + 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("--target", type=int, default=2000)
+    parser.add_argument("--method", choices=[LTTB, MINMAX], default=LTTB)
+    args = parser.parse_args()
+
+    # prefer the binary copy written next to the text output
+    path = args.input
+    if os.path.exists(os.path.splitext(path)[0] + ".bin"):
+        path = os.path.splitext(path)[0] + ".bin"
+    table = load_table(path)
+    reduced = decimate(table, args.target, args.method) if len(table) else table
+    json.dump({"rows": len(table), "columns": reduced.T.tolist()}, sys.stdout)
@@ -0,0 +1,75 @@
+"""
+Incremental publishing of experiment rows to the reading job.
+
+Instead of the reading job re-reading the whole output file every time it
+changes, the runner pushes only the rows it has not sent yet over the UNIX
+socket the job listens on (passed in OLM_PUBLISH_SOCKET). Rows are coalesced
+to a broadcast tick, one message per tick carries everything sampled since
+the previous one. The last message tells the job the run is finished so it
+can send the complete data set once.
+
+Messages are newline terminated JSON objects:
+
+    {"rows": ["0.2,26.69,...", ...]}
+    {"finished": true, "rows_published": 1234}
+"""
+import json
+import os
+import socket
+import time
+
+SOCKET_VARIABLE = "OLM_PUBLISH_SOCKET"
+
+
+class DeltaPublisher:
+
+    def __init__(self, path, tick=0.1, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.pending = []
+        self.last_sent = clock()
+        self.rows_published = 0
+        self.messages = 0
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+
+    def publish(self, row):
+        """Queue one output row (str or bytes, with or without its line ending)."""
+        if isinstance(row, (bytes, bytearray, memoryview)):
+            row = bytes(row).decode("ascii")
+        self.pending.append(row.rstrip("\n"))
+        self.poll()
+
+    def poll(self):
+        """Send the queued rows when the broadcast tick has elapsed."""
+        if self.pending and self.clock() - self.last_sent >= self.tick:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.send({"rows": self.pending})
+        self.rows_published += len(self.pending)
+        self.pending = []
+        self.last_sent = self.clock()
+
+    def send(self, message):
+        self.sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        self.messages += 1
+
+    def finish(self):
+        self.flush()
+        self.send({"finished": True, "rows_published": self.rows_published})
+        self.sock.close()
+
+
+def open_publisher(tick=0.1):
+    """Connect to the socket of the reading job, None when the job does not listen."""
+    path = os.environ.get(SOCKET_VARIABLE)
+    if not path:
+        return None
+    try:
+        return DeltaPublisher(path, tick)
+    except OSError as e:
+        print("Could not connect to publish socket:", e)
+        return None
@@ -0,0 +1,377 @@
+#!/usr/bin/python3
+"""
+Resident runner hosting the experiments of all devices in one process.
+
+Without it every experiment keeps a queue worker busy for its whole run,
+waiting on its own runner process, so ten devices need ten workers. The
+runner is a single asyncio loop with a task per experiment: boards with a
+native experiment (the TOS1A openloop) are sampled by the task itself on a
+non-blocking port, every other script runs as a child process the task
+waits for without blocking, and its rows are followed in the output file.
+Changes and stops of a script go to its control socket (control.py) when it
+has one. The PHP side only sends requests, `php artisan experiments:relay`
+broadcasts the data of all experiments.
+
+Requests are newline terminated JSON objects on the control socket, each is
+answered with one line ({"status": "success"} or {"status": "error",
+"errorMessage": ...}):
+
+    {"command": "start", "id": 12, "device": "tom1a", "software": "openloop",
+     "script": ".../start.py", "init": null, "port": "/dev/ttyACM0",
+     "output": ".../x.txt", "input": "c_lamp:50,...", "tag": "...",
+     "options": ["--flush-rows", "50"]}
+    {"command": "change", "id": 12, "script": ".../change.py", "input": "..."}
+    {"command": "stop", "id": 12, "script": [".../stop.py", "--port", ...]}
+    {"command": "status"} or {"command": "status", "id": 12}
+    {"command": "subscribe"}
+
+The options, extra arguments of the start script, can be left out. A native
+experiment takes them the same way as its start script.
+
+After subscribe the connection receives the events of every experiment,
+tagged with its id, device, software and tag:
+
+    {"id": 12, ..., "rows": ["0.2,26.69,...", ...]}
+    {"id": 12, ..., "error": "next chunk of what the script wrote to stderr"}
+    {"id": 12, ..., "finished": true, "rows_published": 1234, "error": "", "output": ""}
+
+    ./runner.py
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import signal
+import time
+
+from control import TIMEOUT, control_path
+
+SOCKET = os.environ.get("OLM_RUNNER_SOCKET", "/tmp/olm-runner.sock")
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# experiments sampled by a task of the runner instead of their start script
+NATIVE = {
+    ("tom1a", "openloop"): (os.path.join(SCRIPTS, "tom1a", "openloop", "experiment.py"), "OpenloopExperiment"),
+}
+# period of following the output file of a script
+TICK = 0.2
+# events kept for a subscriber which does not read, newer ones are dropped
+BACKLOG = 1024
+STOP_TIMEOUT = 10.0
+
+
+def loadNative(device, software):
+    "Experiment class hosted natively for the device and software, None for a script"
+    if (device, software) not in NATIVE:
+        return None
+    path, name = NATIVE[(device, software)]
+    spec = importlib.util.spec_from_file_location("native_%s_%s" % (device, software), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+async def runScript(arguments, timeout=None):
+    "Run a helper script (init, change, stop), returns its stdout and stderr"
+    process = await asyncio.create_subprocess_exec(
+        *arguments, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        stdout, stderr = await process.communicate()
+    return stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+
+
+async def sendCommand(path, command):
+    "Reply of the script behind a control socket, None when it does not listen"
+    try:
+        reader, writer = await asyncio.open_unix_connection(path)
+    except OSError:
+        return None
+    try:
+        writer.write(json.dumps(command).encode("utf-8") + b"\n")
+        return json.loads(await asyncio.wait_for(reader.readline(), TIMEOUT))
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return None
+    finally:
+        writer.close()
+
+
+class ScriptExperiment:
+    """The start script of an experiment as a child process in its own session."""
+
+    def __init__(self, request, publish, report):
+        """
+        publish -- called with the rows the script wrote since the previous tick
+        report  -- called with every chunk the script writes to stderr
+        """
+        self.request = request
+        self.publish = publish
+        self.report = report
+        self.process = None
+        self.position = 0
+        self.pending = b""
+        self.rows = 0
+
+    async def run(self):
+        request = self.request
+        self.process = await asyncio.create_subprocess_exec(
+            request["script"], "--port", request["port"], "--output", request["output"], "--input", request["input"],
+            *request.get("options", []), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True)
+        errors = []
+        collecting = asyncio.ensure_future(self.collect(errors))
+        following = asyncio.ensure_future(self.follow())
+        output = await self.process.stdout.read()
+        await self.process.wait()
+        await collecting
+        following.cancel()
+        self.readRows()
+        return {"output": output.decode("utf-8", errors="replace"), "error": "".join(errors),
+                "returncode": self.process.returncode}
+
+    async def collect(self, errors):
+        while True:
+            data = await self.process.stderr.read(4096)
+            if not data:
+                return
+            errors.append(data.decode("utf-8", errors="replace"))
+            self.report(errors[-1])
+
+    async def follow(self):
+        while True:
+            await asyncio.sleep(TICK)
+            self.readRows()
+
+    def readRows(self):
+        "Publish the complete lines added to the output file"
+        try:
+            with open(self.request["output"], "rb") as file:
+                file.seek(self.position)
+                data = file.read()
+        except OSError:
+            return
+        self.position += len(data)
+        self.pending += data
+        lines, _, self.pending = self.pending.rpartition(b"\n")
+        rows = [row for row in lines.decode("utf-8", errors="replace").split("\n") if row]
+        if rows:
+            self.rows += len(rows)
+            self.publish(rows)
+
+    async def change(self, request):
+        # applied by the script itself when it has a control socket
+        reply = await sendCommand(control_path(self.request["output"]), {"command": "change", "input": request["input"]})
+        if reply is not None:
+            return reply.get("errorMessage", "")
+        stdout, stderr = await runScript([request["script"], "--port", self.request["port"], "--input", request["input"]])
+        return stderr
+
+    async def stop(self, request):
+        reply = await sendCommand(control_path(self.request["output"]), {"command": "stop"})
+        if reply is not None and reply["status"] == "success":
+            try:
+                await asyncio.wait_for(self.process.wait(), TIMEOUT)
+                return
+            except asyncio.TimeoutError:
+                pass
+        # not every device has a stop script
+        if request.get("script") and os.path.exists(request["script"][0]):
+            await runScript(request["script"], STOP_TIMEOUT)
+        # the script and everything it started
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, AttributeError):
+            pass
+
+    def status(self):
+        return {"pid": self.process.pid if self.process else None, "rows": self.rows}
+
+
+class Hosted:
+    """An experiment of the runner and the task running it."""
+
+    def __init__(self, request, experiment):
+        self.request = request
+        self.experiment = experiment
+        self.task = None
+        self.started = time.time()
+        self.rowsPublished = 0
+
+    def describe(self):
+        status = {name: self.request.get(name) for name in ("id", "device", "software", "port", "tag")}
+        status["native"] = not isinstance(self.experiment, ScriptExperiment)
+        status["started"] = self.started
+        status.update(self.experiment.status())
+        return status
+
+
+class Runner:
+
+    def __init__(self):
+        self.experiments = {}
+        # queue of the events of every subscriber and its connection
+        self.subscribers = {}
+
+    def event(self, hosted, message):
+        request = hosted.request
+        message.update({name: request.get(name) for name in ("id", "device", "software", "tag")})
+        line = json.dumps(message).encode("utf-8") + b"\n"
+        for queue in self.subscribers:
+            if queue.qsize() < BACKLOG:
+                queue.put_nowait(line)
+
+    def publishRows(self, hosted, rows):
+        hosted.rowsPublished += len(rows)
+        self.event(hosted, {"rows": rows})
+
+    def start(self, request):
+        if request["id"] in self.experiments:
+            return error("Experiment is already running!")
+        for other in self.experiments.values():
+            if other.request["port"] == request["port"]:
+                return error("Device is running experiment %s" % other.request["id"])
+        hosted = Hosted(request, None)
+        publish = lambda rows: self.publishRows(hosted, rows)
+        native = loadNative(request["device"], request["software"])
+        script = os.path.basename(request["script"]).split(".")[0]
+        if native is not None and script == "start":
+            hosted.experiment = native(request, publish)
+        else:
+            hosted.experiment = ScriptExperiment(request, publish, lambda text: self.event(hosted, {"error": text}))
+        self.experiments[request["id"]] = hosted
+        hosted.task = asyncio.ensure_future(self.host(hosted))
+        return {"status": "success"}
+
+    async def host(self, hosted):
+        result = {}
+        try:
+            if hosted.request.get("init"):
+                await runScript([hosted.request["init"]])
+            result = await hosted.experiment.run()
+        except Exception as e:
+            result = {"error": "%s: %s" % (type(e).__name__, e)}
+        finally:
+            del self.experiments[hosted.request["id"]]
+            print("Experiment", hosted.request["id"], "finished", json.dumps(result), flush=True)
+            self.event(hosted, {"finished": True, "rows_published": hosted.rowsPublished,
+                                "error": result.get("error", ""), "output": result.get("output", "")})
+
+    async def change(self, request):
+        hosted = self.experiments.get(request["id"])
+        if hosted is None:
+            return error("Experiment is finished!")
+        message = await hosted.experiment.change(request)
+        return error(message) if message else {"status": "success"}
+
+    async def stop(self, request):
+        hosted = self.experiments.get(request["id"])
+        if hosted is None:
+            return error("Experiment is finished!")
+        await hosted.experiment.stop(request)
+        try:
+            await asyncio.wait_for(asyncio.shield(hosted.task), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            hosted.task.cancel()
+        return {"status": "success"}
+
+    def status(self, request):
+        if "id" in request:
+            hosted = self.experiments.get(request["id"])
+            return {"status": "success", "running": hosted is not None,
+                    "experiment": hosted.describe() if hosted else None}
+        return {"status": "success", "experiments": [hosted.describe() for hosted in self.experiments.values()]}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    command = request["command"]
+                    if command == "subscribe":
+                        writer.write(json.dumps({"status": "success"}).encode("utf-8") + b"\n")
+                        await self.subscribe(reader, writer)
+                        break
+                    elif command == "start":
+                        reply = self.start(request)
+                    elif command == "change":
+                        reply = await self.change(request)
+                    elif command == "stop":
+                        reply = await self.stop(request)
+                    elif command == "status":
+                        reply = self.status(request)
+                    else:
+                        reply = error("Unknown command: %s" % command)
+                except Exception as e:
+                    reply = error("%s: %s" % (type(e).__name__, e))
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def subscribe(self, reader, writer):
+        queue = asyncio.Queue()
+        self.subscribers[queue] = writer
+        # the subscriber does not send anything more, its EOF ends the subscription
+        closed = asyncio.ensure_future(reader.read())
+        try:
+            while True:
+                waiting = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait([waiting, closed], return_when=asyncio.FIRST_COMPLETED)
+                if waiting not in done:
+                    waiting.cancel()
+                    return
+                writer.write(waiting.result())
+                await writer.drain()
+        finally:
+            self.subscribers.pop(queue, None)
+            closed.cancel()
+
+    async def close(self):
+        for hosted in list(self.experiments.values()):
+            await self.stop({"id": hosted.request["id"]})
+        # the finished events go out before the subscriptions end
+        await asyncio.sleep(0.1)
+        for writer in list(self.subscribers.values()):
+            writer.close()
+        while self.subscribers:
+            await asyncio.sleep(0.01)
+
+
+def error(message):
+    return {"status": "error", "errorMessage": message}
+
+
+async def serve(path):
+    runner = Runner()
+    if os.path.exists(path):
+        os.remove(path)
+    server = await asyncio.start_unix_server(runner.handle, path)
+    os.chmod(path, 0o660)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    try:
+        await stopping.wait()
+    finally:
+        server.close()
+        await runner.close()
+        os.remove(path)
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=SOCKET)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    asyncio.run(serve(args.socket))
@@ -0,0 +1,393 @@
+#!/usr/bin/python3
+"""
+Warm sandbox workers for the Python programs of the LED cube runners.
+
+A program runs in a worker forked from a process which already imported
+math, random and the drawing API of the cube, so neither the interpreter
+start nor the imports count against the program. The instructions it prints
+are streamed back over a pipe while it runs, the last line of the stream is
+the status of the run (STATUS followed by JSON).
+
+A program is stopped by its budgets instead of the wall clock: the CPU time
+it used (ITIMER_PROF, RLIMIT_CPU as the last resort) and the number of
+instruction lines it printed. The lines printed until then are kept. Every
+worker runs a single program and exits, programs cannot leave anything
+behind for the next one.
+
+Without a running pool the worker is forked from the runner itself. The
+resident pool keeps workers forked ahead of time for one cube:
+
+    ./sandbox.py --api "../LED cube Looking glass/api.py"
+"""
+import argparse
+import importlib.util
+import io
+import json
+import math
+import os
+import queue
+import random
+import re
+import resource
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.reduction import recv_handle, send_handle
+
+from unixserver import UnixServer
+
+SOCKET_DIR = os.environ.get("OLM_SANDBOX_DIR", "/tmp")
+WORKERS = 2
+
+# CPU seconds and printed lines a program may use, interpreter start and imports are not counted
+CPU_BUDGET = 0.5
+INSTRUCTION_BUDGET = 100000
+# a program blocked without using CPU (e.g. on a full pipe) is stopped after this
+WALL_LIMIT = 60.0
+# lines read ahead of the consumer, beyond it the program waits on the pipe
+PREFETCH = 256
+
+STATUS = "#sandbox "
+
+OK = "ok"
+CPU = "cpu"
+INSTRUCTIONS = "instructions"
+WALL = "wall"
+ERROR = "error"
+KILLED = "killed"
+
+
+class BudgetExceeded(BaseException):
+    "Not an Exception, so `except Exception` in a program does not swallow it"
+
+
+def socket_path(api_path):
+    "Pool socket of the cube the API module belongs to"
+    name = os.path.basename(os.path.dirname(os.path.abspath(api_path)))
+    return os.path.join(SOCKET_DIR, "olm-sandbox-" + re.sub(r"[^a-z0-9]+", "-", name.lower()) + ".sock")
+
+
+def load_scope(api_path):
+    "Globals of a program: the drawing API of the cube, math and random"
+    # the API imports the modules next to it, e.g. the canvas of the bulk calls
+    directory = os.path.dirname(os.path.abspath(api_path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location("led_api", api_path)
+    api = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(api)
+    scope = {name: getattr(api, name) for name in api.NAMES}
+    scope["math"] = math
+    scope["random"] = random
+    return scope
+
+
+class BudgetedOutput(io.TextIOBase):
+    """sys.stdout of a program, counts the lines and stops it past the budget."""
+
+    def __init__(self, stream, budget):
+        self.stream = stream
+        self.budget = budget
+        self.lines = 0
+        self.open_line = False
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        lines = self.lines + text.count("\n")
+        # nothing of the line past the budget is written
+        if lines > self.budget or (text and self.lines == self.budget):
+            raise BudgetExceeded(INSTRUCTIONS)
+        self.lines = lines
+        if text:
+            self.open_line = not text.endswith("\n")
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def exceeded(reason):
+    def handler(signum, frame):
+        raise BudgetExceeded(reason)
+    return handler
+
+
+def execute(scope, request, fd):
+    "Run the program of the request with its output going to fd"
+    stream = io.TextIOWrapper(io.FileIO(fd, "w"), encoding="utf-8", errors="replace")
+    output = BudgetedOutput(stream, request.get("instructions", INSTRUCTION_BUDGET))
+    cpu_budget = request.get("cpu", CPU_BUDGET)
+    sys.stdout = output
+
+    signal.signal(signal.SIGPROF, exceeded(CPU))
+    signal.signal(signal.SIGALRM, exceeded(WALL))
+    # a program catching BaseException keeps getting interrupted, RLIMIT_CPU kills it for good
+    hard = math.ceil(cpu_budget) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard + 1))
+
+    status = {"status": OK}
+    began = time.process_time()
+    try:
+        signal.setitimer(signal.ITIMER_REAL, request.get("wall", WALL_LIMIT), 1.0)
+        signal.setitimer(signal.ITIMER_PROF, cpu_budget, 0.01)
+        exec(request["code"], dict(scope))
+    except BudgetExceeded as e:
+        status = {"status": e.args[0]}
+    except BaseException as e:
+        status = {"status": ERROR, "message": f"Error executing dynamic code: {e}",
+                  "error": f"{type(e).__name__}: {e}"}
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    sys.stdout = sys.__stdout__
+
+    status["cpu_seconds"] = round(time.process_time() - began, 4)
+    status["instructions"] = output.lines
+    try:
+        # the status goes on a line of its own
+        stream.write(("\n" if output.open_line else "") + STATUS + json.dumps(status) + "\n")
+        stream.close()
+    except (BrokenPipeError, BudgetExceeded):
+        pass
+
+
+def worker(scope, jobs):
+    "Wait for one job on the jobs socket, run it and exit"
+    try:
+        fd = recv_handle(jobs)
+    except EOFError:
+        # the pool was closed
+        return
+    request = json.loads(jobs.makefile("rb").readline())
+    jobs.close()
+    execute(scope, request, fd)
+
+
+class SandboxPool:
+    """Workers forked from this process, `size` of them are kept ready."""
+
+    def __init__(self, scope, size=WORKERS):
+        self.scope = scope
+        self.size = size
+        self.idle = deque()
+        self.fill()
+
+    def fork_worker(self):
+        ours, theirs = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                ours.close()
+                for other_pid, other in self.idle:
+                    other.close()
+                devnull = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(devnull, 0)
+                os.close(devnull)
+                worker(self.scope, theirs)
+                code = 0
+            finally:
+                os._exit(code)
+        theirs.close()
+        return pid, ours
+
+    def fill(self):
+        while len(self.idle) < self.size:
+            self.idle.append(self.fork_worker())
+
+    def dispatch(self, request, fd):
+        "Hand the request and its output fd to a worker, returns the worker pid"
+        pid, jobs = self.idle.popleft() if self.idle else self.fork_worker()
+        try:
+            send_handle(jobs, fd, pid)
+            jobs.sendall(json.dumps(request).encode() + b"\n")
+        finally:
+            jobs.close()
+        return pid
+
+    def run(self, code, cpu=CPU_BUDGET, instructions=INSTRUCTION_BUDGET, wall=WALL_LIMIT):
+        read, write = os.pipe()
+        try:
+            pid = self.dispatch({"code": code, "cpu": cpu, "instructions": instructions, "wall": wall}, write)
+        finally:
+            os.close(write)
+        # forked only now, so the new workers do not hold the output of this one
+        self.fill()
+        return Submission(os.fdopen(read, "rb"), pid)
+
+    def close(self):
+        while self.idle:
+            pid, jobs = self.idle.popleft()
+            jobs.close()
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+
+class Submission:
+    """Instruction lines of a running program, status is set once they are read."""
+
+    def __init__(self, stream, pid=None):
+        self.stream = stream
+        self.pid = pid
+        self.status = None
+
+    def __iter__(self):
+        try:
+            for raw in self.stream:
+                line = raw.decode("utf-8", errors="replace").rstrip("\n")
+                if line.startswith(STATUS):
+                    self.status = json.loads(line[len(STATUS):])
+                    continue
+                yield line
+        finally:
+            self.stream.close()
+            if self.pid is not None:
+                os.waitpid(self.pid, 0)
+            if self.status is None:
+                self.status = {"status": KILLED}
+
+    def message(self):
+        "What to tell the user about a program which did not finish normally"
+        if self.status is None or self.status["status"] == OK:
+            return None
+        reason = self.status["status"]
+        if reason == ERROR:
+            return self.status["message"]
+        if reason == CPU:
+            return "CPU time budget reached. Program stopped."
+        if reason == INSTRUCTIONS:
+            return "Instruction budget reached. Program stopped."
+        if reason == WALL:
+            return "Timeout reached. Program stopped."
+        return "Program was killed."
+
+    def error(self):
+        "Exception of a program which failed, as the last line of a traceback"
+        if self.status is None or self.status["status"] != ERROR:
+            return None
+        return self.status["error"]
+
+    def report(self):
+        "Tell the user why the program did not finish, a failure also goes to stderr where the job looks for it"
+        if self.message():
+            print(self.message())
+        if self.error():
+            print("Error executing dynamic code:\n" + self.error(), file=sys.stderr)
+
+
+def prefetch(lines, size=PREFETCH):
+    """
+    Iterate lines read ahead by a thread, at most size of them are buffered.
+
+    A slow consumer (the serial port) lets the queue and then the pipe fill
+    up, which pauses the program until the consumer catches up. Closing the
+    iterator stops the reader, the program then fails on the broken pipe.
+    """
+    buffer = queue.Queue(size)
+    stopped = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for line in lines:
+                if not put(line):
+                    break
+        finally:
+            put(end)
+
+    threading.Thread(target=reader, daemon=True).start()
+    try:
+        while True:
+            line = buffer.get()
+            if line is end:
+                return
+            yield line
+    finally:
+        stopped.set()
+
+
+class SandboxRequestHandler(socketserver.StreamRequestHandler):
+    """One program per connection, the worker writes to the connection itself."""
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        self.server.pool.dispatch(request, self.connection.fileno())
+
+
+class SandboxServer(UnixServer):
+    # not threaded, workers are forked from a single threaded process only
+
+    def __init__(self, path, pool):
+        self.pool = pool
+        super().__init__(path, SandboxRequestHandler)
+
+    def shutdown_request(self, request):
+        # shutting the connection down would cut off the worker writing to it
+        self.close_request(request)
+        # forked only now, so the new workers do not hold the connection open
+        self.pool.fill()
+
+
+def submit(path, request):
+    "Send a program to the pool behind path"
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        return Submission(sock.makefile("rb"))
+    finally:
+        # the file keeps the connection open
+        sock.close()
+
+
+def run_code(api_path, code, cpu=CPU_BUDGET, instructions=INSTRUCTION_BUDGET, wall=WALL_LIMIT):
+    "Run a program in the pool of the cube if it runs, otherwise in a worker forked now"
+    path = socket_path(api_path)
+    if os.path.exists(path):
+        try:
+            return submit(path, {"code": code, "cpu": cpu, "instructions": instructions, "wall": wall})
+        except OSError:
+            pass
+    return SandboxPool(load_scope(api_path), size=0).run(code, cpu, instructions, wall)
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api", required=True, help="drawing API module of the cube")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--socket")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    path = args.socket or socket_path(args.api)
+    # finished workers are reaped by the kernel
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    pool = SandboxPool(load_scope(args.api), args.workers)
+    with SandboxServer(path, pool) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+            pool.close()
@@ -0,0 +1,142 @@
+"""
+Deadline based sampling scheduler shared by the Python runners.
+
+Sample slots are absolute times on the monotonic clock (start + n * period),
+so a late sample never shifts the slots after it and the achieved rate does
+not drift away from the requested one. Every wake-up is measured against its
+slot, which gives the jitter and overrun statistics stored next to the
+experiment output.
+"""
+import asyncio
+import json
+import os
+import time
+
+SKIP = "skip"
+CATCHUP = "catchup"
+
+
+class SampleScheduler:
+    """
+    Paces a sampling loop to a fixed period.
+
+    When a sample overruns its slot, the "skip" policy drops the slots which
+    are already entirely in the past and continues with the current one,
+    the "catchup" policy runs every late slot back to back until the loop is
+    on time again.
+    """
+
+    def __init__(self, period, policy=SKIP, clock=time.monotonic, sleep=time.sleep):
+        if period <= 0:
+            raise ValueError("Sampling period has to be positive")
+        if policy not in (SKIP, CATCHUP):
+            raise ValueError("Unknown overrun policy: " + str(policy))
+        self.period = period
+        self.policy = policy
+        self.clock = clock
+        self.sleep = sleep
+        self.started = None
+        self.slot = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.lateness = []
+
+    def start(self):
+        self.started = self.clock()
+        self.slot = 0
+        return self.started
+
+    def elapsed(self):
+        return self.clock() - self.started
+
+    def wait(self):
+        """Sleep until the next slot and return its index."""
+        deadline, delay = self.advance()
+        if delay is not None:
+            self.sleep(delay)
+        self.lateness.append(self.clock() - deadline)
+        return self.slot
+
+    async def wait_async(self):
+        """wait() for a sampling task of an asyncio loop, the other tasks run meanwhile."""
+        deadline, delay = self.advance()
+        if delay is not None:
+            await asyncio.sleep(delay)
+        self.lateness.append(self.clock() - deadline)
+        return self.slot
+
+    def advance(self):
+        "Move to the next slot, returns its deadline and the time until it (None when late)"
+        self.slot += 1
+        deadline = self.started + self.slot * self.period
+        now = self.clock()
+
+        if now > deadline:
+            self.overruns += 1
+            missed = int((now - deadline) // self.period)
+            if self.policy == SKIP and missed > 0:
+                self.skipped += missed
+                self.slot += missed
+                deadline += missed * self.period
+            return deadline, None
+        return deadline, deadline - now
+
+    def stats(self):
+        samples = sorted(self.lateness)
+        count = len(samples)
+        stats = {
+            "period": self.period,
+            "policy": self.policy,
+            "samples": count,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+        }
+        if self.started is not None:
+            duration = self.elapsed()
+            stats["duration"] = duration
+            stats["achieved_rate"] = stats["samples"] / duration if duration > 0 else None
+        if count:
+            mean = sum(samples) / count
+            stats["jitter"] = {
+                "mean": mean,
+                "std": (sum((value - mean) ** 2 for value in samples) / count) ** 0.5,
+                "p50": samples[count // 2],
+                "p99": samples[min(count - 1, int(count * 0.99))],
+                "max": samples[-1],
+            }
+        return stats
+
+    def write_stats(self, path):
+        with open(path, "w") as file:
+            json.dump(self.stats(), file, indent=4)
+
+
+def stats_path(output_path):
+    """Path of the timing statistics stored next to an output file."""
+    return os.path.splitext(output_path)[0] + ".timing.json"
+
+
+def enable_realtime(cpus=None, priority=10):
+    """
+    Pin the process to the given CPUs and raise its scheduling priority.
+
+    Uses SCHED_FIFO when the process is allowed to, otherwise falls back to a
+    lower nice value. Returns what was actually applied.
+    """
+    applied = {}
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+            applied["affinity"] = sorted(cpus)
+        except OSError:
+            pass
+
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        applied["policy"] = "SCHED_FIFO"
+    except (AttributeError, OSError):
+        try:
+            applied["nice"] = os.nice(-10)
+        except OSError:
+            pass
+    return applied
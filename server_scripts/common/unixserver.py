@@ -0,0 +1,27 @@
+"""
+UNIX socket servers of the resident scripts.
+
+The TOS1A broker, the MATLAB pool, the Looking Glass driver, the sandbox
+pool and the control channel of a runner all listen on a socket path which
+a previous instance may have left behind, and which the web server has to be
+able to connect to through its group.
+"""
+import os
+import socketserver
+
+MODE = 0o660
+
+
+class UnixServer(socketserver.UnixStreamServer):
+    """Serves one connection at a time on path, replacing a stale socket there."""
+
+    def __init__(self, path, handler):
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, handler)
+        os.chmod(path, MODE)
+
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn, UnixServer):
+    """UnixServer with a thread per connection, which does not keep the process alive."""
+    daemon_threads = True
@@ -0,0 +1,84 @@
+"""
+Buffered writer for experiment output files.
+
+Keeps a single descriptor open for the whole run and collects rows in
+memory, so a sample costs an append to a list instead of an open/write/close
+cycle. Rows reach the file when the row-count or time threshold of the flush
+policy is hit, which is also what the reading job sees as a file change.
+"""
+import os
+import time
+
+
+class OutputWriter:
+
+    def __init__(self, path, flush_rows=100, flush_interval=0.5, fsync=False, mode="ab", clock=time.monotonic):
+        """
+        flush_rows     -- flush after this many buffered rows (0 disables the limit)
+        flush_interval -- flush when the oldest buffered row is this many seconds old (0 disables it)
+        fsync          -- fsync the file when it is closed
+        """
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.clock = clock
+        self.file = open(path, mode)
+        self.buffer = []
+        self.buffered_since = None
+        self.bytes_written = 0
+        self.rows_written = 0
+        self.flushes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, row):
+        """Buffer one row, a str or bytes including its line ending."""
+        if isinstance(row, str):
+            row = row.encode("utf-8")
+        if not self.buffer:
+            self.buffered_since = self.clock()
+        self.buffer.append(row)
+        if self.should_flush():
+            self.flush()
+
+    def write_row(self, values):
+        self.write(",".join(str(value) for value in values) + "\n")
+
+    def should_flush(self):
+        if self.flush_rows and len(self.buffer) >= self.flush_rows:
+            return True
+        if self.flush_interval and self.clock() - self.buffered_since >= self.flush_interval:
+            return True
+        return not self.flush_rows and not self.flush_interval
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = b"".join(self.buffer)
+        self.file.write(data)
+        self.file.flush()
+        self.bytes_written += len(data)
+        self.rows_written += len(self.buffer)
+        self.flushes += 1
+        self.buffer = []
+        self.buffered_since = None
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+    def stats(self):
+        return {
+            "rows_written": self.rows_written,
+            "bytes_written": self.bytes_written,
+            "flushes": self.flushes,
+        }
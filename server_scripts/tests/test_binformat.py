@@ -0,0 +1,102 @@
+"""
+Binary output files written by BinaryWriter and read back by BinaryReader.
+"""
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from binformat import BinaryReader, BinaryWriter, load_channels
+
+CHANNELS = [{"name": "time", "title": "Time"}, {"name": "temp", "title": "Temperature"},
+            {"name": "light", "title": "Light intensity"}]
+
+
+class BinaryFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "output.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, rows):
+        with BinaryWriter(self.path, CHANNELS, flush_rows=2) as writer:
+            for row in rows:
+                writer.write_row(row)
+        return writer
+
+    def test_round_trip(self):
+        rows = [(0.05, 21.5, 3.0), (0.1, 21.75, -1e-9), (0.15, 1e300, 0.0)]
+        self.write([[str(value) for value in row] for row in rows])
+        with BinaryReader(self.path) as reader:
+            self.assertEqual(reader.channels, CHANNELS)
+            self.assertEqual(len(reader), 3)
+            self.assertEqual(list(reader.rows()), rows)
+            self.assertEqual(reader.row(-1), rows[-1])
+            self.assertEqual(list(reader.rows(1, 2)), rows[1:2])
+            with self.assertRaises(IndexError):
+                reader.row(3)
+            self.assertEqual(reader.to_numpy().tolist(), [list(row) for row in rows])
+            # records start on an 8 byte boundary
+            self.assertEqual(reader.header_size % 8, 0)
+            self.assertEqual(os.path.getsize(self.path), reader.header_size + 3 * 3 * 8)
+
+    def test_write_array(self):
+        values = np.arange(12, dtype=np.float64).reshape(4, 3)
+        with BinaryWriter(self.path, CHANNELS) as writer:
+            writer.write_array(values[:2])
+            writer.write_row([6, 7, 8])
+            with self.assertRaises(ValueError):
+                writer.write_array(values[:, :2])
+        self.assertEqual(writer.rows_written, 3)
+        with BinaryReader(self.path) as reader:
+            self.assertEqual(reader.to_numpy().tolist(), values[:3].tolist())
+
+    def test_to_csv(self):
+        self.write([[0.5, 1, 2]])
+        text = io.StringIO()
+        with BinaryReader(self.path) as reader:
+            reader.to_csv(text)
+        self.assertEqual(text.getvalue(), "time,temp,light\n0.5,1.0,2.0\n")
+
+    def test_close_under_live_array(self):
+        self.write([[1, 2, 3], [4, 5, 6]])
+        reader = BinaryReader(self.path)
+        values = reader.to_numpy()
+        reader.close()
+        self.assertEqual(values.tolist(), [[1, 2, 3], [4, 5, 6]])
+
+    def test_file_without_records(self):
+        self.write([])
+        with BinaryReader(self.path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertEqual(list(reader.rows()), [])
+            self.assertEqual(reader.to_numpy().shape, (0, 3))
+
+    def test_not_an_output_file(self):
+        for content in (b"", b"OLMB", b"time,temp,light\n1,2,3\n"):
+            with open(self.path, "wb") as file:
+                file.write(content)
+            with self.assertRaises(ValueError):
+                BinaryReader(self.path)
+
+    def test_wrong_number_of_values(self):
+        with BinaryWriter(self.path, CHANNELS) as writer:
+            with self.assertRaises(ValueError):
+                writer.write_row([1, 2])
+
+    def test_channels_of_the_device_config(self):
+        channels = load_channels("tom1a")
+        # time, 17 device values and the three control signals come first
+        self.assertGreaterEqual(len(channels), 21)
+        self.assertTrue(all(channel["name"] and channel["title"] for channel in channels))
+
+
+if __name__ == '__main__':
+    unittest.main()
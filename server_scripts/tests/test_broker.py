@@ -0,0 +1,86 @@
+"""
+The TOS1A serial broker between openloop/start.py and the virtual board.
+
+A board which leaves replies unanswered must cost the run those samples
+only: the broker gives up on a read when its client does, and the end of
+the measurement still reaches the board.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+TOM1A = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a")
+sys.path.insert(0, TOM1A)
+import broker
+from virtualdevice import VirtualDevice
+
+START = os.path.join(TOM1A, "openloop", "start.py")
+# 40 slots of 50 ms
+INPUT = "t_sim:2,s_rate:50,c_lamp:50,c_led:0,c_fan:20"
+SLOTS = 40
+
+
+class BrokerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.port = os.path.join(self.directory.name, "tos1a")
+        self.output = os.path.join(self.directory.name, "output.csv")
+        self.socketDir = broker.SOCKET_DIR
+        broker.SOCKET_DIR = self.directory.name
+
+    def tearDown(self):
+        broker.SOCKET_DIR = self.socketDir
+        self.directory.cleanup()
+
+    def runThroughBroker(self, device):
+        "Rows start.py wrote through a broker of the device's port"
+        device.start()
+        serving = broker.Broker(self.port)
+        server = broker.BrokerServer(broker.socketPath(self.port), serving)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        try:
+            environment = dict(os.environ, OLM_BROKER_DIR=self.directory.name)
+            environment.pop("OLM_PUBLISH_SOCKET", None)
+            result = subprocess.run([sys.executable, START, "--port", self.port, "--output", self.output,
+                                     "--input", INPUT], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True, env=environment, timeout=30)
+        finally:
+            server.shutdown()
+            server.server_close()
+            serving.close()
+            device.stop()
+        self.assertEqual(result.stderr, "")
+        self.assertIn("Rows written:", result.stdout)
+        with open(self.output) as file:
+            return [line for line in file if line.strip()]
+
+    def assertStopped(self, device):
+        counters = device.stats()
+        self.assertEqual(counters["starts"], 1)
+        self.assertEqual(counters["stops"], 1)
+        self.assertFalse(counters["measuring"])
+
+    def test_every_reply_is_written(self):
+        device = VirtualDevice(self.port, seed=1)
+        rows = self.runThroughBroker(device)
+        self.assertStopped(device)
+        self.assertGreaterEqual(len(rows), SLOTS - 2)
+
+    def test_dropped_replies_cost_their_samples(self):
+        device = VirtualDevice(self.port, drop=0.1, seed=3)
+        rows = self.runThroughBroker(device)
+        self.assertStopped(device)
+        counters = device.stats()
+        self.assertGreater(counters["dropped"], 0)
+        # a read the client gave up on is not answered later, every reply becomes a row
+        self.assertEqual(len(rows), counters["replies"])
+        self.assertGreaterEqual(len(rows), SLOTS * 0.75)
+
+
+if __name__ == '__main__':
+    unittest.main()
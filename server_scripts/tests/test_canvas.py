@@ -0,0 +1,118 @@
+"""
+Bulk drawing calls of the Looking Glass voxel buffer.
+
+The lines show() prints are replayed the way the cube draws them, the cube
+has to end on the buffer that was drawn.
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube Looking glass"))
+from canvas import Canvas, coordinates
+from frames import FrameEncoder
+
+RED = [255, 0, 0]
+BLUE = [0, 0, 255]
+
+
+def lit(canvas):
+    "[x, y, z] of the voxels on in the buffer"
+    return sorted(map(tuple, np.argwhere(canvas.voxels.any(axis=3)).tolist()))
+
+
+class CanvasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.canvas = Canvas()
+        self.cube = FrameEncoder()
+
+    def show(self):
+        "Lines of show(), after checking that they draw the buffer on the cube"
+        lines = self.canvas.show()
+        for line in lines:
+            self.cube.apply(line)
+        self.assertTrue((self.cube.frame == self.canvas.frame).all())
+        return lines
+
+    def test_voxel_index(self):
+        self.canvas.set_mask(coordinates()[0] == 1, RED)
+        self.canvas.voxels[2, 3, 4] = BLUE
+        # z * 64 + x * 8 + y
+        self.assertEqual(self.canvas.frame[4 * 64 + 2 * 8 + 3].tolist(), BLUE)
+        self.assertEqual(int(self.canvas.frame.any(axis=1).sum()), 65)
+        self.show()
+
+    def test_fill_box_is_cut_at_the_cube(self):
+        self.canvas.fill_box([6, -2, 7], [9, 1, 5], RED)
+        self.assertEqual(lit(self.canvas), [(x, y, z) for x in (6, 7) for y in (0, 1) for z in (5, 6, 7)])
+        self.canvas.fill_box([8, 8, 8], [9, 9, 9], BLUE)
+        self.assertEqual(len(lit(self.canvas)), 12)
+        self.show()
+
+    def test_plane_line_and_sphere(self):
+        self.canvas.fill_plane("y", 7, BLUE)
+        self.canvas.fill_plane("z", 8, RED)
+        self.assertEqual(len(lit(self.canvas)), 64)
+        self.canvas.set_colors(np.zeros((8, 8, 8, 3)))
+        self.canvas.line([0, 0, 0], [7, 7, 3], RED)
+        self.assertEqual(len(lit(self.canvas)), 8)
+        self.assertEqual(self.canvas.voxels[7, 7, 3].tolist(), RED)
+        self.canvas.sphere([3.5, 3.5, 3.5], 3, BLUE, filled=True)
+        self.assertTrue(self.canvas.voxels[3, 4, 3].tolist() == BLUE)
+        self.assertFalse(self.canvas.voxels[0, 0, 7].any())
+        self.show()
+
+    def test_shift_and_rotate(self):
+        self.canvas.voxels[0, 0, 0] = RED
+        self.canvas.voxels[7, 1, 2] = BLUE
+        self.canvas.shift((1, 0, 0))
+        self.assertEqual(lit(self.canvas), [(1, 0, 0)])
+        self.canvas.shift((-2, 0, 0), wrap=True)
+        self.assertEqual(lit(self.canvas), [(7, 0, 0)])
+        # a quarter turn around z moves x into y
+        self.canvas.rotate("z")
+        self.assertEqual(lit(self.canvas), [(7, 7, 0)])
+        self.canvas.voxels[1, 2, 3] = BLUE
+        before = self.canvas.frame.copy()
+        self.canvas.rotate("x", 4)
+        self.assertTrue((self.canvas.frame == before).all())
+        with self.assertRaises(ValueError):
+            self.canvas.rotate("w")
+        self.show()
+
+    def test_show_sends_only_changes(self):
+        self.canvas.fill_box([0, 0, 0], [7, 7, 3], RED)
+        self.assertEqual(self.show()[0].split(",")[:4], ["Pixels", "255", "0", "0"])
+        self.canvas.voxels[1, 1, 1] = BLUE
+        self.assertEqual(self.show(), ["Pixel,0,0,255,73"])
+        self.canvas.voxels[1, 1, 1] = 0
+        self.assertEqual(self.show(), ["ClPixel,73"])
+        self.assertEqual(self.show(), [])
+
+    def test_show_redraws_when_it_is_shorter(self):
+        self.canvas.fill_box([0, 0, 0], [7, 7, 5], RED)
+        self.show()
+        self.canvas.set_colors(np.zeros((8, 8, 8, 3)))
+        self.canvas.voxels[0, 0, 0] = BLUE
+        self.assertEqual(self.show(), ["clearCube", "Pixel,0,0,255,0"])
+        # clearing a few voxels is shorter than drawing the rest again
+        self.canvas.fill_box([0, 0, 0], [7, 7, 5], RED)
+        self.show()
+        self.canvas.voxels[0, 0, 0] = 0
+        self.canvas.voxels[0, 1, 0] = 0
+        self.assertEqual(self.show(), ["Pixels,0,0,0,0,1"])
+
+    def test_per_voxel_calls_are_tracked(self):
+        self.canvas.drawn([5, 600], RED)
+        # the cube already shows what the call printed
+        self.assertEqual(self.canvas.show(), [])
+        self.canvas.cleared()
+        self.assertFalse(self.canvas.frame.any())
+        self.assertEqual(self.canvas.show(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Row selection of the decimation for plotting.
+
+LTTB keeps the endpoints and one point per bucket, min/max keeps both
+extremes of every bucket, and all channels of a table share the rows.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from decimation import MINMAX, decimate, load_table, lttb, minmax, select_rows
+
+
+def signal(rows, seed=0):
+    generator = np.random.default_rng(seed)
+    x = np.arange(rows) * 0.05
+    return x, np.sin(x) + generator.normal(0, 0.1, rows)
+
+
+class LttbTest(unittest.TestCase):
+
+    def test_endpoints_and_one_point_per_bucket(self):
+        x, y = signal(1000)
+        selected = lttb(x, y, 50)
+        self.assertEqual(len(selected), 50)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 999)
+        # the buckets split the rows between the endpoints, every one gives a point
+        edges = np.linspace(1, 999, 49).astype(np.intp)
+        self.assertEqual(np.searchsorted(edges, selected[1:-1], side="right").tolist(), list(range(1, 49)))
+
+    def test_keeps_a_spike(self):
+        x, y = signal(1000)
+        y[517] = 100
+        self.assertIn(517, lttb(x, y, 20))
+
+    def test_small_inputs_are_kept(self):
+        x, y = signal(10)
+        self.assertEqual(lttb(x, y, 10).tolist(), list(range(10)))
+        self.assertEqual(lttb(x, y, 2).tolist(), list(range(10)))
+
+
+class MinmaxTest(unittest.TestCase):
+
+    def test_extremes_of_every_bucket(self):
+        x, y = signal(1000)
+        selected = minmax(y, 40)
+        self.assertLessEqual(len(selected), 40)
+        self.assertTrue((np.diff(selected) > 0).all())
+        for bucket in np.array_split(np.arange(1000), 20):
+            values = y[bucket]
+            self.assertIn(bucket[values.argmin()], selected)
+            self.assertIn(bucket[values.argmax()], selected)
+
+    def test_small_inputs_are_kept(self):
+        x, y = signal(10)
+        self.assertEqual(minmax(y, 20).tolist(), list(range(10)))
+        self.assertEqual(minmax(y, 1).tolist(), list(range(10)))
+
+
+class SelectRowsTest(unittest.TestCase):
+
+    def table(self, rows, channels):
+        x, y = signal(rows)
+        return np.column_stack([x] + [y * channel for channel in range(1, channels)])
+
+    def test_rows_are_shared_by_the_channels(self):
+        table = self.table(5000, 4)
+        for method in ("lttb", MINMAX):
+            selected = select_rows(table, 300, method)
+            self.assertEqual(selected[0], 0)
+            self.assertEqual(selected[-1], 4999)
+            self.assertTrue((np.diff(selected) > 0).all())
+            self.assertLessEqual(len(selected), 300 + 2)
+            self.assertEqual(decimate(table, 300, method).tolist(), table[selected].tolist())
+
+    def test_short_tables_are_kept(self):
+        table = self.table(100, 3)
+        self.assertEqual(select_rows(table, 100).tolist(), list(range(100)))
+
+
+class LoadTableTest(unittest.TestCase):
+
+    def test_text_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "output.txt")
+            with open(path, "wb") as file:
+                file.write(b"time,temp\n0.05,21.5\n0.1,21.75\n0.15\n0.2,22\n")
+            # the header and the row with a missing value are skipped
+            self.assertEqual(load_table(path).tolist(), [[0.05, 21.5], [0.1, 21.75], [0.2, 22.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
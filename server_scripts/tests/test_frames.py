@@ -0,0 +1,132 @@
+"""
+Binary frame packets of the Looking Glass cube.
+
+Every packet the encoder emits is decoded with the reference decoder, which
+has to end on the frame that was encoded.
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube Looking glass"))
+from frames import (BITMAP, DELTA, HEADER, KEY, LIST, MAX_SLEEP, RUNS, SYNC, FrameEncoder, compile_frames,
+                    decode_packet, empty_frame, encode_frame, encode_indexes, packet_sleep)
+
+
+def random_frame(generator, voxels, colors):
+    frame = empty_frame()
+    palette = generator.integers(1, 256, (colors, 3))
+    indexes = generator.choice(len(frame), voxels, replace=False)
+    frame[indexes] = palette[generator.integers(0, colors, voxels)]
+    return frame
+
+
+class EncodeIndexesTest(unittest.TestCase):
+
+    def test_shortest_encoding(self):
+        self.assertEqual(encode_indexes(np.array([7]))[:2], (LIST, 1))
+        self.assertEqual(encode_indexes(np.array([3, 200, 400]))[:2], (LIST, 3))
+        # one run of 300 voxels is split in two
+        encoding, count, data = encode_indexes(np.arange(100, 400))
+        self.assertEqual((encoding, count, len(data)), (RUNS, 2, 6))
+        encoding, count, data = encode_indexes(np.arange(0, 512, 2))
+        self.assertEqual((encoding, count, len(data)), (BITMAP, 256, 64))
+
+
+class EncodeFrameTest(unittest.TestCase):
+
+    def assertDecodes(self, previous, frame, packets):
+        decoded = previous.copy()
+        for data in packets:
+            self.assertEqual(data[0], SYNC)
+            decode_packet(data, decoded)
+        self.assertTrue((decoded == frame).all())
+
+    def test_random_frames(self):
+        generator = np.random.default_rng(1)
+        previous = empty_frame()
+        for voxels, colors in ((1, 1), (20, 3), (300, 10), (512, 40), (5, 2)):
+            frame = random_frame(generator, voxels, colors)
+            packets = encode_frame(previous, frame, 25)
+            self.assertDecodes(previous, frame, packets)
+            self.assertEqual(packet_sleep(packets[-1]), 25)
+            previous = frame
+
+    def test_only_changes_are_sent(self):
+        generator = np.random.default_rng(2)
+        previous = random_frame(generator, 400, 50)
+        frame = previous.copy()
+        frame[10] = [1, 2, 3]
+        packets = encode_frame(previous, frame)
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0][1], DELTA)
+        # header, palette of one color, one listed voxel and the checksum
+        self.assertEqual(len(packets[0]), HEADER.size + 1 + 3 + 4 + 2 + 1)
+        self.assertDecodes(previous, frame, packets)
+
+    def test_key_frame_when_clearing_is_shorter(self):
+        generator = np.random.default_rng(3)
+        previous = random_frame(generator, 500, 100)
+        frame = empty_frame()
+        frame[0] = [255, 0, 0]
+        packets = encode_frame(previous, frame)
+        self.assertEqual(packets[0][1], KEY)
+        self.assertDecodes(previous, frame, packets)
+
+    def test_more_colors_than_a_palette(self):
+        frame = empty_frame()
+        frame[:] = np.stack([np.arange(512) % 256, np.arange(512) // 256, np.full(512, 7)], axis=1)
+        packets = encode_frame(empty_frame(), frame, 10)
+        self.assertEqual(len(packets), 3)
+        self.assertEqual([packet_sleep(data) for data in packets], [0, 0, 10])
+        self.assertDecodes(empty_frame(), frame, packets)
+
+    def test_long_sleep_is_split(self):
+        frame = empty_frame()
+        frame[1] = [9, 9, 9]
+        packets = encode_frame(empty_frame(), frame, 2 * MAX_SLEEP + 5)
+        self.assertEqual([packet_sleep(data) for data in packets], [MAX_SLEEP, MAX_SLEEP, 5])
+        self.assertDecodes(empty_frame(), frame, packets)
+
+    def test_corrupt_packet_is_rejected(self):
+        frame = empty_frame()
+        frame[1] = [9, 9, 9]
+        data = bytearray(encode_frame(empty_frame(), frame)[0])
+        data[HEADER.size + 1] ^= 0xFF
+        decoded = empty_frame()
+        with self.assertRaises(ValueError):
+            decode_packet(bytes(data), decoded)
+        self.assertFalse(decoded.any())
+
+
+class FrameEncoderTest(unittest.TestCase):
+
+    INSTRUCTIONS = ["Pixel,255,0,0,3", "Pixels,0,255,0,10,11,12,999", "sleep,100",
+                    "ClPixel,11", "broken,line", "Pixel,1,2,3,600", "sleep,50", "clearCube", "Pixel,0,0,9,0"]
+
+    def test_instructions_are_replayed(self):
+        encoder = FrameEncoder()
+        decoded = empty_frame()
+        sleeps = []
+        for instruction in self.INSTRUCTIONS:
+            for data in encoder.feed(instruction):
+                sleeps.append(decode_packet(data, decoded))
+                self.assertTrue((decoded == encoder.shown).all())
+        self.assertEqual(sleeps, [100, 50])
+        # the frame after the last sleep is shown by a flush
+        for data in encoder.flush():
+            decode_packet(data, decoded)
+        self.assertEqual(np.flatnonzero(decoded.any(axis=1)).tolist(), [0])
+        self.assertEqual(encoder.flush(), [])
+
+    def test_compile_frames(self):
+        frames = compile_frames(self.INSTRUCTIONS)
+        self.assertEqual([sleep for frame, sleep in frames], [100, 50, 0])
+        self.assertEqual(np.flatnonzero(frames[0][0].any(axis=1)).tolist(), [3, 10, 11, 12])
+        self.assertEqual(np.flatnonzero(frames[1][0].any(axis=1)).tolist(), [3, 10, 12])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Frame table of the FEI LED cube sketch.
+
+The printed calls are played on the bit cube, every sleep ends a frame, and
+the sketch holds at most MAX_FRAMES of them.
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube FEI"))
+from frametable import FRAME_BYTES, MAX_DURATION, MAX_FRAMES, frame_table, generate_sketch, parse
+
+
+def layer_bytes(*voxels):
+    "64 frame bytes with the (x, y, z) voxels on"
+    cube = bytearray(FRAME_BYTES)
+    for x, y, z in voxels:
+        cube[z * 8 + y] |= 1 << x
+    return bytes(cube)
+
+
+def sketch_table(sketch):
+    "FRAME_COUNT, LOOP_START and the durations of a generated sketch"
+    count = int(re.search(r"#define FRAME_COUNT (\d+)", sketch).group(1))
+    start = int(re.search(r"#define LOOP_START (\d+)", sketch).group(1))
+    durations = re.search(r"durations\[FRAME_COUNT\] PROGMEM = \{(.*?)\};", sketch, re.DOTALL).group(1)
+    return count, start, [int(value) for value in durations.split(",")]
+
+
+class FrameTableTest(unittest.TestCase):
+
+    def test_parse(self):
+        calls = parse("setLed(1, 2, 3);\nclearLed(1.0,2,3)\nprint me\nclearCube();\nsleep( 250 );\n")
+        self.assertEqual(calls, [("setLed", [1, 2, 3]), ("clearLed", [1, 2, 3]), ("clearCube", []), ("sleep", [250])])
+
+    def test_program_which_clears_the_cube(self):
+        frames, start = frame_table("clearCube();\nsetLed(1,2,3);\nsleep(100);\nsetLed(9,0,0);\n"
+                                    "setLed(0,0,7);\nsleep(50);\n")
+        # every pass is the same, the table loops from its first frame
+        self.assertEqual(frames, [(layer_bytes((1, 2, 3)), 100), (layer_bytes((1, 2, 3), (0, 0, 7)), 50)])
+        self.assertEqual(start, 0)
+
+    def test_second_pass_starts_from_the_first(self):
+        frames, start = frame_table("setLed(0,0,0);\nsleep(10);\nclearLed(0,0,0);\nsetLed(1,0,0);\nsleep(10);\n")
+        self.assertEqual(frames, [(layer_bytes((0, 0, 0)), 10), (layer_bytes((1, 0, 0)), 10),
+                                  (layer_bytes((0, 0, 0), (1, 0, 0)), 10), (layer_bytes((1, 0, 0)), 10)])
+        self.assertEqual(start, 2)
+
+    def test_equal_frames_are_merged_and_long_sleeps_split(self):
+        # a frame lasts at most MAX_DURATION ms
+        frames, start = frame_table("clearCube();\nsetLed(0,0,0);\nsleep(100);\nsleep(200);\nsleep(70000);\n")
+        self.assertEqual([duration for frame, duration in frames], [300, MAX_DURATION, 70000 - MAX_DURATION])
+
+    def test_program_without_sleeps(self):
+        frames, start = frame_table("setLed(7,7,7);\n")
+        self.assertEqual(frames, [(layer_bytes((7, 7, 7)), 0)])
+
+    def test_sketch_holds_the_table(self):
+        sketch = generate_sketch("clearCube();\nsetLed(1,2,3);\nsleep(100);\nclearCube();\nsleep(50);\n")
+        self.assertEqual(sketch_table(sketch), (2, 0, [100, 50]))
+        self.assertIn("{" + ", ".join(["0x00"] * 26 + ["0x02"] + ["0x00"] * 37) + "}", sketch)
+
+    def test_frames_beyond_the_flash_are_cut(self):
+        program = "".join("clearCube();\nsetLed(%d,%d,%d);\nsleep(%d);\n" % (i % 8, i // 8 % 8, i // 64 % 8, i + 1)
+                          for i in range(MAX_FRAMES + 20))
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            sketch = generate_sketch(program)
+        count, start, durations = sketch_table(sketch)
+        self.assertEqual(count, MAX_FRAMES)
+        self.assertEqual(start, 0)
+        self.assertEqual(durations, list(range(1, MAX_FRAMES + 1)))
+        self.assertIn("only the first %d fit" % MAX_FRAMES, printed.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
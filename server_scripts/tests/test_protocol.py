@@ -0,0 +1,69 @@
+"""
+TOS1A response frames parsed one by one and as a batch.
+
+parseFrames parses the buffer of a whole drain at once for the binary
+output, it has to accept and reject the same frames as parseFrame.
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a"))
+from protocol import VALUES, makeCommand, parseFrame, parseFrames
+
+
+def reply(values):
+    return makeCommand(",".join(values))
+
+
+def replies(count, seed=0):
+    "Valid response frames of random device values"
+    generator = random.Random(seed)
+    return [reply(["%.3f" % generator.uniform(-100, 100) for _ in range(VALUES)]) for _ in range(count)]
+
+
+class ParseFramesTest(unittest.TestCase):
+
+    def assertSameAsParseFrame(self, frames):
+        values, dropped = parseFrames(b"".join(frames))
+        bodies = [parseFrame(frame) for frame in frames]
+        expected = [[float(value) for value in bytes(body).split(b",")] for body in bodies if body is not None]
+        self.assertEqual(values.shape, (len(expected), VALUES))
+        self.assertEqual(values.tolist(), expected)
+        self.assertEqual(dropped, bodies.count(None))
+
+    def test_valid_frames(self):
+        self.assertSameAsParseFrame(replies(50))
+
+    def test_empty_buffer(self):
+        values, dropped = parseFrames(b"")
+        self.assertEqual(values.shape, (0, VALUES))
+        self.assertEqual(dropped, 0)
+
+    def test_corrupted_frames_are_dropped(self):
+        frames = replies(10)
+        # a flipped value keeps the old checksum
+        frames[3] = frames[3].replace(b"$", b"$9", 1)
+        frames[7] = frames[7][:-3] + b"\n"
+        self.assertSameAsParseFrame(frames)
+        self.assertEqual(parseFrames(b"".join(frames))[1], 2)
+
+    def test_wrong_number_of_values_is_dropped(self):
+        frames = replies(5)
+        frames.insert(2, reply(["1"] * (VALUES - 1)))
+        frames.append(reply(["1"] * (VALUES + 1)))
+        values, dropped = parseFrames(b"".join(frames))
+        self.assertEqual(values.shape, (5, VALUES))
+        self.assertEqual(dropped, 2)
+
+    def test_values_which_are_not_numbers_are_dropped(self):
+        frames = replies(5)
+        frames.insert(1, reply(["x"] * VALUES))
+        values, dropped = parseFrames(b"".join(frames))
+        self.assertEqual(values.tolist(), parseFrames(b"".join(replies(5)))[0].tolist())
+        self.assertEqual(dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
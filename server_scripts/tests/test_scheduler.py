@@ -0,0 +1,84 @@
+"""
+Deadlines of the sampling scheduler on a fake clock.
+
+Slots stay at start + n * period whatever a sample costs; an overrun either
+skips the slots already in the past or runs them back to back.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from scheduler import CATCHUP, SKIP, SampleScheduler
+
+
+class FakeClock:
+    """Time which only moves when the loop sleeps or works."""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+class SampleSchedulerTest(unittest.TestCase):
+
+    def scheduler(self, policy):
+        self.clock = FakeClock()
+        scheduler = SampleScheduler(0.1, policy, self.clock, self.clock.sleep)
+        scheduler.start()
+        return scheduler
+
+    def test_slots_do_not_drift(self):
+        scheduler = self.scheduler(SKIP)
+        for slot in range(1, 51):
+            # every sample costs a different part of the period
+            self.clock.now += 0.001 * (slot % 7)
+            self.assertEqual(scheduler.wait(), slot)
+            self.assertAlmostEqual(scheduler.elapsed(), slot * 0.1)
+        stats = scheduler.stats()
+        self.assertEqual(stats["samples"], 50)
+        self.assertEqual(stats["overruns"], 0)
+        self.assertEqual(stats["skipped"], 0)
+        self.assertAlmostEqual(stats["jitter"]["max"], 0.0)
+
+    def test_skip_drops_the_slots_in_the_past(self):
+        scheduler = self.scheduler(SKIP)
+        # a sample of 0.35 s misses the deadlines at 0.1, 0.2 and 0.3
+        self.clock.now += 0.35
+        self.assertEqual(scheduler.wait(), 3)
+        self.assertAlmostEqual(scheduler.elapsed(), 0.35)
+        # the next slot is on time again
+        self.assertEqual(scheduler.wait(), 4)
+        self.assertAlmostEqual(scheduler.elapsed(), 0.4)
+        stats = scheduler.stats()
+        self.assertEqual(stats["overruns"], 1)
+        self.assertEqual(stats["skipped"], 2)
+        self.assertEqual(stats["samples"], 2)
+
+    def test_catchup_runs_every_late_slot(self):
+        scheduler = self.scheduler(CATCHUP)
+        self.clock.now += 0.35
+        # the three late slots run back to back without sleeping
+        self.assertEqual([scheduler.wait() for _ in range(3)], [1, 2, 3])
+        self.assertAlmostEqual(scheduler.elapsed(), 0.35)
+        self.assertEqual(scheduler.wait(), 4)
+        self.assertAlmostEqual(scheduler.elapsed(), 0.4)
+        stats = scheduler.stats()
+        self.assertEqual(stats["overruns"], 3)
+        self.assertEqual(stats["skipped"], 0)
+        self.assertAlmostEqual(stats["jitter"]["max"], 0.25)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            SampleScheduler(0)
+        with self.assertRaises(ValueError):
+            SampleScheduler(0.1, "later")
+
+
+if __name__ == '__main__':
+    unittest.main()
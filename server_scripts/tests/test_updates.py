@@ -0,0 +1,85 @@
+"""
+Debouncing and coalescing of live parameter changes.
+
+A burst of changes is applied once with the latest value of every key, a
+continuous burst at least every maxDelay seconds, and every request is
+acknowledged with the update it was merged into.
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a", "matlab"))
+from updates import UpdateChannel
+
+
+class UpdateChannelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.applied = []
+        self.lock = threading.Lock()
+
+    def apply(self, values):
+        with self.lock:
+            self.applied.append(dict(values))
+        return values.keys()
+
+    def test_burst_is_applied_once(self):
+        channel = UpdateChannel(self.apply, debounce=0.1, maxDelay=1.0)
+        try:
+            futures = [channel.submit({"P": str(value), "I": "1"}) for value in range(5)]
+            futures.append(channel.submit({"D": "2"}))
+            acks = [future.result(timeout=2) for future in futures]
+        finally:
+            channel.close()
+        self.assertEqual(self.applied, [{"P": "4", "I": "1", "D": "2"}])
+        for ack in acks:
+            self.assertEqual(ack["keys"], ["D", "I", "P"])
+            self.assertEqual(ack["coalesced"], 6)
+            # the debounce window passed before the update
+            self.assertGreaterEqual(ack["latency"], 0.1)
+        self.assertEqual(channel.stats(), {"requests": 6, "updates": 1})
+
+    def test_continuous_burst_is_applied_every_max_delay(self):
+        channel = UpdateChannel(self.apply, debounce=0.1, maxDelay=0.2)
+        try:
+            began = time.monotonic()
+            futures = []
+            while time.monotonic() - began < 0.7:
+                futures.append(channel.submit({"P": str(len(futures))}))
+                time.sleep(0.02)
+            acks = [future.result(timeout=2) for future in futures]
+        finally:
+            channel.close()
+        # no gap of the debounce window, so only maxDelay ends a batch
+        self.assertGreaterEqual(len(self.applied), 3)
+        # every request was acknowledged by the update it was merged into
+        self.assertAlmostEqual(sum(1 / ack["coalesced"] for ack in acks), len(self.applied))
+        self.assertEqual(self.applied[-1], {"P": str(len(futures) - 1)})
+        self.assertTrue(all(ack["latency"] < 0.2 + 0.1 for ack in acks))
+
+    def test_failed_apply_fails_its_requests(self):
+        def apply(values):
+            raise ValueError("Unknown parameter")
+        channel = UpdateChannel(apply, debounce=0.01)
+        try:
+            future = channel.submit({"X": "1"})
+            with self.assertRaises(ValueError):
+                future.result(timeout=2)
+        finally:
+            channel.close()
+        self.assertEqual(channel.stats(), {"requests": 1, "updates": 0})
+
+    def test_close_applies_what_is_pending(self):
+        channel = UpdateChannel(self.apply, debounce=10, maxDelay=10)
+        future = channel.submit({"P": "1"})
+        channel.close()
+        self.assertEqual(future.result(timeout=0)["keys"], ["P"])
+        with self.assertRaises(RuntimeError):
+            channel.submit({"P": "2"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+The Looking Glass instruction path against the virtual cube.
+
+Programs run through the sandbox and the transport of the Python runner on a
+pty cube, the voxel state and the counters of the cube are checked once the
+run is done, in text and in binary mode. The runner itself is stopped
+through its control socket:
+
+    python3 -m unittest discover server_scripts/tests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LED cube Looking glass", "Python")
+sys.path.insert(0, RUNNER)
+import start
+import transport
+from control import control_path, send_command
+from sandbox import run_code
+from virtualcube import VirtualCube
+
+PROGRAM = '''
+setLed([1, 2, 3], [255, 0, 0])
+setLeds([[0, 0, 0], [7, 7, 7]], [0, 255, 0])
+sleep(1)
+clearLed([1, 2, 3])
+fillPlane("z", 4, [0, 0, 255])
+show(1)
+'''
+
+# 20 s of drawing, the runner is stopped long before
+ENDLESS = """
+for i in range(100):
+    setLed([1, 2, 3], [255, 0, 0])
+    sleep(200)
+"""
+
+
+class VirtualCubeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.port = os.path.join(self.directory.name, "cube")
+        self.cube = VirtualCube(self.port, boot_time=0.01).start()
+        self.binary = transport.BINARY
+
+    def tearDown(self):
+        transport.BINARY = self.binary
+        self.cube.stop()
+        self.directory.cleanup()
+
+    def draw(self, code):
+        "Voxel state after sending the lines of the program, the cube is not cleared"
+        lines = list(run_code(start.API, code, start.CPU_BUDGET, start.INSTRUCTION_BUDGET))
+        cube = transport.open_transport(self.port)
+        try:
+            cube.send(lines)
+        finally:
+            cube.close()
+        # every unit was acknowledged, so it was drawn
+        return self.cube.frame
+
+    def assertDrawn(self, frame):
+        # z * 64 + x * 8 + y
+        self.assertEqual(frame[0].tolist(), [0, 255, 0])
+        self.assertEqual(frame[511].tolist(), [0, 255, 0])
+        self.assertEqual(frame[3 * 64 + 1 * 8 + 2].tolist(), [0, 0, 0])
+        plane = frame[4 * 64:5 * 64]
+        self.assertTrue((plane == [0, 0, 255]).all())
+        self.assertEqual(int(frame.any(axis=1).sum()), 66)
+
+    def test_text_instructions(self):
+        transport.BINARY = False
+        self.assertDrawn(self.draw(PROGRAM))
+        stats = self.cube.stats()
+        self.assertEqual(stats["packets"], 0)
+        self.assertEqual(stats["overflows"], 0)
+        self.assertEqual(stats["malformed"], 0)
+
+    def test_frame_packets(self):
+        transport.BINARY = True
+        self.assertDrawn(self.draw(PROGRAM))
+        stats = self.cube.stats()
+        self.assertEqual(stats["instructions"], 0)
+        self.assertEqual(stats["frames"], 2)
+        self.assertEqual(stats["overflows"], 0)
+        self.assertEqual(stats["malformed"], 0)
+
+    def test_runner_clears_cube(self):
+        transport.BINARY = False
+        start.send_serial_instructions(self.port, PROGRAM)
+        # the runner closed the port, the cube keeps its state until the next connection
+        time.sleep(0.05)
+        stats = self.cube.stats()
+        self.assertEqual(stats["connections"], 1)
+        # the program's lines and the final clearCube
+        self.assertEqual(stats["instructions"], len(list(run_code(start.API, PROGRAM))) + 1)
+        self.assertEqual(stats["overflows"], 0)
+        self.assertFalse(self.cube.frame.any())
+
+    def test_stop_ends_the_run(self):
+        output = os.path.join(self.directory.name, "output.txt")
+        runner = subprocess.Popen([sys.executable, os.path.join(RUNNER, "start.py"), "--port", self.port,
+                                   "--output", output, "--input",
+                                   "demo_name:, uploaded_code_file:, uploaded_file:, python_code:" + ENDLESS],
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            deadline = time.monotonic() + 10
+            while not self.cube.frame.any() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertTrue(self.cube.frame.any())
+            started = time.monotonic()
+            reply = send_command(control_path(output), {"command": "stop"})
+            stdout, stderr = runner.communicate(timeout=10)
+        finally:
+            runner.kill()
+        self.assertEqual(reply, {"status": "success"})
+        # answered once the sender was terminated and the cube cleared
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(runner.returncode, 0)
+        self.assertEqual(stderr, "")
+        self.assertIn("Stopped", stdout)
+        self.assertFalse(os.path.exists(control_path(output)))
+
+
+if __name__ == '__main__':
+    unittest.main()
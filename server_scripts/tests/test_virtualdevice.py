@@ -0,0 +1,90 @@
+"""
+The TOS1A openloop runner against the virtual board.
+
+openloop/start.py runs as the queue worker starts it, on a VirtualDevice
+replaying public/file.csv. The rows it wrote are checked against the
+counters and the reply log of the device, with and without lost replies.
+"""
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+TOM1A = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tom1a")
+sys.path.insert(0, TOM1A)
+from virtualdevice import VirtualDevice
+
+START = os.path.join(TOM1A, "openloop", "start.py")
+INPUT = "t_sim:1,s_rate:50,c_lamp:50,c_led:0,c_fan:20"
+
+
+class VirtualDeviceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.port = os.path.join(self.directory.name, "tos1a")
+        self.output = os.path.join(self.directory.name, "output.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def runOpenloop(self, device, *options):
+        "Rows of the output file and the reader stats start.py printed"
+        device.start()
+        try:
+            # no broker of a real port is picked up
+            environment = dict(os.environ, OLM_BROKER_DIR=self.directory.name)
+            environment.pop("OLM_PUBLISH_SOCKET", None)
+            result = subprocess.run([sys.executable, START, "--port", self.port, "--output", self.output,
+                                     "--input", INPUT] + list(options),
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                    env=environment, timeout=30)
+        finally:
+            device.stop()
+        self.assertEqual(result.stderr, "")
+        summary = [line for line in result.stdout.splitlines() if line.startswith("Rows written:")]
+        self.assertEqual(len(summary), 1, result.stdout)
+        stats = ast.literal_eval(summary[0][summary[0].index("{"):])
+        with open(self.output) as file:
+            rows = [line.rstrip("\n").split(",") for line in file if line.strip()]
+        return rows, stats
+
+    def assertMeasured(self, device):
+        counters = device.stats()
+        self.assertEqual(counters["starts"], 1)
+        self.assertEqual(counters["stops"], 1)
+        self.assertEqual(counters["controls"], 1)
+        self.assertEqual(counters["rejected"], 0)
+        self.assertFalse(counters["measuring"])
+
+    def test_every_reply_is_written(self):
+        device = VirtualDevice(self.port, seed=1)
+        rows, stats = self.runOpenloop(device)
+        counters = device.stats()
+        self.assertMeasured(device)
+        # 20 slots of 50 ms in one second
+        self.assertGreaterEqual(len(rows), 18)
+        self.assertLessEqual(len(rows), 21)
+        self.assertEqual(stats["lost"], 0)
+        self.assertEqual(stats["samples"], len(rows))
+        self.assertEqual(counters["reads"], len(rows))
+        # time, the 17 device values in the order they were replied and the inputs
+        self.assertEqual([",".join(row[1:18]).encode() for row in rows], [body for sent, replied, body in device.replies])
+        self.assertTrue(all(row[18:] == ["50", "0", "20"] for row in rows))
+
+    def test_lost_replies_are_counted(self):
+        device = VirtualDevice(self.port, drop=0.1, corrupt=0.1, seed=2)
+        rows, stats = self.runOpenloop(device, "--retries", "0")
+        counters = device.stats()
+        self.assertMeasured(device)
+        self.assertGreater(counters["dropped"] + counters["corrupted"], 0)
+        # without retries every read either gives a row or is lost
+        self.assertEqual(stats["lost"], counters["dropped"] + counters["corrupted"])
+        self.assertEqual(counters["reads"], len(rows) + stats["lost"])
+        self.assertEqual(stats["retried"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Flush policy of the buffered output writer.
+
+Rows stay in memory until the row count or the age of the oldest buffered
+row reaches its limit, then reach the file in one write.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from writer import OutputWriter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class OutputWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "output.csv")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def content(self):
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    def test_flushes_after_flush_rows(self):
+        with OutputWriter(self.path, flush_rows=3, flush_interval=0, clock=self.clock) as writer:
+            writer.write(b"1\n")
+            writer.write("2\n")
+            self.assertEqual(self.content(), b"")
+            writer.write_row([3, 4])
+            self.assertEqual(self.content(), b"1\n2\n3,4\n")
+            writer.write(b"5\n")
+            self.assertEqual(writer.stats(), {"rows_written": 3, "bytes_written": 8, "flushes": 1})
+        # close writes what is left
+        self.assertEqual(self.content(), b"1\n2\n3,4\n5\n")
+        self.assertEqual(writer.stats(), {"rows_written": 4, "bytes_written": 10, "flushes": 2})
+
+    def test_flushes_after_flush_interval(self):
+        with OutputWriter(self.path, flush_rows=0, flush_interval=0.5, clock=self.clock) as writer:
+            writer.write(b"1\n")
+            self.clock.now = 0.4
+            writer.write(b"2\n")
+            self.assertEqual(self.content(), b"")
+            # the age of the oldest row counts
+            self.clock.now = 0.5
+            writer.write(b"3\n")
+            self.assertEqual(self.content(), b"1\n2\n3\n")
+            self.clock.now = 0.9
+            writer.write(b"4\n")
+            self.assertEqual(self.content(), b"1\n2\n3\n")
+            self.assertEqual(writer.flushes, 1)
+
+    def test_without_limits_every_row_is_flushed(self):
+        with OutputWriter(self.path, flush_rows=0, flush_interval=0, clock=self.clock) as writer:
+            writer.write(b"1\n")
+            self.assertEqual(self.content(), b"1\n")
+            writer.write(b"2\n")
+            self.assertEqual(writer.flushes, 2)
+
+    def test_appends_to_the_file(self):
+        with open(self.path, "wb") as file:
+            file.write(b"0\n")
+        with OutputWriter(self.path, clock=self.clock) as writer:
+            writer.write(b"1\n")
+        writer.close()
+        self.assertEqual(self.content(), b"0\n1\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,375 @@
+#!/usr/bin/python3
+"""
+Resident serial-port broker for the TOS1A board.
+
+The broker opens the device port once and keeps it open. Clients (openloop
+start/change, stop.py, read.py) talk to it over a local UNIX socket and every
+frame they send is queued and executed by a single I/O thread, so commands
+from different scripts never interleave on the wire. The MATLAB/Scilab blocks
+which expect a tty can use the pseudo-terminal endpoint instead.
+
+Wire protocol on the socket: the client sends one command frame per line
+(exactly what makeCommand() returns) and gets exactly one line back - the
+device reply for a bare SGV read, an empty line for everything else or when
+the device did not answer in time. A client may first send a line
+"#timeout <seconds>": its reads are then answered within that time, and a
+read still queued when its client stopped waiting is skipped instead of
+keeping the port busy. SEE goes ahead of the queued transactions, so the
+measurement ends even while reads of a dropping board are waiting.
+
+Run it next to the queue worker, one instance per port:
+
+    ./broker.py --port /dev/ttyACM0
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import pty
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tty
+from concurrent.futures import Future
+
+import serial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from unixserver import ThreadingUnixServer
+
+BAUDRATE = 115200
+SOCKET_DIR = os.environ.get("OLM_BROKER_DIR", "/tmp")
+TIMEOUT_HEADER = b"#timeout "
+# a client waits this much longer than its read timeout, the broker answers first
+GRACE = 0.5
+# how long a client waits for the ack of a write queued behind reads
+ACK_TIMEOUT = 5.0
+# queue priorities, the end of a measurement goes first
+URGENT = 0
+NORMAL = 1
+CLOSE = 2
+
+
+def socketPath(port):
+    "Path of the broker socket for the given port"
+    return os.path.join(SOCKET_DIR, "olm-tos1a-" + os.path.basename(port) + ".sock")
+
+
+def ptyPath(port):
+    "Path of the broker pty symlink for the given port"
+    return os.path.join(SOCKET_DIR, "olm-tos1a-" + os.path.basename(port) + ".pty")
+
+
+def expectsReply(frame):
+    "Only a bare SGV is answered with a data line"
+    return frame.startswith(b"$SGV*")
+
+
+def isUrgent(frame):
+    "SEE ends the measurement, it does not wait behind reads"
+    return frame.startswith(b"$SEE*")
+
+
+class Broker:
+    """Owns the serial port and executes queued transactions one by one."""
+
+    def __init__(self, port, timeout=1.0):
+        """timeout -- read timeout of the clients which do not send their own"""
+        self.port = port
+        self.timeout = timeout
+        self.serial = serial.Serial(port, BAUDRATE, timeout=timeout)
+        self.transactions = queue.PriorityQueue()
+        # keeps the order of transactions of the same priority
+        self.order = itertools.count()
+        self.skipped = 0
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, frame, deadline=None):
+        "Queue a frame, a read not started by deadline (monotonic time) is answered with an empty line"
+        future = Future()
+        priority = URGENT if isUrgent(frame) else NORMAL
+        self.transactions.put((priority, next(self.order), frame, future, deadline))
+        return future
+
+    def run(self):
+        while True:
+            priority, order, frame, future, deadline = self.transactions.get()
+            if frame is None:
+                break
+            try:
+                if expectsReply(frame):
+                    timeout = self.timeout
+                    if deadline is not None:
+                        timeout = deadline - time.monotonic()
+                        if timeout <= 0:
+                            # the client stopped waiting, the read would only delay the next ones
+                            self.skipped += 1
+                            future.set_result(b"")
+                            continue
+                    # drop replies to earlier write-only commands nobody waited for
+                    self.serial.reset_input_buffer()
+                    self.serial.timeout = timeout
+                    self.serial.write(frame)
+                    future.set_result(self.serial.readline())
+                else:
+                    self.serial.write(frame)
+                    future.set_result(b"")
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self):
+        self.transactions.put((CLOSE, next(self.order), None, None, None))
+        self.worker.join()
+        self.serial.close()
+
+
+class BrokerRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        timeout = None
+        for frame in self.rfile:
+            if frame.startswith(TIMEOUT_HEADER):
+                timeout = float(frame[len(TIMEOUT_HEADER):])
+                continue
+            deadline = time.monotonic() + timeout if timeout else None
+            try:
+                reply = self.server.broker.submit(frame, deadline).result()
+            except Exception as e:
+                print("Transaction failed:", e, file=sys.stderr)
+                reply = b""
+            if not reply.endswith(b"\n"):
+                reply += b"\n"
+            try:
+                self.wfile.write(reply)
+            except (BrokenPipeError, ConnectionResetError):
+                # the client is gone
+                return
+
+
+class BrokerServer(ThreadingUnixServer):
+
+    def __init__(self, path, broker):
+        self.broker = broker
+        super().__init__(path, BrokerRequestHandler)
+
+
+def servePty(broker, link):
+    "Relay lines written to the pty to the port and write replies back"
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.ttyname(slave), link)
+
+    def relay():
+        pending = b""
+        while True:
+            pending += os.read(master, 1024)
+            while b"\n" in pending:
+                frame, pending = pending.split(b"\n", 1)
+                reply = broker.submit(frame + b"\n").result()
+                if reply:
+                    os.write(master, reply)
+
+    thread = threading.Thread(target=relay, daemon=True)
+    thread.start()
+    return slave
+
+
+class BrokerPort:
+    """Client side of the broker with the same write/query calls as DirectPort."""
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self.connect()
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        if self.timeout:
+            # the broker answers a read within the timeout, waiting longer only covers a stuck broker
+            self.sock.sendall(TIMEOUT_HEADER + repr(self.timeout).encode("ascii") + b"\n")
+        self.file = self.sock.makefile("rb")
+
+    def transaction(self, frame, timeout):
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.sendall(frame)
+            return self.file.readline()
+        except socket.timeout:
+            # the late reply would answer the next frame, continue on a fresh connection
+            self.close()
+            self.connect()
+            return b""
+
+    def write(self, frame):
+        # queued behind at most the reads of other clients, which end at their deadlines
+        self.transaction(frame, max(ACK_TIMEOUT, (self.timeout or 0) + GRACE))
+
+    def query(self, frame):
+        reply = self.transaction(frame, self.timeout + GRACE if self.timeout else None)
+        return reply if reply.strip() else b""
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class DirectPort:
+    """Fallback used when no broker is running for the port."""
+
+    def __init__(self, port, timeout=None):
+        self.serial = serial.Serial(port, BAUDRATE, timeout=timeout)
+
+    def write(self, frame):
+        self.serial.write(frame)
+
+    def query(self, frame):
+        self.serial.reset_input_buffer()
+        self.serial.write(frame)
+        return self.serial.readline()
+
+    def close(self):
+        self.serial.close()
+
+
+def openPort(port, timeout=None):
+    "Connect to the broker of the port if it runs, otherwise open the port directly"
+    path = socketPath(port)
+    if os.path.exists(path):
+        try:
+            return BrokerPort(path, timeout)
+        except OSError:
+            pass
+    return DirectPort(port, timeout)
+
+
+class LineProtocol(asyncio.Protocol):
+    """Lines received from the port or the broker socket, for AsyncPort."""
+
+    def __init__(self):
+        self.lines = asyncio.Queue()
+        self.pending = b""
+
+    def data_received(self, data):
+        self.pending += data
+        while b"\n" in self.pending:
+            line, self.pending = self.pending.split(b"\n", 1)
+            self.lines.put_nowait(line + b"\n")
+
+    def connection_lost(self, exc):
+        self.lines.put_nowait(b"")
+
+    def clear(self):
+        while not self.lines.empty():
+            self.lines.get_nowait()
+
+
+class AsyncPort:
+    """
+    write/query calls of BrokerPort and DirectPort for tasks of an asyncio
+    loop. Nothing blocks the loop, a query waits for its reply without a
+    thread, so one loop can sample many boards.
+    """
+
+    def __init__(self, port, timeout=None):
+        self.port = port
+        self.timeout = timeout
+        self.path = None
+        self.serial = None
+        self.transports = []
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        "Connect to the broker of the port if it runs, otherwise open the port directly"
+        path = socketPath(self.port)
+        if os.path.exists(path):
+            try:
+                await self.connect(path)
+                return self
+            except OSError:
+                pass
+        loop = asyncio.get_running_loop()
+        self.serial = serial.Serial(self.port, BAUDRATE, timeout=0)
+        # the transports close their own copies of the descriptor
+        fd = self.serial.fileno()
+        reader, self.protocol = await loop.connect_read_pipe(LineProtocol, os.fdopen(os.dup(fd), "rb", buffering=0))
+        writer, _ = await loop.connect_write_pipe(asyncio.Protocol, os.fdopen(os.dup(fd), "wb", buffering=0))
+        self.transports = [reader, writer]
+        return self
+
+    async def connect(self, path):
+        transport, self.protocol = await asyncio.get_running_loop().create_unix_connection(LineProtocol, path)
+        self.path = path
+        self.transports = [transport, transport]
+        if self.timeout:
+            transport.write(TIMEOUT_HEADER + repr(self.timeout).encode("ascii") + b"\n")
+
+    async def readline(self, timeout=None):
+        if timeout is None and self.timeout:
+            # the broker answers within the timeout, the direct port does not answer at all after it
+            timeout = self.timeout + GRACE if self.path is not None else self.timeout
+        try:
+            return await asyncio.wait_for(self.protocol.lines.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def write(self, frame):
+        async with self.lock:
+            self.transports[1].write(frame)
+            if self.path is not None:
+                # the broker answers every frame
+                if await self.readline(max(ACK_TIMEOUT, (self.timeout or 0) + GRACE)) is None:
+                    await self.reconnect()
+
+    async def query(self, frame):
+        async with self.lock:
+            if self.path is None:
+                # drop replies to earlier write-only commands nobody waited for
+                self.protocol.clear()
+            self.transports[1].write(frame)
+            reply = await self.readline()
+            if reply is None:
+                if self.path is not None:
+                    # the late reply would answer the next query, continue on a fresh connection
+                    await self.reconnect()
+                return b""
+        return reply if reply.strip() else b""
+
+    async def reconnect(self):
+        self.transports[0].close()
+        await self.connect(self.path)
+
+    def close(self):
+        for transport in set(self.transports):
+            transport.close()
+        if self.serial is not None:
+            self.serial.close()
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", required=True)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--no-pty", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    broker = Broker(args.port, args.timeout)
+    if not args.no_pty:
+        servePty(broker, ptyPath(args.port))
+    with BrokerServer(socketPath(args.port), broker) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socketPath(args.port))
+            broker.close()
@@ -11,6 +11,9 @@ import time
 import getpass
 import subprocess
 
+from pool import PoolClient
+from session import MatlabSession
+
 def getArguments():
    parser = argparse.ArgumentParser()
    print("HERE")
@@ -31,57 +34,23 @@ def getArguments():
    return args_map
 
 def app(args):
-	print("LAMP: ")
-	# currentDir = os.path.dirname(os.path.abspath(__file__))
-
-	matlabInstance = matlab.engine.connect_matlab(matlab.engine.find_matlab()[0])
-
-	inputFan = args["input_fan"]
-	inputLamp = args["input_lamp"]
-	inputLed = args["input_led"]
-	regRequest = args["reg_request"]
-
-	print("LAMP: ", inputLamp)
-	print("FAN: ", inputFan)
-	print("LED: ", inputLed)
-	print("regRequest: ", regRequest)
-
-	print("<=================================>")
-
-	print("MATLAB LAMP: ", matlabInstance.workspace['input_lamp'])
-	print("MATLAB FAN: ", matlabInstance.workspace['input_fan'])
-	print("MATLAB LED: ", matlabInstance.workspace['input_led'])
-	print("MATLAB regRequest: ", matlabInstance.workspace['reg_request'])
-
-	# matlabInstance.workspace['input_fan'] = float(inputFan)
-	# matlabInstance.workspace['input_lamp'] = float(inputLamp)
-	# matlabInstance.workspace['input_led'] = float(inputLed)
-	# matlabInstance.workspace['reg_request'] = float(regRequest)
-
-	for key, value in args.items():
-		isFloat = False
+	print("LAMP: ", args["input_lamp"])
+	print("FAN: ", args["input_fan"])
+	print("LED: ", args["input_led"])
+	print("regRequest: ", args["reg_request"])
+
+	pool = PoolClient.connect()
+	if pool is not None:
+		# the session running the experiment of this port takes the change
 		try:
-			print("KEY: ", key, value)
-			matlabInstance.workspace[key] = float(value)
-			isFloat = True
-		except Exception as ex:
-			print()
-
-	print("<=================================>")
+			ack = pool.request("change", args["port"], args)
+			print("APPLIED: ", ack["keys"], "merged:", ack["coalesced"], "latency: %.1f ms" % (ack["latency"] * 1000))
+		finally:
+			pool.close()
+		return
 
-	print("MATLAB LAMP: ", matlabInstance.workspace['input_lamp'])
-	print("MATLAB FAN: ", matlabInstance.workspace['input_fan'])
-	print("MATLAB LED: ", matlabInstance.workspace['input_led'])
-	print("MATLAB regRequest: ", matlabInstance.workspace['reg_request'])
-
-	print("<=================================>")
-
-	# try:
-	# 	matlabInstance.eval("assignin(" + args["file_name"] + ",'SimulationCommand','Update')", nargout=0)
-	# except Exception as ex:
-	# 	print("EXCEPTION: ", ex)
-
-	matlabInstance.set_param(args["file_name"],'SimulationCommand','update',nargout=0)
+	matlabInstance = matlab.engine.connect_matlab(matlab.engine.find_matlab()[0])
+	MatlabSession(matlabInstance).change(args)
 
 	print("MATLAB LAMP: ", matlabInstance.workspace['input_lamp'])
 	print("MATLAB FAN: ", matlabInstance.workspace['input_fan'])
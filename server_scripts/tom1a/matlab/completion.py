@@ -0,0 +1,51 @@
+"""
+Waiting for a Simulink run to finish.
+
+The simulation status is polled with the engine's asynchronous calls
+(background=True) at an exponentially growing interval capped at maxDelay,
+so the wait costs a handful of engine round trips per second at most instead
+of a tight get_param loop pinning a core next to MATLAB. A hard deadline
+derived from the experiment duration makes sure a hung model cannot keep the
+runner alive forever.
+"""
+import time
+
+
+class CompletionTimeout(Exception):
+    pass
+
+
+def completionTimeout(duration, factor=1.5, margin=60.0):
+    "Hard deadline of a run lasting duration seconds, leaves room for model compilation"
+    return duration * factor + margin
+
+
+def waitForCompletion(engine, model, timeout, initialDelay=0.05, maxDelay=0.5, factor=2.0,
+                      clock=time.monotonic, sleep=time.sleep):
+    """
+    Block until the model reports 'stopped'.
+
+    Returns the number of status polls. Raises CompletionTimeout when the
+    model is still running after timeout seconds.
+    """
+    deadline = clock() + timeout
+    delay = initialDelay
+    polls = 0
+    while True:
+        future = engine.get_param(model, 'SimulationStatus', background=True)
+        try:
+            status = future.result(timeout=max(0.0, deadline - clock()))
+        except Exception:
+            if clock() >= deadline:
+                future.cancel()
+                raise CompletionTimeout(model + " did not stop in " + str(timeout) + " s")
+            raise
+        polls += 1
+        if status == 'stopped':
+            return polls
+
+        remaining = deadline - clock()
+        if remaining <= 0:
+            raise CompletionTimeout(model + " did not stop in " + str(timeout) + " s")
+        sleep(min(delay, remaining))
+        delay = min(delay * factor, maxDelay)
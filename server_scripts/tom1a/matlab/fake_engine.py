@@ -0,0 +1,122 @@
+"""
+Stand-in for matlab.engine used to benchmark the runner without MATLAB.
+
+FakeEngine implements the calls the runners make (workspace, eval, feval,
+get_param/set_param with background=True futures, load_system, quit). Every
+synchronous call costs a configurable round-trip latency, a started model
+reports 'running' for runDuration seconds and 'stopped' afterwards.
+"""
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class FakeWorkspace(dict):
+    "Base workspace, every assignment is an engine round trip like in matlab.engine"
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+
+    def __setitem__(self, key, value):
+        self.engine.roundTrip(super().__setitem__, key, value)
+
+
+class FakeEngine:
+
+    def __init__(self, runDuration=1.0, latency=0.0005, loadTime=0.0, clock=time.monotonic):
+        self.runDuration = runDuration
+        self.latency = latency
+        self.loadTime = loadTime
+        self.clock = clock
+        self.workspace = FakeWorkspace(self)
+        self.loaded = set()
+        self.stopsAt = {}
+        self.calls = 0
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def call(self, function, background, *args):
+        if background:
+            return self.executor.submit(self.roundTrip, function, *args)
+        return self.roundTrip(function, *args)
+
+    def roundTrip(self, function, *args):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return function(*args)
+
+    def stoppedAt(self, model):
+        "Time the model stopped on the engine clock, None while it runs"
+        stopsAt = self.stopsAt.get(model)
+        if stopsAt is None or stopsAt > self.clock():
+            return None
+        return stopsAt
+
+    def status(self, model, param):
+        if param != 'SimulationStatus':
+            raise ValueError("Unsupported parameter " + param)
+        return 'stopped' if self.stoppedAt(model) is not None or model not in self.stopsAt else 'running'
+
+    def command(self, model, param, value):
+        if param == 'SimulationCommand':
+            if value == 'start':
+                self.stopsAt[model] = self.clock() + self.runDuration
+            elif value == 'stop':
+                self.stopsAt[model] = min(self.stopsAt.get(model, self.clock()), self.clock())
+
+    def get_param(self, model, param, nargout=1, background=False):
+        return self.call(self.status, background, model, param)
+
+    def set_param(self, model, param, value, nargout=0, background=False):
+        return self.call(self.command, background, model, param, value)
+
+    def eval(self, code, nargout=0, background=False):
+        return self.call(lambda: None, background)
+
+    def feval(self, function, *args, nargout=1, background=False):
+        if function != 'olm_inject':
+            raise ValueError("Unsupported function " + function)
+        return self.call(self.inject, background, *args)
+
+    def inject(self, params, expressions):
+        dict.update(self.workspace, params)
+        dict.update(self.workspace, expressions)
+
+    def load(self, name):
+        time.sleep(self.loadTime)
+        self.loaded.add(os.path.basename(name).rsplit(".", 1)[0])
+
+    def load_system(self, name, nargout=0, background=False):
+        return self.call(self.load, background, name)
+
+    def addpath(self, path, nargout=0, background=False):
+        return self.call(lambda: None, background)
+
+    def cd(self, path, nargout=0, background=False):
+        return self.call(lambda: None, background)
+
+    def close_system(self, name, saveFlag=0, nargout=0, background=False):
+        return self.call(self.loaded.discard, background, name)
+
+    def desktop(self, nargout=0):
+        pass
+
+    def quit(self):
+        self.executor.shutdown(wait=False)
+
+
+def start_matlab(*args, background=False, **kwargs):
+    if background:
+        future = Future()
+        future.set_result(FakeEngine())
+        return future
+    return FakeEngine()
+
+
+def find_matlab():
+    return ("fake_engine",)
+
+
+def connect_matlab(name=None, **kwargs):
+    return FakeEngine()
@@ -0,0 +1,117 @@
+"""
+Cache of Simulink models kept loaded in a MATLAB session.
+
+Loading an uploaded schema and compiling it on start costs seconds, and the
+same few schemas are run over and over. ModelCache keeps recently used models
+loaded, keyed by the content hash of their .slx, so a repeat run skips
+load_system. With fastRestart the models also stay compiled between runs
+(Simulink Fast Restart); only tunable parameters may then change between
+runs, which is why it is off unless the pool is started with --fast-restart.
+
+A re-uploaded schema has a new hash: the stale copy is closed before the new
+one is loaded, MATLAB can only hold one model of a name. Models are evicted
+least recently used first when their estimated memory exceeds the budget.
+"""
+import hashlib
+import logging
+import os
+from collections import OrderedDict, namedtuple
+
+logfun = logging.getLogger("logfun")
+
+# a loaded and compiled model takes several times its compressed .slx size
+MEMORY_FACTOR = 10
+
+CachedModel = namedtuple("CachedModel", ["name", "directory", "digest", "size"])
+
+
+def fileDigest(path, chunk=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(chunk), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelCache:
+
+    def __init__(self, engine, budget=512 * 1024 * 1024, fastRestart=False):
+        self.engine = engine
+        self.budget = budget
+        self.fastRestart = fastRestart
+        self.models = OrderedDict()
+        # (path, mtime, size) -> digest, a schema is only hashed again when the file changes
+        self.digests = {}
+        self.paths = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def digest(self, path):
+        status = os.stat(path)
+        key = (path, status.st_mtime_ns, status.st_size)
+        if key not in self.digests:
+            self.digests = {k: v for k, v in self.digests.items() if k[0] != path}
+            self.digests[key] = fileDigest(path)
+        return self.digests[key], status.st_size
+
+    def load(self, directory, name, running=None):
+        "Make the model loaded and current, returns True on a cache hit"
+        path = os.path.join(directory, name + ".slx")
+        digest, size = self.digest(path)
+        cached = self.models.get(name)
+        if cached is not None and cached.digest == digest and cached.directory == directory:
+            self.models.move_to_end(name)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        if cached is not None:
+            logfun.info("%s changed, reloading it", name)
+            self.close(name)
+        if directory not in self.paths:
+            self.engine.addpath(directory, nargout=0)
+            self.paths.add(directory)
+        self.engine.load_system(path, nargout=0)
+        if self.fastRestart:
+            self.engine.set_param(name, 'FastRestart', 'on', nargout=0)
+        self.models[name] = CachedModel(name, directory, digest, size * MEMORY_FACTOR)
+        self.evict(keep=(name, running))
+        return False
+
+    def evict(self, keep=()):
+        "Close least recently used models until the rest fits the budget"
+        for name in list(self.models):
+            if self.used() <= self.budget:
+                break
+            if name in keep:
+                continue
+            logfun.info("evicting %s", name)
+            self.close(name)
+            self.evictions += 1
+
+    def close(self, name):
+        self.models.pop(name, None)
+        try:
+            if self.fastRestart:
+                self.engine.set_param(name, 'FastRestart', 'off', nargout=0)
+            self.engine.close_system(name, 0, nargout=0)
+        except Exception as ex:
+            logfun.exception(ex)
+
+    def clear(self):
+        for name in list(self.models):
+            self.close(name)
+
+    def used(self):
+        return sum(model.size for model in self.models.values())
+
+    def stats(self):
+        return {
+            "models": list(self.models),
+            "memory": self.used(),
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
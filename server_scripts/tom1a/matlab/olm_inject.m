@@ -0,0 +1,19 @@
+function olm_inject(params, expressions)
+% Unpacks the parameter set sent by parameters.py into the base workspace.
+% params holds the parsed scalars, vectors, matrices and strings,
+% expressions the bracketed values which have to be evaluated in MATLAB.
+
+names = fieldnames(params);
+for i = 1:numel(names)
+    assignin('base', names{i}, params.(names{i}));
+end
+
+names = fieldnames(expressions);
+for i = 1:numel(names)
+    try
+        assignin('base', names{i}, evalin('base', expressions.(names{i})));
+    catch err
+        warning('olm_inject:expression', '%s: %s', names{i}, err.message);
+    end
+end
+end
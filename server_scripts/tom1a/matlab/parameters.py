@@ -0,0 +1,105 @@
+"""
+Typed, batched injection of experiment parameters into the MATLAB workspace.
+
+Setting every constant and user argument with its own workspace[...] or
+assignin eval costs one engine round trip per value. parseParameters() turns
+the whole argument map into typed values once (scalars, row/column vectors
+and matrices from MATLAB bracket literals, plain strings) and inject() hands
+them to olm_inject.m as a single struct, which assigns them in the base
+workspace in one feval. Bracket values which are not plain number literals
+(e.g. [0:0.1:1]) travel as strings and are evaluated on the MATLAB side.
+"""
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+
+try:
+    import matlab
+except ImportError:
+    # fake_engine works with plain lists
+    matlab = None
+
+logfun = logging.getLogger("logfun")
+
+INJECTOR = "olm_inject"
+INJECTOR_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+Parameters = namedtuple("Parameters", ["values", "expressions"])
+InjectionReport = namedtuple("InjectionReport", ["parameters", "round_trips", "round_trips_saved", "seconds"])
+
+
+def parseMatrix(text):
+    "Rows of a MATLAB number literal like [1 2; 3 4], None when it is anything else"
+    body = text.strip()
+    if not (body.startswith("[") and body.endswith("]")):
+        return None
+    rows = []
+    for row in body[1:-1].split(";"):
+        items = row.replace(",", " ").split()
+        if not items:
+            continue
+        try:
+            rows.append([float(item) for item in items])
+        except ValueError:
+            return None
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        return None
+    return rows
+
+
+def toMatlab(rows):
+    return matlab.double(rows) if matlab is not None else rows
+
+
+def parseParameters(args, constants=None):
+    """
+    Split the argument map into values assigned as they are and expressions.
+
+    Only numbers and bracket values of args are used, like before, strings in
+    constants are kept (e.g. the com port).
+    """
+    values = {}
+    expressions = {}
+    for key, value in (constants or {}).items():
+        values[key] = value
+    for key, value in args.items():
+        if not NAME.match(key):
+            continue
+        try:
+            values[key] = float(value)
+            continue
+        except (TypeError, ValueError):
+            pass
+        if '[' not in value:
+            continue
+        rows = parseMatrix(value)
+        if rows is None:
+            expressions[key] = value
+        else:
+            values[key] = toMatlab(rows)
+    return Parameters(values, expressions)
+
+
+def inject(engine, parameters, onPath=True):
+    """
+    Assign all parameters in one engine call, report the round trips it saved.
+
+    With onPath=False the directory of olm_inject.m is added to the MATLAB
+    path first, which is needed once per engine.
+    """
+    began = time.monotonic()
+    roundTrips = 1
+    if not onPath:
+        engine.addpath(INJECTOR_DIR, nargout=0)
+        roundTrips += 1
+    engine.feval(INJECTOR, parameters.values, parameters.expressions, nargout=0)
+    seconds = time.monotonic() - began
+    count = len(parameters.values) + len(parameters.expressions)
+    report = InjectionReport(count, roundTrips, count - roundTrips, seconds)
+    logfun.info("injected %d parameters in %.1f ms, %d round trips saved",
+                count, seconds * 1000, report.round_trips_saved)
+    return report
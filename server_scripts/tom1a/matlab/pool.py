@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+"""
+Pool of warm MATLAB sessions for the TOS1A MATLAB runner.
+
+Starting MATLAB (or waiting for a shared session to show up) costs tens of
+seconds and every change/stop used to connect to the engine again. The pool
+starts the sessions once and keeps them running. Each run gets a session
+assigned to its device (the same one as last time when it is free), the
+workspace is cleared before the run instead of restarting MATLAB, so the time
+to the first sample is the model compile time.
+
+Wire protocol on the socket: one JSON object per line with "command" (start,
+wait, change, stop, status) and "device", the reply is one JSON line with
+"ok" and either the result or "error". start returns once the model runs,
+wait blocks until it stops and releases the session.
+
+Run it next to the queue worker:
+
+    ./pool.py --size 2
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from session import MatlabSession
+from updates import UpdateChannel
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from unixserver import ThreadingUnixServer
+
+logfun = logging.getLogger("logfun")
+
+POOL_SOCKET = os.environ.get("OLM_MATLAB_POOL", "/tmp/olm-matlab-pool.sock")
+COMMANDS = ("start", "wait", "change", "stop", "status")
+CHANGE_TIMEOUT = 10.0
+
+
+class PoolError(Exception):
+    pass
+
+
+class SessionPool:
+    """Warm sessions and their assignment to devices."""
+
+    def __init__(self, engineModule, size=1, budget=512 * 1024 * 1024, fastRestart=False):
+        self.engineModule = engineModule
+        self.lock = threading.Lock()
+        # engines start in parallel, the pool is ready when the slowest one is
+        futures = [engineModule.start_matlab(background=True) for i in range(size)]
+        self.sessions = [MatlabSession(future.result(), "session" + str(i), budget, fastRestart)
+                         for i, future in enumerate(futures)]
+        self.devices = {}
+        self.busy = set()
+        # live change channel of the experiment running on a device
+        self.channels = {}
+
+    def acquire(self, device):
+        "Session for the device, the one it used last time when it is free"
+        with self.lock:
+            # a new start on the same device supersedes a run which was never released
+            session = self.devices.get(device)
+            if session is None:
+                free = [s for s in self.sessions if s not in self.busy]
+                if not free:
+                    raise PoolError("No free MATLAB session for " + device)
+                # prefer sessions no other device is attached to
+                free.sort(key=lambda s: s in self.devices.values())
+                session = free[0]
+                self.devices = {d: s for d, s in self.devices.items() if s is not session}
+                self.devices[device] = session
+            self.busy.add(session)
+            return session
+
+    def owner(self, session):
+        for device, assigned in self.devices.items():
+            if assigned is session:
+                return device
+
+    def session(self, device):
+        session = self.devices.get(device)
+        if session is None or session not in self.busy:
+            raise PoolError("No experiment running on " + device)
+        return session
+
+    def closeChannel(self, device):
+        channel = self.channels.pop(device, None)
+        if channel is not None:
+            channel.close()
+
+    def release(self, device):
+        self.closeChannel(device)
+        with self.lock:
+            session = self.devices.get(device)
+            self.busy.discard(session)
+
+    def replace(self, session):
+        "Start a fresh engine in place of one which stopped answering"
+        logfun.exception("Restarting " + session.name)
+        try:
+            session.quit()
+        except Exception:
+            pass
+        session.attach(self.engineModule.start_matlab())
+
+    def start(self, device, args):
+        began = time.monotonic()
+        # changes for a run which was never released must not reach the session once it is reset
+        self.closeChannel(device)
+        session = self.acquire(device)
+        try:
+            try:
+                session.reset()
+            except Exception:
+                self.replace(session)
+            # the workspace was cleared by the health check above
+            cached = session.run(args, reset=False)
+        except Exception:
+            self.release(device)
+            raise
+        model = args["file_name"]
+        self.channels[device] = UpdateChannel(lambda values: session.change(values, model))
+        return {
+            "session": session.name,
+            "started_in": time.monotonic() - began,
+            "cached": cached,
+            "injection": session.injection._asdict(),
+        }
+
+    def wait(self, device, args):
+        session = self.session(device)
+        try:
+            polls = session.wait(args["file_name"], float(args["t_sim"]))
+        finally:
+            self.release(device)
+        return {"session": session.name, "polls": polls}
+
+    def change(self, device, args):
+        "Acknowledged once the change, merged with others sent meanwhile, is applied"
+        self.session(device)
+        channel = self.channels.get(device)
+        if channel is None:
+            raise PoolError("No experiment running on " + device)
+        return channel.submit(args).result(timeout=CHANGE_TIMEOUT)
+
+    def stop(self, device, args):
+        session = self.session(device)
+        session.stop(args.get("file_name", session.model))
+        return {}
+
+    def status(self, device=None, args=None):
+        return {"sessions": [{
+            "name": session.name,
+            "device": self.owner(session),
+            "busy": session in self.busy,
+            "model": session.model,
+            "runs": session.runs,
+            "models": session.models.stats(),
+            "updates": self.channels[self.owner(session)].stats() if self.owner(session) in self.channels else None,
+        } for session in self.sessions]}
+
+    def close(self):
+        for session in self.sessions:
+            session.quit()
+
+
+class PoolRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode())
+                if request["command"] not in COMMANDS:
+                    raise PoolError("Unknown command " + str(request["command"]))
+                handler = getattr(self.server.pool, request["command"])
+                reply = handler(request.get("device"), request.get("args", {}))
+                reply["ok"] = True
+            except Exception as e:
+                logfun.exception(e)
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class PoolServer(ThreadingUnixServer):
+
+    def __init__(self, path, pool):
+        self.pool = pool
+        super().__init__(path, PoolRequestHandler)
+
+
+class PoolClient:
+    """Connection of a runner script to the pool."""
+
+    def __init__(self, path=POOL_SOCKET):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.file = self.sock.makefile("rb")
+
+    @classmethod
+    def connect(cls, path=POOL_SOCKET):
+        "Client of the running pool, None when there is none"
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except OSError:
+            return None
+
+    def request(self, command, device, args):
+        if command not in COMMANDS:
+            raise ValueError("Unknown command " + command)
+        message = {"command": command, "device": device, "args": args}
+        self.sock.sendall(json.dumps(message).encode() + b"\n")
+        reply = self.file.readline()
+        if not reply:
+            raise PoolError("MATLAB pool closed the connection")
+        reply = json.loads(reply.decode())
+        if not reply.pop("ok"):
+            raise PoolError(reply["error"])
+        return reply
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1)
+    parser.add_argument("--socket", default=POOL_SOCKET)
+    parser.add_argument("--model-budget", type=int, default=512, help="MB of loaded models kept per session")
+    parser.add_argument("--fast-restart", action="store_true", help="keep cached models compiled between runs")
+    parser.add_argument("--fake", action="store_true", help="use fake_engine instead of MATLAB")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    args = getArguments()
+    if args.fake:
+        import fake_engine as engineModule
+    else:
+        import matlab.engine as engineModule
+    pool = SessionPool(engineModule, args.size, args.model_budget * 1024 * 1024, args.fast_restart)
+    logfun.info("%d MATLAB sessions ready", len(pool.sessions))
+    with PoolServer(args.socket, pool) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(args.socket)
+            pool.close()
@@ -0,0 +1,148 @@
+"""
+MATLAB session layer shared by start.py, change.py, stop.py and the pool.
+
+MatlabSession wraps one engine and knows how to prepare the workspace of a
+TOS1A experiment, load and start a Simulink schema, wait for it, push live
+changes and stop it. start.py uses it on an engine it connects to itself,
+pool.py keeps several of them warm and reuses them between runs.
+"""
+import logging
+import threading
+import time
+
+from completion import CompletionTimeout, completionTimeout, waitForCompletion
+from modelcache import ModelCache
+from parameters import inject, parseParameters
+
+logfun = logging.getLogger("logfun")
+
+# constants the TOS1A blocks expect in the base workspace
+DEFAULTS = {
+    'baud': 115200,
+    'fTt': 0.05,
+    'fTf': 0.05,
+    'fTl': 0.05,
+    't': 0,
+    'tempdps': 0,
+    'ftemp': 0,
+    'dtemp': 0,
+    'flight': 0,
+    'dlight': 0,
+    'frpm': 0,
+    'drpm': 0,
+    'uc': 0,
+    'tw': 10,
+    'Umax': float(8000),
+    'Umin': float(0),
+}
+
+
+def connectEngine(engineModule):
+    "Connect to a shared MATLAB session, start one when none shows up in 15 s"
+    i = 0
+    logfun.debug("hladam MATLAB")
+    try:
+        logfun.debug(engineModule.find_matlab())
+        while (len(engineModule.find_matlab()) == 0):
+            time.sleep(5)
+            i += 1
+            if ((i*5) > 15):
+                logfun.debug("spustam MATLAB")
+                engine = engineModule.start_matlab()
+                engine.desktop(nargout=0)
+                return engine
+    except Exception as ex:
+        logfun.exception("Something awful happened!")
+    return engineModule.connect_matlab(engineModule.find_matlab()[0])
+
+
+class MatlabSession:
+
+    def __init__(self, engine, name=None, budget=512 * 1024 * 1024, fastRestart=False):
+        self.name = name
+        self.lock = threading.RLock()
+        self.budget = budget
+        self.fastRestart = fastRestart
+        self.attach(engine)
+        self.runs = 0
+        self.injection = None
+
+    def attach(self, engine):
+        "Use a (new) engine, nothing is loaded in it yet"
+        self.engine = engine
+        self.models = ModelCache(engine, self.budget, self.fastRestart)
+        self.injectorOnPath = False
+        self.model = None
+
+    def reset(self):
+        "Clear the base workspace left over from the previous run, loaded models stay cached"
+        with self.lock:
+            logfun.debug("MATLAB clear")
+            self.engine.eval('clear', nargout=0)
+
+    def prepare(self, args):
+        "Fill the base workspace with the TOS1A constants and the user arguments"
+        constants = dict(DEFAULTS)
+        constants['Ts'] = float(args["s_rate"])/1000
+        constants['com'] = args["port"] + "," + args["output_path"]
+        parameters = parseParameters(args, constants)
+        with self.lock:
+            self.injection = inject(self.engine, parameters, self.injectorOnPath)
+            self.injectorOnPath = True
+        return self.injection
+
+    def load(self, directory, model):
+        "Load the schema unless the same file is still loaded from an earlier run"
+        with self.lock:
+            # the working directory of this engine, the process one is shared by the sessions of the pool
+            self.engine.cd(directory, nargout=0)
+            hit = self.models.load(directory, model, running=self.model)
+            logfun.debug("%s %s", model, "cached" if hit else "loaded")
+            self.model = model
+            return hit
+
+    def start(self, model):
+        with self.lock:
+            try:
+                self.engine.eval("assignin(" + model + ",'SimulationCommand','start')", nargout=0)
+            except Exception as ex:
+                print("EXCEPTION: ", ex)
+
+            try:
+                self.engine.set_param(model, 'SimulationCommand', 'start', nargout=0)
+            except Exception as ex:
+                print("EXCEPTION: ", ex)
+            self.runs += 1
+
+    def run(self, args, reset=True):
+        "Prepare the workspace, load the schema and start it, True when the schema was cached"
+        if reset:
+            self.reset()
+        self.prepare(args)
+        cached = self.load(args["uploaded_file"], args["file_name"])
+        self.start(args["file_name"])
+        return cached
+
+    def wait(self, model, duration):
+        "Block until the model stops, stop it when it overruns its hard deadline"
+        try:
+            return waitForCompletion(self.engine, model, completionTimeout(duration))
+        except CompletionTimeout as ex:
+            logfun.exception(ex)
+            self.stop(model)
+
+    def change(self, args, model=None):
+        "Write the changed arguments in one batch and let the running model pick them up, returns their names"
+        parameters = parseParameters(args)
+        with self.lock:
+            inject(self.engine, parameters, self.injectorOnPath)
+            self.injectorOnPath = True
+            self.engine.set_param(model or args["file_name"], 'SimulationCommand', 'update', nargout=0)
+        return list(parameters.values) + list(parameters.expressions)
+
+    def stop(self, model):
+        with self.lock:
+            self.engine.set_param(model, 'SimulationCommand', 'stop', nargout=0)
+
+    def quit(self):
+        self.engine.quit()
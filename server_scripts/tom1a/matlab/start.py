@@ -10,6 +10,16 @@ import subprocess
 import time
 import getpass
 import subprocess
+import sys
+
+from pool import PoolClient
+from session import MatlabSession, connectEngine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from broker import openPort
+from protocol import STOP
+from control import open_control, parse_input
 
 
 def getArguments():
@@ -30,97 +40,61 @@ def getArguments():
    args_map["output_path"] = outputPath
    return args_map
 
-def app(args):
-	logfun = logging.getLogger("logfun")
-
-	matlabInstance = None
-
-	i = 0
-	logfun.debug("hladam MATLAB")
-
+def poolRequest(command, args):
+	"A request of its own connection, the experiment keeps waiting on the other one"
+	pool = PoolClient.connect()
 	try:
-		logfun.debug(matlab.engine.find_matlab())
-		while (len(matlab.engine.find_matlab()) == 0):
-			time.sleep(5)
-			i += 1
-			if ((i*5) > 15):
-				logfun.debug("spustam MATLAB")
-				matlabInstance = matlab.engine.start_matlab()
-				matlabInstance.desktop(nargout=0)
-				break
-	except Exception as ex:
-		logfun.exception("Something awful happened!")
+		return pool.request(command, args["port"], args)
+	finally:
+		pool.close()
 
-	if ( matlabInstance is None ):
-		matlabInstance = matlab.engine.connect_matlab(matlab.engine.find_matlab()[0])
+def changedArguments(args, command):
+	changed = parse_input(command["input"])
+	changed["port"] = args["port"]
+	changed.setdefault("file_name", args["file_name"])
+	return changed
+
+def app(args):
+	logfun = logging.getLogger("logfun")
 
 	logfun.debug("nacitavam argumenty")
 	logfun.debug(args)
 
-	port = args["port"] + "," +  args["output_path"]
-
-	logfun.debug("MATLAB clear")
-	matlabInstance.eval('clear', nargout=0)
-	matlabInstance.workspace['baud'] = 115200
-	matlabInstance.workspace['fTt'] = 0.05
-	matlabInstance.workspace['fTf'] = 0.05
-	matlabInstance.workspace['fTl'] = 0.05
-	matlabInstance.workspace['Ts'] = float(args["s_rate"])/1000
-	matlabInstance.workspace['com'] = port
-	matlabInstance.workspace['t'] = 0
-	matlabInstance.workspace['tempdps'] = 0
-	matlabInstance.workspace['ftemp'] = 0
-	matlabInstance.workspace['dtemp'] = 0
-	matlabInstance.workspace['flight'] = 0
-	matlabInstance.workspace['dlight'] = 0
-	matlabInstance.workspace['frpm'] = 0
-	matlabInstance.workspace['drpm'] = 0
-	matlabInstance.workspace['uc'] = 0
-	matlabInstance.workspace['tw'] = 10
-	matlabInstance.workspace['Umax'] = float(8000)
-	matlabInstance.workspace['Umin'] = float(0)
-
-	for key, value in args.items():
-		isFloat = False
-		logfun.debug(key)
-		logfun.debug(value)
-		try:
-			#logfun.debug('assignin("base", "' + key + '", eval("' + value + '"))')
-			matlabInstance.workspace[key] = float(value)
-			isFloat = True
-		except Exception as ex:
-			print()
-			# logfun.exception(ex)
-
-		if not isFloat and '[' in value:
-			try:
-				logfun.debug('assignin("base", "' + key + '", eval("' + value + '"))')
-				matlabInstance.eval('assignin("base", "' + key + '", eval("' + value + '"))', nargout=0)
-			except Exception as ex:
-				print()
-				# logfun.exception(ex)
-
-
-
-	#matlabInstance.eval('assignin("base", "vystupy", eval("'+ vystupy + '"))', nargout=0)
-
-	os.chdir(args["uploaded_file"])
-	matlabInstance.addpath(args["uploaded_file"])
-	matlabInstance.load_system(args["file_name"]+".slx",nargout=0)
-
-	try:
-		matlabInstance.eval("assignin(" + args["file_name"] + ",'SimulationCommand','start')", nargout=0)
-	except Exception as ex:
-		print("EXCEPTION: ", ex)
-		
+	control = open_control(args["output_path"])
 	try:
-		matlabInstance.set_param(args["file_name"],'SimulationCommand','start',nargout=0)
-	except Exception as ex:
-		print("EXCEPTION: ", ex)
+		run(args, control)
+		if control:
+			# the model stopped, the measurement ends like with stop.py
+			ser = openPort(args["port"])
+			ser.write(STOP)
+			ser.close()
+	finally:
+		if control:
+			control.close()
+
+def run(args, control):
+	logfun = logging.getLogger("logfun")
 
-	while matlabInstance.get_param(args["file_name"],'SimulationStatus') != 'stopped':
-	    pass
-	matlabInstance.quit()
+	pool = PoolClient.connect()
+	if pool is not None:
+		# warm session of the pool, no MATLAB startup and no quit at the end
+		if control:
+			control.on("change", lambda command: poolRequest("change", changedArguments(args, command)))
+			control.on("stop", lambda command: poolRequest("stop", args))
+		try:
+			logfun.debug(pool.request("start", args["port"], args))
+			logfun.debug(pool.request("wait", args["port"], args))
+		finally:
+			pool.close()
+		return
+
+	session = MatlabSession(connectEngine(matlab.engine))
+	session.run(args)
+	if control:
+		control.on("change", lambda command: session.change(changedArguments(args, command)))
+		control.on("stop", lambda command: session.stop(args["file_name"]))
+	session.wait(args["file_name"], float(args["t_sim"]))
+	session.quit()
 
 if __name__ == '__main__':
    args = getArguments()
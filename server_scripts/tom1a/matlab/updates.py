@@ -0,0 +1,107 @@
+"""
+Coalescing channel for live parameter changes of a running experiment.
+
+A slider dragged in the browser produces a burst of change requests. Instead
+of applying each of them with its own workspace writes and model update, the
+channel collects them for a short debounce window, keeps only the latest
+value of every key and applies the merged set with one batched injection and
+one 'update'. Every request gets an acknowledgement with the keys applied,
+how many requests were merged into the update and the latency from its
+submission until the model was updated.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+
+class UpdateChannel(threading.Thread):
+
+    def __init__(self, apply, debounce=0.05, maxDelay=0.25, clock=time.monotonic):
+        """
+        apply is called with the merged {key: value} map from the channel thread
+        and returns the names of the parameters it applied.
+
+        A batch is applied once no change arrived for debounce seconds, or
+        maxDelay seconds after its first change during a continuous burst.
+        """
+        super().__init__(daemon=True)
+        self.apply = apply
+        self.debounce = debounce
+        self.maxDelay = maxDelay
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.waiting = []
+        self.first = None
+        self.last = None
+        self.closed = False
+        self.batches = 0
+        self.requests = 0
+        self.start()
+
+    def submit(self, values):
+        "Queue a change, the returned future resolves to its acknowledgement"
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The experiment is not running")
+            now = self.clock()
+            self.pending.update(values)
+            self.waiting.append((future, now))
+            if self.first is None:
+                self.first = now
+            self.last = now
+            self.requests += 1
+            self.condition.notify()
+        return future
+
+    def take(self):
+        "Wait for a batch which is due, None once the channel is closed and drained"
+        with self.condition:
+            while True:
+                if self.first is None:
+                    if self.closed:
+                        return None
+                    self.condition.wait()
+                    continue
+                due = min(self.last + self.debounce, self.first + self.maxDelay)
+                remaining = due - self.clock()
+                if remaining <= 0 or self.closed:
+                    batch = (self.pending, self.waiting)
+                    self.pending, self.waiting = {}, []
+                    self.first = self.last = None
+                    return batch
+                self.condition.wait(remaining)
+
+    def run(self):
+        while True:
+            batch = self.take()
+            if batch is None:
+                return
+            values, waiting = batch
+            try:
+                began = self.clock()
+                keys = self.apply(values)
+                applied = self.clock()
+            except Exception as e:
+                for future, submitted in waiting:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            for future, submitted in waiting:
+                future.set_result({
+                    "keys": sorted(keys),
+                    "coalesced": len(waiting),
+                    "apply_time": applied - began,
+                    "latency": applied - submitted,
+                })
+
+    def close(self):
+        "Apply what is pending and stop the thread"
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.join()
+
+    def stats(self):
+        return {"requests": self.requests, "updates": self.batches}
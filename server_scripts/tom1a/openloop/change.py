@@ -1,23 +1,13 @@
 #!/usr/bin/python3
-import serial
 import time
 import argparse
 import sys
+import os
 import calendar
 
-def calcCrc( msg ):
-        "Vypocet checksumu"
-        crc = 0
-        for letter in msg:     # First Example
-           crc = crc ^ ord(letter)
-        crc = format(crc, 'X')
-        return crc
-
-def makeCommand( msg ):
-        "Vytvorenie vety"
-        veta = msg+'*'+calcCrc(msg)+'\n'
-        final = b'$'+str.encode(veta)
-        return final
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from broker import openPort
+from protocol import controlCommand
 
 def getArguments():
     parser = argparse.ArgumentParser()
@@ -37,9 +27,8 @@ def getArguments():
 
 
 def app(args):
-    ser = serial.Serial(args["port"], 115200)
-    command = "SGV," + args["c_lamp"] + "," + args["c_fan"] + "," + args["c_led"]
-    ser.write(makeCommand(command))
+    ser = openPort(args["port"])
+    ser.write(controlCommand(args["c_lamp"], args["c_fan"], args["c_led"]))
     ser.close()
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+"""
+Openloop experiment of the TOS1A board hosted by the resident runner.
+
+Does what start.py does, as a task of the runner's event loop: the reads are
+awaited on a non-blocking port, so a single runner samples many boards, and
+a change is written by the task itself instead of by a change.py process.
+The options of the start request are start.py arguments and mean the same
+(sampling.py), except --realtime and --cpus, which would apply to the whole
+runner, and --buffer, there is no reader thread to buffer for. Rows go to
+the output file like from start.py and are handed to the runner once per
+publishing tick.
+"""
+import asyncio
+import os
+import sys
+import time
+
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, DEVICE_DIR)
+sys.path.insert(0, os.path.join(DEVICE_DIR, "..", "common"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from broker import AsyncPort
+from protocol import READ, START, STOP, controlCommand, parseFrame
+from reader import Sample
+from scheduler import SampleScheduler, stats_path
+from control import parse_input
+from sampling import SampleOutput, getArguments, readTimeout
+
+
+class OpenloopExperiment:
+
+    def __init__(self, request, publish):
+        """
+        request -- start request of the runner (port, output, input, options)
+        publish -- called with the rows sampled since the previous tick
+        """
+        options = request.get("options", [])
+        try:
+            self.args = getArguments(["--port", request["port"], "--output", request["output"],
+                                      "--input", request["input"]] + options)
+        except SystemExit:
+            # argparse exits on an invalid option, the runner has to go on
+            raise ValueError("Invalid options: " + " ".join(options))
+        self.publish = publish
+        self.output = None
+        self.stopping = asyncio.Event()
+        self.port = None
+        self.scheduler = None
+        self.samples = 0
+        self.lost = 0
+        self.retried = 0
+
+    async def run(self):
+        args = self.args
+        duration = int(float(args["t_sim"]))
+        self.port = await AsyncPort(args["port"], readTimeout(args)).open()
+        self.scheduler = SampleScheduler(float(args["s_rate"]) / 1000.0, args["overrun"])
+        self.output = SampleOutput(args)
+        pending = []
+        published = time.monotonic()
+        try:
+            await self.port.write(START)
+            await self.port.write(controlCommand(args["c_lamp"], args["c_fan"], args["c_led"]))
+            self.scheduler.start()
+            while not self.stopping.is_set() and self.scheduler.elapsed() < duration:
+                reply = await self.readSample()
+                if reply is None:
+                    self.lost += 1
+                else:
+                    sample = Sample(self.scheduler.slot, self.scheduler.elapsed(), reply[1], reply[0])
+                    pending.extend(row[:-1].decode("ascii") for row in self.output.write([sample]))
+                    self.samples += 1
+                if pending and time.monotonic() - published >= args["publish_tick"]:
+                    self.publish(pending)
+                    pending = []
+                    published = time.monotonic()
+                await self.scheduler.wait_async()
+        finally:
+            self.output.close()
+            if pending:
+                self.publish(pending)
+            self.scheduler.write_stats(stats_path(args["output"]))
+            try:
+                await self.port.write(STOP)
+            finally:
+                self.port.close()
+        return {"output": self.output.summary(self.status())}
+
+    async def readSample(self):
+        for attempt in range(self.args["retries"] + 1):
+            if attempt:
+                self.retried += 1
+            frame = await self.port.query(READ)
+            # a timed out read returns an empty line which does not parse
+            body = parseFrame(frame)
+            if body is not None:
+                return frame, body
+        return None
+
+    async def change(self, request):
+        if self.port is None:
+            return "Experiment is not running yet"
+        inputs = parse_input(request["input"])
+        await self.port.write(controlCommand(inputs["c_lamp"], inputs["c_fan"], inputs["c_led"]))
+        # rows sampled from now on carry the new inputs
+        self.args.update(inputs)
+        self.output.change(self.args)
+        return ""
+
+    async def stop(self, request):
+        # the sampling loop ends the measurement on the board itself
+        self.stopping.set()
+
+    def status(self):
+        return {"samples": self.samples, "lost": self.lost, "retried": self.retried}
@@ -0,0 +1,119 @@
+"""
+Openloop options and output shared by start.py and OpenloopExperiment.
+
+An experiment takes the same options, writes the same rows and applies a
+change the same way whether it runs as its own start.py process or is
+hosted by the resident runner. The runner reads the options from the
+"options" of its start request, which are start.py arguments.
+"""
+import argparse
+
+from binformat import BinaryWriter, binary_path, load_channels
+from control import parse_input
+from protocol import parseFrames
+from writer import OutputWriter
+
+
+def getParser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port")
+    parser.add_argument("--input")
+    parser.add_argument("--output")
+    parser.add_argument("--overrun", choices=["skip", "catchup"], default="skip")
+    parser.add_argument("--realtime", action="store_true")
+    parser.add_argument("--cpus")
+    parser.add_argument("--flush-rows", type=int, default=100)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--fsync", action="store_true")
+    parser.add_argument("--binary", action="store_true")
+    parser.add_argument("--read-timeout", type=float)
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--buffer", type=int, default=4096)
+    parser.add_argument("--publish-tick", type=float, default=0.1)
+    return parser
+
+
+def getArguments(arguments=None):
+    "Map of the inputs and the options, from the command line when arguments is None"
+    options = getParser().parse_args(arguments)
+    args_map = parse_input(options.input)
+    args_map["port"] = options.port
+    args_map["output"] = options.output
+    args_map["overrun"] = options.overrun
+    args_map["realtime"] = options.realtime
+    args_map["cpus"] = [int(cpu) for cpu in options.cpus.split(",")] if options.cpus else None
+    args_map["flush_rows"] = options.flush_rows
+    args_map["flush_interval"] = options.flush_interval
+    args_map["fsync"] = options.fsync
+    args_map["binary"] = options.binary
+    args_map["read_timeout"] = options.read_timeout
+    args_map["retries"] = options.retries
+    args_map["buffer"] = options.buffer
+    args_map["publish_tick"] = options.publish_tick
+    return args_map
+
+
+def readTimeout(args):
+    # a lost reply must not block longer than one sampling period
+    return args["read_timeout"] or float(args["s_rate"]) / 1000.0
+
+
+def controlColumns(args):
+    "Control columns closing every row, in the order of the output config"
+    return ("," + args["c_lamp"] + "," + args["c_led"] + "," + args["c_fan"] + "\n").encode("ascii")
+
+
+class SampleOutput:
+    """Rows of a run in the output file, and its binary copy with --binary."""
+
+    def __init__(self, args):
+        self.writer = OutputWriter(args["output"], args["flush_rows"], args["flush_interval"], args["fsync"])
+        self.binary = None
+        if args["binary"]:
+            # time, 17 device values and the three control signals
+            channels = load_channels("tom1a")[:21]
+            self.binary = BinaryWriter(binary_path(args["output"]), channels,
+                                       args["flush_rows"], args["flush_interval"], args["fsync"])
+        self.change(args)
+
+    def change(self, args):
+        "Rows written from now on carry the inputs of args"
+        self.controls = controlColumns(args)
+        self.controlValues = [float(args[name]) for name in ("c_lamp", "c_led", "c_fan")]
+
+    def write(self, samples):
+        "Write the rows of a batch of samples, returns them"
+        records = None
+        if self.binary:
+            # the device values of the whole batch are parsed in one call
+            values, dropped = parseFrames(b"".join(sample.frame for sample in samples))
+            if dropped:
+                # frames the batch parser rejects are left out of both files
+                if len(samples) == 1:
+                    return []
+                return [row for sample in samples for row in self.write([sample])]
+            records = self.records(samples, values)
+        rows = [repr(sample.elapsed).encode("ascii") + b"," + sample.body + self.controls for sample in samples]
+        for row in rows:
+            self.writer.write(row)
+        if records is not None:
+            self.binary.write_array(records)
+        return rows
+
+    def records(self, samples, values):
+        "Binary records of the samples: time, device values and inputs"
+        import numpy as np
+
+        records = np.empty((len(samples), 1 + values.shape[1] + len(self.controlValues)))
+        records[:, 0] = [sample.elapsed for sample in samples]
+        records[:, 1:1 + values.shape[1]] = values
+        records[:, 1 + values.shape[1]:] = self.controlValues
+        return records
+
+    def close(self):
+        self.writer.close()
+        if self.binary:
+            self.binary.close()
+
+    def summary(self, stats):
+        return "Rows written: %d bytes written: %d %s" % (self.writer.rows_written, self.writer.bytes_written, stats)
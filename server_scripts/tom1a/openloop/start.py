@@ -1,112 +1,96 @@
 #!/usr/bin/python3
-import serial
 import time
 import argparse
 import sys
 import os
 import calendar
 
-current_milli_time = lambda: time.time()
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, DEVICE_DIR)
+sys.path.insert(0, os.path.join(DEVICE_DIR, "..", "common"))
+from broker import openPort
+from protocol import START, STOP, controlCommand
+from reader import SampleReader
+from scheduler import SampleScheduler, enable_realtime, stats_path
+from publisher import open_publisher
+from control import TIMEOUT, open_control, parse_input
+from sampling import SampleOutput, getArguments, readTimeout
 
-def calcCrc( msg ):
-        "Vypocet checksumu"
-        crc = 0;
-        for letter in msg:     # First Example
-           crc = crc ^ ord(letter)
-        crc = format(crc, 'X')
-        return crc;
-
-def makeCommand( msg ):
-        "Vytvorenie vety"
-        #final = b'$'+msg+'*'+calcCrc(msg)+'\n'
-        veta = msg+'*'+calcCrc(msg)+'\n'
-        final = b'$'+str.encode(veta)
-        return final;
-
-def getArguments():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--port")
-    parser.add_argument("--input")
-    parser.add_argument("--output")
-    args = parser.parse_args()
-    output = args.output
-    port = args.port
-    args = args.input
-    args = args.split(",")
-    # args = [pair.replace(" ","") for pair in args]
-    args_map = {}
-    for arg in args:
-       argument = arg.split(":")
-       args_map[argument[0]] = argument[1]
-    args_map["port"] = port
-    args_map["output"] = output
-    return args_map
-
-
-def startReading(args):
-    port = args["port"]
-    ser = serial.Serial(port, 115200)
-    readCmd = makeCommand('SGV')
+def startReading(args, ser, control=None):
     filePath = args["output"]
-#    now = calendar.timegm(time.gmtime())
-#    now = current_milli_time()
-    start = current_milli_time()
-#    end = now + int(float(args["t_sim"])) * 1000
-    elapsedTime = 0
-    count = 0
     duration = int(float(args["t_sim"]))
     rate = float(args["s_rate"])
 
+    if args["realtime"]:
+        enable_realtime(args["cpus"])
+    scheduler = SampleScheduler(rate / 1000.0, args["overrun"])
+    output = SampleOutput(args)
+    publisher = open_publisher(args["publish_tick"])
+    reader = SampleReader(ser, scheduler, duration, args["buffer"], args["retries"])
+    reader.start()
+
+    if control:
+        def change(command):
+            inputs = parse_input(command["input"])
+            # written between two reads, the port is not shared with another process
+            reader.submit(controlCommand(inputs["c_lamp"], inputs["c_fan"], inputs["c_led"])).result(TIMEOUT)
+            args.update(inputs)
+            output.change(args)
+        control.on("change", change)
+        control.on("stop", lambda command: reader.stop())
+
     try:
-        while (elapsedTime < duration):
-            file = open(filePath, "a+")
-            ser.write(makeCommand("SGV"))
-            output = ser.readline()
-            try :
-                output = output.decode("utf-8")
-                beginPos = output.find("$") + 1
-                endPos = output.find("*")
-                elapsedTime = current_milli_time() - start
-                # print("output[beginPos:endPos]: ", output[beginPos:endPos])
-                output = str(elapsedTime) + "," + output[beginPos:endPos] + "," + args["c_lamp"] + "," + args["c_led"] + "," + args["c_fan"] + "\n"
-                # print("c_lamp: ", args["c_lamp"])
-                # print("c_led: ", args["c_led"])
-                # print("c_fan: ", args["c_fan"])
-                # print("output: ", output)
-                # print("==========================================")
-#                print(output)
+        while reader.running():
+            samples = reader.drain(timeout=args["publish_tick"])
+            try:
+                rows = output.write(samples) if samples else []
             except ValueError:
-                # How to handle such thing ?
                 print("ops")
-
-            file.write(output)
-            file.close()
-            count = count + 1
-            time.sleep((-current_milli_time() + start + rate) / 1000.0)
-#            now = current_milli_time()
-        file.close()
-        ser.close()
+                rows = []
+            if publisher:
+                for row in rows:
+                    publisher.publish(row)
+            if publisher:
+                publisher.poll()
+        reader.join()
+        if reader.error is not None:
+            # the reader died, its buffer is drained
+            raise reader.error
+        output.close()
+        if publisher:
+            publisher.finish()
+        scheduler.write_stats(stats_path(filePath))
+        print(output.summary(reader.stats()))
     except Exception as e:
+        reader.stop()
+        # STOP is not written while the reader may still be in a read, it ends after the one it is in
+        reader.join(readTimeout(args) * (args["retries"] + 1) + 1.0)
         exc_type, exc_obj, exc_tb = sys.exc_info()
         fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
         print(exc_type, fname, exc_tb.tb_lineno)
         print("Could not create file")
+        # the job broadcasts stderr as the error of the run
+        print(exc_type.__name__ + ":", e, file=sys.stderr)
+        output.close()
+        stopDevice(ser)
         ser.close()
-        sys.exit(0)
+        sys.exit(1)
 
-def stopDevice(args):
-    ser = serial.Serial(args["port"], 115200)
-    ser.write(makeCommand('SEE'))
-    ser.close()
+def stopDevice(ser):
+    ser.write(STOP)
 
 def app(args):
-    ser = serial.Serial(args["port"], 115200)
-    ser.write(makeCommand('SSE'))
-    command = "SGV," + args["c_lamp"] + "," + args["c_fan"] + "," + args["c_led"]
-    ser.write(makeCommand(command))
-    ser.close()
-    startReading(args)
-    stopDevice(args)
+    ser = openPort(args["port"], readTimeout(args))
+    ser.write(START)
+    ser.write(controlCommand(args["c_lamp"], args["c_fan"], args["c_led"]))
+    control = open_control(args["output"])
+    try:
+        startReading(args, ser, control)
+        stopDevice(ser)
+        ser.close()
+    finally:
+        if control:
+            control.close()
 
 if __name__ == '__main__':
     args = getArguments()
@@ -0,0 +1,118 @@
+"""
+TOS1A serial protocol.
+
+Command and response frames look like $<body>*<checksum>\\n, the checksum is
+the XOR of all body bytes written as uppercase hex without padding. The
+helpers here work on bytes and memoryviews, so the reader loop never decodes
+a reply to str or slices it field by field, and the checksum the device
+sends after '*' is verified before a frame is accepted.
+"""
+import functools
+import warnings
+
+
+def checksum(body):
+    "XOR of all bytes of the body"
+    # fold the body as one integer in halves instead of looping over bytes
+    length = len(body)
+    value = int.from_bytes(body, "little")
+    while length > 1:
+        half = (length + 1) // 2
+        value = (value >> (half * 8)) ^ (value & ((1 << (half * 8)) - 1))
+        length = half
+    return value
+
+
+def calcCrc(msg):
+    "Vypocet checksumu"
+    if isinstance(msg, str):
+        msg = msg.encode("ascii")
+    return format(checksum(msg), 'X')
+
+
+@functools.lru_cache(maxsize=256)
+def makeCommand(msg):
+    "Vytvorenie vety"
+    if isinstance(msg, str):
+        msg = msg.encode("ascii")
+    return b"$" + msg + b"*" + calcCrc(msg).encode("ascii") + b"\n"
+
+
+def controlCommand(lamp, fan, led):
+    "Command setting lamp, fan and LED inputs"
+    return makeCommand("SGV," + str(lamp) + "," + str(fan) + "," + str(led))
+
+
+START = makeCommand("SSE")
+STOP = makeCommand("SEE")
+READ = makeCommand("SGV")
+
+# comma separated values in a reply to READ
+VALUES = 17
+
+
+def frameBounds(line):
+    "Start and end of the verified body in line, None for a corrupted frame"
+    # resynchronize on the last start marker, bytes before it are garbage
+    begin = line.rfind(b"$")
+    if begin < 0:
+        return None
+    end = line.find(b"*", begin)
+    if end < 0:
+        return None
+    try:
+        expected = int(line[end + 1:].strip(), 16)
+    except ValueError:
+        return None
+    if checksum(memoryview(line)[begin + 1:end]) != expected:
+        return None
+    return begin + 1, end
+
+
+def parseFrame(line):
+    "Body of a response frame as a memoryview, None when it is corrupted"
+    bounds = frameBounds(line)
+    if bounds is None:
+        return None
+    return memoryview(line)[bounds[0]:bounds[1]]
+
+
+def parseFrames(data, columns=VALUES):
+    """
+    Parse a batch of response frames into a (frames, columns) float64 array.
+
+    Frames with a wrong checksum or number of values are dropped. Returns the
+    array and the number of dropped frames.
+    """
+    import numpy as np
+
+    bodies = []
+    dropped = 0
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        bounds = frameBounds(line)
+        if bounds is None or line.count(b",", bounds[0], bounds[1]) != columns - 1:
+            dropped += 1
+            continue
+        bodies.append(line[bounds[0]:bounds[1]])
+
+    if not bodies:
+        return np.empty((0, columns)), dropped
+    try:
+        with warnings.catch_warnings():
+            # older numpy stops at a value which is not a number with a warning, newer raises
+            warnings.simplefilter("ignore", DeprecationWarning)
+            values = np.fromstring(b",".join(bodies), dtype=np.float64, sep=",")
+        if values.size == len(bodies) * columns:
+            return values.reshape(-1, columns), dropped
+    except ValueError:
+        pass
+
+    rows = []
+    for body in bodies:
+        try:
+            rows.append([float(value) for value in body.split(b",")])
+        except ValueError:
+            dropped += 1
+    return np.array(rows, dtype=np.float64).reshape(-1, columns), dropped
@@ -0,0 +1,147 @@
+"""
+Background sampling engine for the TOS1A board.
+
+A dedicated I/O thread polls the device on the scheduler's slots and puts
+verified samples into a bounded ring buffer. The experiment loop drains the
+buffer and does the file writing and publishing, so a slow disk never delays
+a serial read, and a missing or corrupted reply costs one sample instead of
+hanging the run on a readline() without timeout.
+"""
+import collections
+import queue
+import threading
+from concurrent.futures import Future
+
+from protocol import READ, parseFrame
+
+# body is the verified part of frame, the reply line as read
+Sample = collections.namedtuple("Sample", ["slot", "elapsed", "body", "frame"])
+
+
+class SampleReader(threading.Thread):
+
+    def __init__(self, port, scheduler, duration, capacity=4096, retries=1):
+        """
+        port      -- broker or direct port opened with a read timeout
+        scheduler -- SampleScheduler pacing the reads
+        duration  -- length of the run in seconds
+        capacity  -- samples kept in the ring buffer, the oldest are overwritten when full
+        retries   -- extra reads of one sample after a timeout or corrupted reply
+        """
+        super().__init__(daemon=True)
+        self.port = port
+        self.scheduler = scheduler
+        self.duration = duration
+        self.capacity = capacity
+        self.retries = retries
+        self.buffer = collections.deque()
+        self.condition = threading.Condition()
+        self.stopping = threading.Event()
+        self.error = None
+        self.writes = queue.Queue()
+        # guards finished, a write is either queued before the run ends or failed right away
+        self.writeLock = threading.Lock()
+        self.finished = False
+        self.samples = 0
+        self.lost = 0
+        self.retried = 0
+        self.overwritten = 0
+
+    def run(self):
+        try:
+            self.scheduler.start()
+            while not self.stopping.is_set() and self.scheduler.elapsed() < self.duration:
+                slot = self.scheduler.slot
+                self.writePending()
+                reply = self.readSample()
+                if reply is None:
+                    self.lost += 1
+                else:
+                    self.push(Sample(slot, self.scheduler.elapsed(), reply[1], reply[0]))
+                self.scheduler.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.failPending()
+            with self.condition:
+                self.condition.notify_all()
+
+    def submit(self, frame):
+        """Write frame from the I/O thread before the next read, the future resolves once it is written."""
+        future = Future()
+        with self.writeLock:
+            if self.finished:
+                future.set_exception(RuntimeError("Experiment is finished!"))
+            else:
+                self.writes.put((frame, future))
+        return future
+
+    def writePending(self):
+        while True:
+            try:
+                frame, future = self.writes.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.port.write(frame)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+
+    def failPending(self):
+        with self.writeLock:
+            self.finished = True
+        while True:
+            try:
+                frame, future = self.writes.get_nowait()
+            except queue.Empty:
+                return
+            future.set_exception(RuntimeError("Experiment is finished!"))
+
+    def readSample(self):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+            try:
+                frame = self.port.query(READ)
+            except OSError:
+                continue
+            # a timed out read returns an empty line which does not parse
+            body = parseFrame(frame)
+            if body is not None:
+                return frame, body
+        return None
+
+    def push(self, sample):
+        with self.condition:
+            if len(self.buffer) >= self.capacity:
+                self.buffer.popleft()
+                self.overwritten += 1
+            self.buffer.append(sample)
+            self.samples += 1
+            self.condition.notify()
+
+    def drain(self, timeout=None):
+        """Take all buffered samples, waiting up to timeout for the first one."""
+        with self.condition:
+            if not self.buffer and self.is_alive():
+                self.condition.wait(timeout)
+            samples = list(self.buffer)
+            self.buffer.clear()
+        if not samples and self.error is not None:
+            raise self.error
+        return samples
+
+    def running(self):
+        return self.is_alive() or bool(self.buffer)
+
+    def stop(self):
+        self.stopping.set()
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "lost": self.lost,
+            "retried": self.retried,
+            "overwritten": self.overwritten,
+        }
@@ -1,24 +1,17 @@
 #!/usr/bin/python3
-def calcCrc( msg ):
-        "Vypocet checksumu"
-        crc = 0;
-        for letter in msg:     # First Example
-           crc = crc ^ ord(letter)
-        crc = format(crc, 'X')
-        return crc;
-
-def makeCommand( msg ):
-        "Vytvorenie vety"
-        veta = msg+'*'+calcCrc(msg)+'\n'
-        final = b'$'+str.encode(veta)
-        return final;
-
-import serial
 import sys
+import os
 import glob
 import argparse
 import matlab.engine
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from broker import openPort
+from protocol import STOP
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "matlab"))
+from pool import PoolClient
+
 
 
 if len(sys.argv) == 1:
@@ -38,9 +31,17 @@ ports = glob.glob('/dev/tty[A-Za-z]*')
 if port not in ports:
     sys.exit(1)
 
-if (software == "matlab"):
+pool = PoolClient.connect() if software == "matlab" else None
+if pool is not None:
+    # the pool keeps the session, only the model of this port is stopped
+    try:
+        pool.request("stop", port, {"file_name": fileName})
+    finally:
+        pool.close()
+elif (software == "matlab"):
     matlabInstance = matlab.engine.connect_matlab(matlab.engine.find_matlab()[0])
     matlabInstance.set_param(fileName,'SimulationCommand','stop',nargout=0)
     matlabInstance.quit()
-ser = serial.Serial(port, 115200)
-ser.write(makeCommand('SEE'))
+ser = openPort(port)
+ser.write(STOP)
+ser.close()
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+"""
+Virtual TOS1A board on a pseudo-terminal, for running and measuring the
+sampling path without the thermo-optical plant.
+
+The device checks the XOR checksum of every frame and understands SSE and
+SEE (start and end of a measurement), SGV,<lamp>,<fan>,<led> (set the
+inputs) and the bare SGV read, which is answered with the next row of a
+recorded experiment (the 17 device columns of a file like public/file.csv,
+replayed in a loop). Replies come after `latency` seconds with gaussian
+`jitter`, `drop` is the probability that a read is not answered and
+`corrupt` the probability that the reply arrives with a wrong checksum.
+
+    ./virtualdevice.py --link /tmp/virtual-tos1a --data ../../public/file.csv
+
+The openloop scripts, stop.py, read.py and broker.py can then use
+--port /tmp/virtual-tos1a. Counters are printed on exit, programs using
+VirtualDevice directly read them and the reply log from stats() and replies.
+"""
+import argparse
+import csv
+import json
+import os
+import pty
+import queue
+import random
+import threading
+import time
+import tty
+from collections import deque
+
+from protocol import VALUES, frameBounds, makeCommand
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "public", "file.csv")
+LATENCY = 0.002
+JITTER = 0.0
+# replies kept for matching them with output rows
+REPLY_LOG = 100000
+
+
+def loadRows(path):
+    "Device reply bodies of a recorded experiment, the columns after the time"
+    with open(path, newline="") as file:
+        rows = csv.reader(file)
+        next(rows)
+        return [",".join(row[1:1 + VALUES]).encode("ascii") for row in rows if len(row) > VALUES]
+
+
+class VirtualDevice:
+    """The emulated board, served by threads on the master side of a pty."""
+
+    def __init__(self, link, data=DATA, latency=LATENCY, jitter=JITTER, drop=0.0, corrupt=0.0, seed=None):
+        self.link = link
+        self.rows = loadRows(data)
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+        self.corrupt = corrupt
+        self.random = random.Random(seed)
+
+        self.master, self.slave = pty.openpty()
+        # the device side stays open, clients come and go like on a real port
+        tty.setraw(self.slave)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.ttyname(self.slave), link)
+
+        self.lock = threading.Lock()
+        self.outgoing = queue.Queue()
+        self.row = 0
+        self.lastReply = 0.0
+        self.running = False
+        self.threads = []
+        self.resetStats()
+
+    def resetStats(self):
+        with self.lock:
+            self.counters = dict.fromkeys(("reads", "replies", "dropped", "corrupted", "rejected",
+                                           "starts", "stops", "controls"), 0)
+            self.measuring = False
+            self.inputs = None
+            # (time read, time answered, body) of every reply, (time received, lamp, fan, led) of every input change
+            self.replies = deque(maxlen=REPLY_LOG)
+            self.controls = []
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["measuring"] = self.measuring
+            stats["inputs"] = self.inputs
+        return stats
+
+    def handle(self, line, now):
+        bounds = frameBounds(line)
+        if bounds is None:
+            with self.lock:
+                self.counters["rejected"] += 1
+            return
+        fields = line[bounds[0]:bounds[1]].split(b",")
+        with self.lock:
+            if fields == [b"SSE"]:
+                self.counters["starts"] += 1
+                self.measuring = True
+            elif fields == [b"SEE"]:
+                self.counters["stops"] += 1
+                self.measuring = False
+            elif fields == [b"SGV"]:
+                self.counters["reads"] += 1
+                self.scheduleReply(now)
+            elif fields[0] == b"SGV" and len(fields) == 4:
+                self.counters["controls"] += 1
+                self.inputs = [field.decode() for field in fields[1:]]
+                self.controls.append((now, *self.inputs))
+            else:
+                self.counters["rejected"] += 1
+
+    def scheduleReply(self, now):
+        if self.random.random() < self.drop:
+            self.counters["dropped"] += 1
+            return
+        body = self.rows[self.row % len(self.rows)]
+        self.row += 1
+        reply = makeCommand(body)
+        if self.random.random() < self.corrupt:
+            self.counters["corrupted"] += 1
+            # the last checksum digit is off, the frame no longer verifies
+            reply = reply[:-2] + (b"0" if reply[-2:-1] != b"0" else b"1") + b"\n"
+        # replies leave in the order of the reads
+        due = max(now + max(0.0, self.random.gauss(self.latency, self.jitter)), self.lastReply)
+        self.lastReply = due
+        self.outgoing.put((now, due, body, reply))
+
+    def receive(self):
+        pending = b""
+        while self.running:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            now = time.monotonic()
+            pending += data
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                self.handle(line, now)
+
+    def send(self):
+        while True:
+            requested, due, body, reply = self.outgoing.get()
+            if reply is None:
+                return
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            os.write(self.master, reply)
+            with self.lock:
+                self.counters["replies"] += 1
+                self.replies.append((requested, time.monotonic(), body))
+
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self.receive, daemon=True),
+                        threading.Thread(target=self.send, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.outgoing.put((0.0, 0.0, None, None))
+        self.threads[1].join()
+        # the receiving thread is left blocked in its read, it is a daemon thread
+        os.close(self.slave)
+        os.close(self.master)
+        if os.path.islink(self.link):
+            os.remove(self.link)
+
+
+def getArguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--link", default="/tmp/virtual-tos1a", help="path the port is linked to")
+    parser.add_argument("--data", default=DATA, help="recorded experiment replayed by SGV reads")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds until a read is answered")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="standard deviation of the latency")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability that a read is not answered")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="probability of a reply with a wrong checksum")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = getArguments()
+    device = VirtualDevice(args.link, args.data, args.latency, args.jitter, args.drop, args.corrupt, args.seed)
+    device.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(device.stats()))
+        device.stop()